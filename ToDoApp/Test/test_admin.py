@@ -1,6 +1,21 @@
+import json
 from fastapi import status
-from Test.utils import client, test_admin, test_todo, TestingSessionLocal
+from Test.utils import client, test_admin, test_todo, TestingSessionLocal, override_get_db, clean_database
+from ToDoApp.main import app
 from ToDoApp.models import ToDoItem as Todos
+from ToDoApp.routers import admin
+
+app.dependency_overrides[admin.get_db] = override_get_db
+
+
+def _seed_todos(owner_id, count, status="pending"):
+    db = TestingSessionLocal()
+    db.add_all([
+        Todos(title=f"Task {i}", description="x" * 10, priority=2, status=status, owner_id=owner_id)
+        for i in range(count)
+    ])
+    db.commit()
+    db.close()
 
 def test_admin_read_all_authenticated(test_admin, test_todo):
     response = client.get("/admin/todo")
@@ -30,3 +45,54 @@ def test_admin_delete_todo_not_found(test_admin):
     response = client.delete("/admin/todo/999")
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {'detail': 'Todo not found.'}
+
+def test_admin_read_all_paginates_with_cursor(test_admin):
+    _seed_todos(test_admin.id, 5)
+
+    first = client.get("/admin/todo?limit=2")
+    assert first.status_code == status.HTTP_200_OK
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(f"/admin/todo?limit=2&cursor={cursor}")
+    assert [t["id"] for t in second.json()][0] > int(cursor)
+
+    last = client.get("/admin/todo?limit=10")
+    assert len(last.json()) == 5
+    assert "X-Next-Cursor" not in last.headers
+
+def test_admin_read_all_filters_and_projects(test_admin):
+    _seed_todos(test_admin.id, 2)
+    _seed_todos(test_admin.id, 3, status="completed")
+
+    response = client.get("/admin/todo?status=completed&fields=title")
+    data = response.json()
+    assert len(data) == 3
+    assert set(data[0].keys()) == {"id", "title"}
+
+    response = client.get("/admin/todo?fields=nope")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_admin_read_all_streams_ndjson(test_admin):
+    _seed_todos(test_admin.id, 3)
+    response = client.get("/admin/todo?format=ndjson&fields=title,status")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["status"] == "pending"
+
+def test_members_api_aggregates_counts_per_user(test_admin):
+    _seed_todos(test_admin.id, 2)
+    _seed_todos(test_admin.id, 1, status="completed")
+
+    response = client.get("/admin/api/members")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["pagination"]["total_count"] == 1
+    member = data["members"][0]
+    assert member["username"] == test_admin.username
+    assert (member["total"], member["open"], member["completed"]) == (3, 2, 1)
+    assert member["last_activity"] is not None
+
+    response = client.get("/admin/api/members?search=nobody")
+    assert response.json()["members"] == []
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from fastapi import status
+from Test.utils import client, test_admin, test_user
+from ToDoApp.admission import AdmissionController
+from ToDoApp.database import POOL_SIZE, MAX_OVERFLOW
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_limit_then_queues():
+    controller = AdmissionController(max_concurrent=2, max_queue=1, queue_timeout=1)
+    assert await controller.acquire()
+    assert await controller.acquire()
+
+    waiter = asyncio.ensure_future(controller.acquire())
+    await asyncio.sleep(0)
+    assert controller.queue_depth == 1
+
+    controller.release()
+    assert await waiter is True
+    assert controller.active == 2
+    assert controller.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_full():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=1)
+    assert await controller.acquire()
+    waiter = asyncio.ensure_future(controller.acquire())
+    await asyncio.sleep(0)
+
+    assert await controller.acquire() is False
+    assert controller.shed_queue_full == 1
+
+    controller.release()
+    assert await waiter is True
+
+
+@pytest.mark.asyncio
+async def test_sheds_after_queue_timeout():
+    controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=0.01)
+    assert await controller.acquire()
+    assert await controller.acquire() is False
+    assert controller.shed_timeout == 1
+    assert controller.queue_depth == 0
+
+    controller.release()
+    assert controller.active == 0
+
+
+def test_metrics_are_for_admins_only(test_user):
+    assert client.get("/metrics").status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_metrics_reports_pool_derived_limits(test_admin):
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    admission = response.json()["admission"]
+    assert admission["max_concurrent"] == POOL_SIZE + MAX_OVERFLOW
+    assert admission["active"] == 0
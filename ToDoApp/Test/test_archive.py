@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from ToDoApp.archive import archive_completed
+from ToDoApp.counters import get_counters
+from ToDoApp.main import app
+from ToDoApp.models import Category, ToDoItem, ToDoItemArchive
+from ToDoApp.routers import dashboard
+from Test.utils import client, engine, override_get_db, TestingSessionLocal, clean_database, test_user
+
+app.dependency_overrides[dashboard.get_db] = override_get_db
+
+
+def test_old_completed_tasks_move_to_archive_in_batches(test_user):
+    long_ago = datetime.utcnow() - timedelta(days=200)
+    db = TestingSessionLocal()
+    db.add_all(
+        [ToDoItem(title=f"Old {i}", priority=2, status="completed", owner_id=test_user.id,
+                  created_at=long_ago, updated_at=long_ago) for i in range(5)]
+        + [
+            ToDoItem(title="Recently done", priority=2, status="completed", owner_id=test_user.id),
+            ToDoItem(title="Old but open", priority=2, status="pending", owner_id=test_user.id,
+                     created_at=long_ago, updated_at=long_ago),
+        ]
+    )
+    db.commit()
+    before = get_counters(db, test_user.id)
+
+    assert archive_completed(engine, older_than_days=90, batch_size=2, max_batches=1, pause=0) == 2
+    assert archive_completed(engine, older_than_days=90, batch_size=2, pause=0) == 3
+
+    assert sorted(t.title for t in db.query(ToDoItem)) == ["Old but open", "Recently done"]
+    assert db.query(ToDoItemArchive).count() == 5
+    db.close()
+
+    live = client.get("/dashboard/api/all-tasks").json()["tasks"]
+    assert len(live) == 2
+    everything = client.get("/dashboard/api/all-tasks?include_archive=true").json()["tasks"]
+    assert len(everything) == 7
+    assert sum(t["archived"] for t in everything) == 5
+
+    db = TestingSessionLocal()
+    # Archiving moves tasks, it does not change the user's totals
+    assert get_counters(db, test_user.id) == before
+    db.close()
+
+
+def test_deleting_a_category_detaches_archived_tasks(test_user):
+    long_ago = datetime.utcnow() - timedelta(days=200)
+    db = TestingSessionLocal()
+    category = Category(name="Archived work")
+    db.add(category)
+    db.flush()
+    db.add(ToDoItem(title="Old", priority=2, status="completed", owner_id=test_user.id,
+                    category_id=category.id, created_at=long_ago, updated_at=long_ago))
+    db.commit()
+    assert archive_completed(engine, older_than_days=90, pause=0) == 1
+
+    # Enforced like on PostgreSQL; the test engine has a single connection
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+    try:
+        response = client.post(f"/todos/category/{category.id}/delete", follow_redirects=False)
+    finally:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    assert response.status_code == 302
+    assert db.query(ToDoItemArchive).one().category_id is None
+    assert db.query(Category).filter(Category.name == "Archived work").count() == 0
+    db.close()
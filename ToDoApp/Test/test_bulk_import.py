@@ -0,0 +1,91 @@
+import io
+import json
+from fastapi import status
+from ToDoApp import bulk_import
+from ToDoApp.bulk_import import import_tasks, parse_json_array
+from ToDoApp.counters import get_counters
+from ToDoApp.events import event_buffer
+from ToDoApp.models import Category, TaskEvent, ToDoItem
+from Test.utils import client, TestingSessionLocal, clean_database, test_user
+
+
+def upload(filename, content, **params):
+    response = client.post("/todos/import", params=params, files={"file": (filename, content.encode())})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_csv_import_reports_bad_rows_and_keeps_counters_in_step(test_user):
+    event_buffer.flush()
+    db = TestingSessionLocal()
+    db.query(TaskEvent).delete()
+    db.query(Category).delete()
+    db.add(Category(name="Work"))
+    db.commit()
+
+    report = upload("tasks.csv", "\n".join([
+        "ID,Title,Description,Status,Priority,Category,Due Date,Tags,Created At",
+        '7,"Call Bob, then Alice",,pending,High,work,2026-11-01,"phone,urgent",2026-01-02 03:04:05',
+        "8,Ship it,,completed,2,Errands,,,",
+        "9,,no title,pending,Low,,,,",
+        "10,Bad date,,pending,Low,,tomorrow,,",
+    ]))
+    assert report["imported"] == 2 and report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [3, 4]
+    assert report["categories_created"] == ["Errands"]
+
+    call = db.query(ToDoItem).filter(ToDoItem.title == "Call Bob, then Alice").one()
+    assert (call.priority, call.tags, call.category.name) == (1, "phone,urgent", "Work")
+    assert call.created_at.year == 2026 and call.due_date.isoformat() == "2026-11-01"
+    counts = get_counters(db, test_user.id)
+    assert (counts["total"], counts["completed"], counts["pending"]) == (2, 1, 1)
+
+    event_buffer.flush()
+    assert db.query(TaskEvent).filter(TaskEvent.user_id == test_user.id).count() == 3
+    db.query(TaskEvent).delete()
+    db.query(Category).delete()
+    db.commit()
+    db.close()
+
+
+def test_json_and_ndjson_imports_in_batches(test_user, monkeypatch):
+    monkeypatch.setattr(bulk_import, "READ_CHUNK", 7)
+    tasks = [{"title": f"Task {i}", "priority": "Medium", "priority_value": 2, "tags": ["a", "b"]} for i in range(5)]
+
+    db = TestingSessionLocal()
+    report = import_tasks(db, test_user.id, io.BytesIO(json.dumps(tasks, indent=2).encode()), "json", batch_size=2)
+    assert report == {"imported": 5, "failed": 0, "errors": [], "categories_created": []}
+
+    report = upload("tasks.ndjson", json.dumps(tasks[0]) + "\n{broken\n\n" + json.dumps({"title": "Late", "status": "done"}) + "\n")
+    assert report["imported"] == 1
+    assert report["errors"] == [{"row": 2, "error": "not a task object"}, {"row": 3, "error": "unknown status 'done'"}]
+    assert db.query(ToDoItem).filter(ToDoItem.owner_id == test_user.id).count() == 6
+    assert db.query(ToDoItem).first().tags == "a,b"
+    db.close()
+
+
+def test_json_array_parser_rejects_unreadable_uploads():
+    assert list(parse_json_array(io.StringIO(" [ ] "))) == []
+    for bad in ('{"title": "x"}', '[{"title": "x"} {"title": "y"}]', '[{"title": "x"},'):
+        try:
+            list(parse_json_array(io.StringIO(bad)))
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {bad!r}")
+
+
+def test_export_round_trips_through_import(test_user):
+    db = TestingSessionLocal()
+    db.add(ToDoItem(title='Quote "this", please', description="line one\nline two", priority=1, owner_id=test_user.id))
+    db.commit()
+
+    # Each import doubles the list
+    for format, imported in (("csv", 1), ("ndjson", 2)):
+        exported = client.get("/todos/export", params={"format": format}).text
+        assert upload(f"export.{format}", exported)["imported"] == imported
+    todos = db.query(ToDoItem).filter(ToDoItem.owner_id == test_user.id).all()
+    assert {(todo.title, todo.description, todo.priority) for todo in todos} == {
+        ('Quote "this", please', "line one\nline two", 1)
+    }
+    assert len(todos) == 4
+    db.close()
@@ -0,0 +1,256 @@
+import asyncio
+from datetime import date, timedelta
+import pytest
+from ToDoApp.main import app
+from ToDoApp.models import Category, ToDoItem
+from ToDoApp.recommendations import recommend_tasks
+from ToDoApp.routers import auth, chatbot
+from ToDoApp.routers.chatbot_ai import NormalizationProvider, Normalizer
+from ToDoApp.routers.chatbot_index import TitleIndex
+from ToDoApp.routers.chatbot_nlp import parse_message, scan_keywords, split_commands, GROUP_BITS
+from Test.utils import client, override_get_db, TestingSessionLocal, clean_database, test_user
+
+app.dependency_overrides[chatbot.get_db] = override_get_db
+
+
+def test_parse_create_extracts_all_slots():
+    parsed = parse_message("Add task: Finish report with description quarterly numbers, priority 2")
+    assert parsed.intent == "create"
+    assert parsed.title == "Finish report"
+    assert parsed.description == "quarterly numbers"
+    assert parsed.priority == 2
+
+
+def test_parse_update_and_delete_read_task_id():
+    parsed = parse_message("Update task #12, status completed")
+    assert (parsed.intent, parsed.task_id, parsed.status) == ("update", 12, "completed")
+    assert parse_message("remove task 21").task_id == 21
+
+
+def test_parse_list_filters():
+    parsed = parse_message("Show tasks with medium priority and status progress")
+    assert parsed.intent == "list"
+    assert parsed.filter_priority == 2
+    assert parsed.status == "progress"
+
+
+def test_study_plan_is_reachable():
+    assert parse_message("I need a study plan").intent == "study_plan"
+    assert parse_message("plan my week").intent == "suggest"
+
+
+def test_scan_finds_overlapping_keywords():
+    # "my tasks" contains "task"; "in progress" contains "progress"
+    mask = scan_keywords("my tasks in progress")
+    for group in ("list", "task", "status", "status_progress"):
+        assert mask & GROUP_BITS[group]
+
+
+def test_category_matcher_compiles_once_and_rebuilds_on_change():
+    db = TestingSessionLocal()
+    db.query(Category).delete()
+    db.add_all([Category(name="Work"), Category(name="Homework")])
+    db.commit()
+    work_id = db.query(Category.id).filter(Category.name == "Work").scalar()
+    chatbot.category_matcher.invalidate()
+
+    rebuilds = chatbot.category_matcher.rebuilds
+    assert chatbot.extract_category_name("show my homework tasks", db) is not None
+    assert chatbot.extract_category_name("show WORK tasks", db) == work_id
+    assert chatbot.extract_category_name("show all tasks", db) is None
+    assert chatbot.category_matcher.rebuilds == rebuilds + 1
+
+    db.add(Category(name="Errands"))
+    db.commit()
+    assert chatbot.extract_category_name("list errands", db) is not None
+    assert chatbot.category_matcher.rebuilds == rebuilds + 2
+
+    db.query(Category).delete()
+    db.commit()
+    db.close()
+    chatbot.category_matcher.invalidate()
+
+
+def _chat(message):
+    response = client.post("/chatbot/chat", json={"message": message})
+    assert response.status_code == 200
+    return response.json()["reply"]
+
+
+def test_list_reply_is_paginated_with_continuation(test_user):
+    db = TestingSessionLocal()
+    db.add_all([
+        ToDoItem(title=f"Task {i}", description="d" * 80, priority=1, owner_id=test_user.id)
+        for i in range(chatbot.LIST_PAGE_SIZE + 3)
+    ])
+    db.commit()
+    db.close()
+
+    first = _chat("Show all tasks")
+    assert f"({chatbot.LIST_PAGE_SIZE + 3} total, showing 1-{chatbot.LIST_PAGE_SIZE})" in first
+    assert first.count("**#") == chatbot.LIST_PAGE_SIZE
+    assert "d" * 50 + "..." in first
+    token = first.split("show more ")[1].split("'")[0]
+
+    second = _chat(f"show more {token}")
+    assert second.count("**#") == 3
+    assert "show more" not in second.split("— ")[0]
+    assert "Task 0" in second
+
+    # A bare "show more" continues from the user's last page
+    _chat("Show all tasks")
+    assert _chat("more").count("**#") == 3
+
+
+class SlowProvider(NormalizationProvider):
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def normalize(self, message):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return message.upper()
+
+
+@pytest.mark.asyncio
+async def test_normalizer_caches_and_caps_concurrency():
+    provider = SlowProvider(0.01)
+    normalizer = Normalizer(provider, timeout=1, max_concurrency=2, cache_size=10)
+
+    results = await asyncio.gather(*(normalizer.normalize(f"msg {i}") for i in range(6)))
+    assert results[0] == "MSG 0"
+    assert provider.peak == 2
+
+    assert await normalizer.normalize("msg 0") == "MSG 0"
+    assert normalizer.cache_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_normalizer_falls_back_to_raw_message_on_timeout():
+    normalizer = Normalizer(SlowProvider(1), timeout=0.01, max_concurrency=1, cache_size=10)
+    assert await normalizer.normalize("create task: x") == "create task: x"
+    assert normalizer.timeouts == 1
+
+
+def test_websocket_streams_list_and_reuses_connection(test_user):
+    app.dependency_overrides[auth.get_current_ws_user] = app.dependency_overrides[auth.get_current_user]
+    db = TestingSessionLocal()
+    db.add_all([ToDoItem(title=f"Socket task {i}", priority=2, owner_id=test_user.id) for i in range(3)])
+    db.commit()
+    db.close()
+
+    with client.websocket_connect("/chatbot/ws") as ws:
+        ws.send_text("show my tasks")
+        chunks = []
+        while True:
+            frame = ws.receive_json()
+            if frame["type"] == "done":
+                break
+            chunks.append(frame["text"])
+        assert len(chunks) > 3
+        assert "Socket task 2" in "".join(chunks)
+
+        ws.send_json({"message": "Create task: Streamed"})
+        frame = ws.receive_json()
+        assert "Streamed" in frame["text"]
+        assert ws.receive_json()["type"] == "done"
+
+    del app.dependency_overrides[auth.get_current_ws_user]
+
+
+def test_split_commands():
+    assert split_commands("create task: a\n2. create task: b; delete task #3") == [
+        "create task: a", "create task: b", "delete task #3"
+    ]
+    assert split_commands("1) add task: x 2) add task: y") == ["add task: x", "add task: y"]
+    assert split_commands("Update task #1: priority 2. Thanks") == ["Update task #1: priority 2. Thanks"]
+
+
+def test_multi_command_message_runs_in_one_transaction(test_user):
+    db = TestingSessionLocal()
+    doomed = ToDoItem(title="Doomed", priority=3, owner_id=test_user.id)
+    db.add(doomed)
+    db.commit()
+    doomed_id = doomed.id
+    db.close()
+
+    reply = _chat(
+        "1. Create task: Buy milk\n"
+        "2. Create task: Call mom\n"
+        f"3. Delete task #{doomed_id}\n"
+        "4. Delete task #999"
+    )
+    assert "Ran 4 commands (3 changes saved together)" in reply
+    assert "created: Buy milk" in reply
+    assert "Task #999 not found" in reply
+
+    db = TestingSessionLocal()
+    titles = sorted(t.title for t in db.query(ToDoItem).filter(ToDoItem.owner_id == test_user.id))
+    db.close()
+    assert titles == ["Buy milk", "Call mom"]
+
+
+def test_title_index_tolerates_typos_and_reports_ambiguity():
+    index = TitleIndex([(1, "Buy groceries"), (2, "Buy milk"), (3, "Finish quarterly report")])
+    assert index.resolve("grocerys")[0].task_id == 1
+    assert index.resolve("quarterly reprot")[0].task_id == 3
+
+    match, candidates = index.resolve("buy")
+    assert match is None
+    assert {c.task_id for c in candidates} == {1, 2}
+
+
+def test_commands_can_name_tasks_by_title(test_user):
+    chatbot.title_index.invalidate()
+    db = TestingSessionLocal()
+    db.add_all([
+        ToDoItem(title="Buy groceries", priority=1, status="pending", owner_id=test_user.id),
+        ToDoItem(title="Call mom", priority=2, status="pending", owner_id=test_user.id),
+    ])
+    db.commit()
+    db.close()
+
+    assert parse_message("complete buy groceries").target == "buy groceries"
+    assert "updated successfully" in _chat("complete buy grocerys")
+    assert "deleted successfully" in _chat("delete 'call mom'")
+    # The index was rebuilt after the delete
+    assert "No task matching" in _chat("delete call mom")
+
+    db = TestingSessionLocal()
+    todo = db.query(ToDoItem).filter(ToDoItem.owner_id == test_user.id).one()
+    db.close()
+    assert (todo.title, todo.status, todo.priority) == ("Buy groceries", "completed", 1)
+
+
+def test_suggestions_are_ranked_in_sql(test_user):
+    chatbot.title_index.invalidate()
+    today = date.today()
+    db = TestingSessionLocal()
+    db.add_all([
+        ToDoItem(title="Low someday", priority=3, owner_id=test_user.id),
+        ToDoItem(title="High no deadline", priority=1, owner_id=test_user.id),
+        ToDoItem(title="Medium overdue", priority=2, due_date=today - timedelta(days=2), owner_id=test_user.id),
+        ToDoItem(title="High done", priority=1, status="completed", owner_id=test_user.id),
+        ToDoItem(title="Study for exam", priority=3, due_date=today + timedelta(days=1), owner_id=test_user.id),
+        ToDoItem(title="Studying chemistry", priority=1, owner_id=test_user.id),
+    ])
+    db.commit()
+
+    ranked = [t.title for t in recommend_tasks(db, test_user.id, limit=10)]
+    db.close()
+    assert ranked[0] == "Medium overdue"
+    assert "High done" not in ranked
+    assert ranked[-1] == "Low someday"
+
+    reply = _chat("what should I do next?")
+    assert "I suggest starting with 'Medium overdue'" in reply
+    assert "overdue by 2 days" in reply
+
+    plan = _chat("I need a study plan")
+    # Equal scores (high priority vs. low due tomorrow): the deadline breaks the tie
+    assert plan.index("Study for exam") < plan.index("Studying chemistry")
+    assert "Low someday" not in plan
@@ -0,0 +1,81 @@
+from sqlalchemy import insert
+from ToDoApp import counters
+from ToDoApp.counters import get_counters, rebuild_counters
+from ToDoApp.models import Category, ToDoItem, UserTaskCounters
+from Test.utils import TestingSessionLocal, clean_database, engine, test_user
+
+
+def test_counters_follow_inserts_updates_and_deletes(test_user):
+    db = TestingSessionLocal()
+    a = ToDoItem(title="A", priority=1, owner_id=test_user.id)
+    b = ToDoItem(title="B", priority=3, status="progress", owner_id=test_user.id)
+    db.add_all([a, b])
+    db.commit()
+    assert get_counters(db, test_user.id) == {
+        "total": 2, "pending": 1, "progress": 1, "completed": 0,
+        "priority_high": 1, "priority_medium": 0, "priority_low": 1,
+    }
+
+    a.status = "completed"
+    b.priority = 2
+    db.commit()
+    counts = get_counters(db, test_user.id)
+    assert (counts["pending"], counts["completed"]) == (0, 1)
+    assert (counts["priority_medium"], counts["priority_low"]) == (1, 0)
+
+    db.delete(a)
+    db.commit()
+    counts = get_counters(db, test_user.id)
+    assert (counts["total"], counts["completed"], counts["priority_high"]) == (1, 0, 0)
+    db.close()
+
+
+def test_rollback_discards_counter_changes(test_user):
+    db = TestingSessionLocal()
+    assert get_counters(db, test_user.id)["total"] == 0
+    db.add(ToDoItem(title="Never saved", priority=2, owner_id=test_user.id))
+    db.flush()
+    db.rollback()
+    assert get_counters(db, test_user.id)["total"] == 0
+    db.close()
+
+
+def test_rebuild_repairs_drift_from_bulk_updates(test_user):
+    db = TestingSessionLocal()
+    db.add_all([ToDoItem(title=f"T{i}", priority=2, owner_id=test_user.id) for i in range(3)])
+    db.commit()
+    # Bulk statements bypass the ORM flush hooks
+    db.query(ToDoItem).filter(ToDoItem.title == "T0").update({"status": "completed"})
+    db.commit()
+    assert get_counters(db, test_user.id)["completed"] == 0
+
+    rebuild_counters(db)
+    db.commit()
+    assert get_counters(db, test_user.id)["completed"] == 1
+    assert db.query(UserTaskCounters).count() == 1
+    db.close()
+
+
+def test_rebuilding_a_missing_row_leaves_the_callers_session_alone(test_user):
+    db = TestingSessionLocal()
+    db.add(Category(name="Not committed"))
+    assert get_counters(db, test_user.id)["total"] == 0
+    db.rollback()
+    assert db.query(Category).filter(Category.name == "Not committed").count() == 0
+    assert db.get(UserTaskCounters, test_user.id) is not None
+    db.close()
+
+
+def test_concurrent_rebuild_reads_the_row_that_won(test_user, monkeypatch):
+    source = counters.counts_from_source
+
+    def racing_source(user_ids):
+        # Another request creates the row between the count and the insert
+        with engine.begin() as connection:
+            connection.execute(insert(UserTaskCounters).values(user_id=test_user.id, total=7))
+        return source(user_ids)
+
+    monkeypatch.setattr(counters, "counts_from_source", racing_source)
+    db = TestingSessionLocal()
+    assert get_counters(db, test_user.id)["total"] == 7
+    db.close()
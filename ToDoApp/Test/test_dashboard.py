@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from fastapi import status
+from ToDoApp.main import app
+from ToDoApp.models import ToDoItem, Users
+from ToDoApp.routers import auth, dashboard
+from ToDoApp.timewindows import day_window, local_today
+from Test.utils import client, override_get_db, TestingSessionLocal, clean_database, test_user
+
+app.dependency_overrides[dashboard.get_db] = override_get_db
+
+
+def _login_as(user_id, role):
+    app.dependency_overrides[auth.get_current_user] = lambda: {
+        "username": f"{role}-user", "user_id": user_id, "user_role": role
+    }
+
+
+def test_team_dashboard_requires_manager(test_user):
+    response = client.get("/dashboard/api/team")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_team_dashboard_aggregates_and_ranks_members(test_user):
+    db = TestingSessionLocal()
+    other = Users(email="other@example.com", username="other", role="user", hashed_password="x")
+    db.add(other)
+    db.commit()
+    db.add_all([
+        ToDoItem(title="A", priority=1, status="completed", owner_id=other.id),
+        ToDoItem(title="B", priority=1, status="completed", owner_id=other.id),
+        ToDoItem(title="C", priority=2, status="pending", owner_id=test_user.id),
+        ToDoItem(title="D", priority=2, status="completed", owner_id=test_user.id),
+    ])
+    db.commit()
+    other_id = other.id
+    db.close()
+    dashboard.team_stats_cache.invalidate()
+    _login_as(test_user.id, "manager")
+
+    response = client.get("/dashboard/api/team")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["totals"]["total"] == 4
+    assert data["totals"]["completed"] == 3
+    assert data["totals"]["completed_recently"] == 3
+
+    leaders = data["leaderboard"]
+    assert [m["user_id"] for m in leaders] == [other_id, test_user.id]
+    assert [m["rank"] for m in leaders] == [1, 2]
+    assert leaders[1]["completion_rate"] == 50.0
+
+    # Served from the TTL cache until it expires
+    db = TestingSessionLocal()
+    db.add(ToDoItem(title="E", priority=3, owner_id=test_user.id))
+    db.commit()
+    db.close()
+    assert client.get("/dashboard/api/team").json()["totals"]["total"] == 4
+
+
+def test_day_window_is_half_open_utc_and_dst_aware():
+    berlin = ZoneInfo("Europe/Berlin")
+    assert day_window(date(2024, 7, 1), berlin) == (datetime(2024, 6, 30, 22), datetime(2024, 7, 1, 22))
+    # Clocks go back on 27 Oct 2024: that local day is 25 hours long
+    start, end = day_window(date(2024, 10, 27), berlin)
+    assert end - start == timedelta(hours=25)
+    assert local_today(berlin, now=datetime(2024, 6, 30, 23, tzinfo=timezone.utc)) == date(2024, 7, 1)
+
+
+def test_today_tasks_follow_the_users_timezone(test_user):
+    tz = ZoneInfo("Pacific/Kiritimati")  # UTC+14: local "today" starts well before UTC midnight
+    start, end = day_window(local_today(tz), tz)
+    db = TestingSessionLocal()
+    db.add_all([
+        ToDoItem(title="Start of local day", priority=1, owner_id=test_user.id, created_at=start),
+        ToDoItem(title="Local yesterday", priority=1, owner_id=test_user.id, created_at=start - timedelta(seconds=1)),
+        ToDoItem(title="Local tomorrow", priority=1, owner_id=test_user.id, created_at=end),
+    ])
+    db.commit()
+    db.close()
+
+    response = client.get("/dashboard/api/today-tasks", headers={"X-Timezone": "Pacific/Kiritimati"})
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [t["title"] for t in body["tasks"]] == ["Start of local day"]
+    assert body["timezone"] == "Pacific/Kiritimati"
+
+    analytics = client.get("/dashboard/api/analytics", headers={"X-Timezone": "Pacific/Kiritimati"}).json()["data"]
+    assert [d["count"] for d in analytics[-2:]] == [1, 1]
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from ToDoApp.events import event_buffer, run_rollup
+from ToDoApp.main import app
+from ToDoApp.models import RollupCursor, TaskDailyStats, TaskEvent, ToDoItem
+from ToDoApp.routers import dashboard
+from Test.utils import client, override_get_db, TestingSessionLocal, clean_database, test_user
+
+app.dependency_overrides[dashboard.get_db] = override_get_db
+
+
+def _reset_event_log(db):
+    event_buffer.flush()
+    db.query(TaskEvent).delete()
+    db.query(TaskDailyStats).delete()
+    db.query(RollupCursor).delete()
+    db.commit()
+
+
+def test_mutations_are_logged_only_after_commit(test_user):
+    db = TestingSessionLocal()
+    _reset_event_log(db)
+
+    todo = ToDoItem(title="Logged", priority=2, owner_id=test_user.id)
+    db.add(todo)
+    db.commit()
+    todo.status = "completed"
+    db.commit()
+    todo.status = "pending"
+    db.commit()
+    todo.title = "Renamed"
+    db.flush()
+    db.rollback()
+    db.delete(todo)
+    db.commit()
+
+    assert event_buffer.flush() == 4
+    types = [e.event_type for e in db.query(TaskEvent).order_by(TaskEvent.id)]
+    assert types == ["created", "completed", "reopened", "deleted"]
+    db.close()
+
+
+def test_rollup_is_incremental_and_feeds_productivity_chart(test_user):
+    db = TestingSessionLocal()
+    _reset_event_log(db)
+
+    db.add_all([ToDoItem(title=f"T{i}", priority=2, owner_id=test_user.id) for i in range(3)])
+    db.commit()
+    done = db.query(ToDoItem).filter(ToDoItem.title == "T0").one()
+    done.status = "completed"
+    db.commit()
+    event_buffer.flush()
+
+    assert run_rollup(db, lag=timedelta(0)) == 4
+    assert run_rollup(db, lag=timedelta(0)) == 0
+
+    db.delete(done)
+    db.commit()
+    event_buffer.flush()
+    assert run_rollup(db, lag=timedelta(0)) == 1
+    db.close()
+
+    data = client.get("/dashboard/api/productivity?days=7").json()["data"]
+    assert len(data) == 7
+    assert (data[-1]["created"], data[-1]["completed"], data[-1]["deleted"]) == (3, 1, 1)
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta
+from fastapi import status
+from ToDoApp.jobs import JOB_DIR, MAX_ACTIVE_JOBS, JobRunner
+from ToDoApp.models import Job, ToDoItem
+from Test.utils import client, TestingSessionLocal, clean_database, test_user
+
+
+def test_export_job_reports_progress_and_serves_a_compressed_file(test_user):
+    db = TestingSessionLocal()
+    db.add_all([ToDoItem(title=f"Task {i}", priority=2, owner_id=test_user.id) for i in range(3)])
+    db.commit()
+    db.close()
+
+    response = client.post("/jobs/export", params={"format": "csv"})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = client.get(response.headers["Location"]).json()
+    assert (job["status"], job["progress"], job["total"]) == ("succeeded", 3, 3)
+
+    download = client.get(job["download_url"])
+    assert download.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(io.StringIO(gzip.decompress(download.content).decode())))
+    assert rows[0][1] == "Title" and sorted(row[1] for row in rows[1:]) == ["Task 0", "Task 1", "Task 2"]
+    assert [listed["id"] for listed in client.get("/jobs/").json()] == [job["id"]]
+
+
+def test_import_job_keeps_the_report(test_user):
+    upload = "title,status\nWrite report,pending\n,completed\n"
+    response = client.post("/jobs/import", files={"file": ("tasks.csv", upload.encode())})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    job = client.get(f"/jobs/{response.json()['id']}").json()
+    assert job["status"] == "succeeded" and job["download_url"] is None
+    assert job["result"]["imported"] == 1 and job["result"]["errors"][0]["row"] == 2
+    db = TestingSessionLocal()
+    assert db.query(ToDoItem).filter(ToDoItem.owner_id == test_user.id).one().title == "Write report"
+    db.close()
+
+
+def test_jobs_are_private_to_their_owner(test_user):
+    db = TestingSessionLocal()
+    other = Job(owner_id=test_user.id + 1, kind="export", status="succeeded", params="{}")
+    db.add(other)
+    db.commit()
+    assert client.get(f"/jobs/{other.id}").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"/jobs/{other.id}/download").status_code == status.HTTP_404_NOT_FOUND
+    db.close()
+
+
+def test_runner_threads_pick_up_recovered_jobs(test_user):
+    db = TestingSessionLocal()
+    queued = Job(owner_id=test_user.id, kind="export", params='{"format": "ndjson"}')
+    lost = Job(owner_id=test_user.id, kind="export", status="running", params='{"format": "csv"}',
+               updated_at=datetime.utcnow() - timedelta(hours=1))
+    db.add_all([queued, lost])
+    db.commit()
+
+    runner = JobRunner(workers=1, background=True)
+    runner.session_factory = lambda owner_id=None: TestingSessionLocal()
+    runner.recover()
+    runner._queue.join()
+
+    db.expire_all()
+    assert db.get(Job, queued.id).status == "succeeded"
+    assert db.get(Job, lost.id).status == "failed"
+    assert runner.snapshot()["completed"] == 1
+    db.close()
+
+
+def test_import_over_the_limit_is_refused_without_leaving_its_upload(test_user):
+    db = TestingSessionLocal()
+    db.add_all([Job(owner_id=test_user.id, kind="export", status="running", params="{}")
+                for _ in range(MAX_ACTIVE_JOBS)])
+    db.commit()
+
+    response = client.post("/jobs/import", files={"file": ("tasks.csv", b"title\nLate\n")})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert db.query(Job).filter(Job.kind == "import").count() == 0
+    assert list(JOB_DIR.glob("*.part")) == []
+    db.close()
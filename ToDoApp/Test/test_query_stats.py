@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import select
+from ToDoApp.models import Category, ToDoItem
+from ToDoApp.query_stats import assert_max_queries
+from Test.utils import client, TestingSessionLocal, clean_database, test_user
+
+
+def test_responses_report_query_count_and_time(test_user):
+    response = client.get("/todos/api/changes")
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) >= 2
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_export_queries_do_not_grow_with_the_task_count(test_user):
+    db = TestingSessionLocal()
+    db.query(Category).delete()
+    categories = [Category(name=f"Category {i}") for i in range(3)]
+    db.add_all(categories)
+    db.flush()
+    db.add_all([
+        ToDoItem(title=f"Task {i}", description="text", priority=2, owner_id=test_user.id,
+                 category_id=categories[i % 3].id)
+        for i in range(30)
+    ])
+    db.commit()
+
+    with assert_max_queries(3):
+        response = client.get("/todos/export", params={"format": "json"})
+    assert len(response.json()) == 30
+    db.query(Category).delete()
+    db.commit()
+    db.close()
+
+
+def test_assert_max_queries_names_the_extra_statements():
+    db = TestingSessionLocal()
+    with pytest.raises(AssertionError, match="SELECT 1"):
+        with assert_max_queries(0):
+            db.execute(select(1))
+    db.close()
@@ -0,0 +1,67 @@
+from fastapi import status
+from ToDoApp.main import app
+from ToDoApp.models import ToDoItem, Users
+from ToDoApp.routers import auth, dashboard, admin
+from ToDoApp.routers.rbac import Permission, principal_from_user, resolve_role
+from Test.utils import client, override_get_db, TestingSessionLocal, clean_database, test_user
+
+app.dependency_overrides[dashboard.get_db] = override_get_db
+app.dependency_overrides[admin.get_db] = override_get_db
+
+
+def _login_as(user_id, role):
+    app.dependency_overrides[auth.get_current_user] = lambda: {
+        "username": f"{role}-user", "user_id": user_id, "user_role": role
+    }
+
+
+def _seed_other_users_todo():
+    db = TestingSessionLocal()
+    other = Users(email="other@example.com", username="other", role="user", hashed_password="x")
+    db.add(other)
+    db.commit()
+    db.add(ToDoItem(title="Other user's task", priority=2, owner_id=other.id))
+    db.commit()
+    other_id = other.id
+    db.close()
+    return other_id
+
+
+def test_role_masks_are_cumulative():
+    assert resolve_role("Manager")[2] & Permission.VIEW_ALL_TASKS
+    assert not resolve_role("manager")[2] & Permission.MANAGE_ALL_TASKS
+    assert resolve_role("superuser")[2] == resolve_role("admin")[2]
+    assert resolve_role("nonsense")[1] == 0
+
+    principal = principal_from_user({"user_id": 1, "user_role": "ADMIN"})
+    assert principal.is_admin and principal.is_manager
+
+
+def test_user_sees_only_own_tasks(test_user):
+    _seed_other_users_todo()
+    db = TestingSessionLocal()
+    db.add(ToDoItem(title="Mine", priority=1, owner_id=test_user.id))
+    db.commit()
+    db.close()
+
+    response = client.get("/dashboard/api/all-tasks")
+    assert response.status_code == status.HTTP_200_OK
+    titles = [t["title"] for t in response.json()["tasks"]]
+    assert titles == ["Mine"]
+
+
+def test_manager_sees_all_tasks_and_can_narrow_by_owner(test_user):
+    other_id = _seed_other_users_todo()
+    _login_as(test_user.id, "manager")
+
+    response = client.get("/dashboard/api/all-tasks")
+    assert len(response.json()["tasks"]) == 1
+
+    response = client.get(f"/dashboard/api/all-tasks?owner_id={other_id}")
+    assert response.json()["tasks"][0]["owner_id"] == other_id
+
+
+def test_manager_cannot_use_admin_endpoints(test_user):
+    _login_as(test_user.id, "manager")
+    response = client.delete("/admin/todo/1")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect
+from ToDoApp.models import Category, ToDoItem
+from ToDoApp.query_stats import assert_max_queries
+from ToDoApp.read_models import DESCRIPTION_PREVIEW, fetch_task_page, recent_tasks, task_list_filters
+from Test.utils import TestingSessionLocal, clean_database, test_user
+
+
+def test_list_pages_are_projected_rows_with_a_description_preview(test_user):
+    db = TestingSessionLocal()
+    db.query(Category).delete()
+    work = Category(name="Work")
+    db.add(work)
+    db.flush()
+    db.add_all(
+        [ToDoItem(title=f"Task {i}", description="x" * 200, priority=2, owner_id=test_user.id) for i in range(5)]
+        + [ToDoItem(title="Filed", description="short", priority=1, owner_id=test_user.id, category_id=work.id)]
+    )
+    db.commit()
+
+    criteria = task_list_filters(test_user.id)
+    # The count and one joined SELECT, however many rows the page holds
+    with assert_max_queries(2):
+        first, total = fetch_task_page(db, criteria, "title", "asc", page=1, per_page=4)
+    second, _ = fetch_task_page(db, criteria, "title", "asc", page=2, per_page=4)
+    assert total == 6
+    assert [row.title for row in first + second] == ["Filed"] + [f"Task {i}" for i in range(5)]
+    assert first[0].category_name == "Work" and first[0].description == "short"
+    assert len(first[1].description) == DESCRIPTION_PREVIEW + 1
+
+    rows, total = fetch_task_page(db, task_list_filters(test_user.id, search="filed"), None, None, 1, 20)
+    assert total == 1 and rows[0].title == "Filed"
+    assert recent_tasks(db, test_user.id, limit=2)[0].created_at_iso is not None
+
+    # Entities leave the description unloaded until something asks for it
+    task = db.query(ToDoItem).filter(ToDoItem.title == "Filed").one()
+    assert "description" in inspect(task).unloaded
+    db.query(Category).delete()
+    db.commit()
+    db.close()
@@ -0,0 +1,62 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from starlette.middleware.sessions import SessionMiddleware
+from ToDoApp.counters import get_counters
+from ToDoApp.models import Base, ToDoItem, Users
+from ToDoApp.replicas import ReadYourWritesMiddleware, is_pinned
+from ToDoApp.sharding import ShardRouter
+
+
+def make_router(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(bind=engine)
+    return ShardRouter({"shard0": primary}, primary, replicas=[replica]), primary, replica
+
+
+def test_read_sessions_select_from_the_replica_and_write_to_the_primary(tmp_path):
+    router, primary, replica = make_router(tmp_path)
+    with router.session() as db:
+        user = Users(username="reader", email="reader@example.com", role="user")
+        db.add(user)
+        db.commit()
+        db.add(ToDoItem(title="On the primary", priority=2, owner_id=user.id))
+        db.commit()
+        user_id = user.id
+
+    with router.session(user_id, read_only=True) as db:
+        # The replica has not caught up yet
+        assert db.execute(select(ToDoItem.id)).first() is None
+        assert db.get(Users, user_id) is None
+        # Counter rebuilds are written, and read back, on the primary
+        assert get_counters(db, user_id)["total"] == 1
+
+    with router.session(user_id) as db:
+        assert db.execute(select(ToDoItem.title)).scalar() == "On the primary"
+    with replica.connect() as conn:
+        assert conn.execute(select(ToDoItem.id)).first() is None
+
+
+def test_writes_pin_the_user_to_the_primary_for_a_while():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, seconds=60)
+    app.add_middleware(SessionMiddleware, secret_key="test")
+
+    @app.post("/login")
+    async def login(request: Request):
+        request.session["user"] = {"user_id": 1}
+        return {}
+
+    @app.get("/pinned")
+    async def pinned(request: Request):
+        return {"pinned": is_pinned(request.session)}
+
+    client = TestClient(app)
+    assert client.get("/pinned").json() == {"pinned": False}
+    client.post("/login")
+    assert client.get("/pinned").json() == {"pinned": True}
+
+    fresh = TestClient(app)
+    assert fresh.get("/pinned").json() == {"pinned": False}
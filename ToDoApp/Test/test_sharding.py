@@ -0,0 +1,157 @@
+import asyncio
+from datetime import date
+from sqlalchemy import create_engine, event, select
+from ToDoApp.models import Base, Category, ToDoItem, UserTaskCounters, Users
+from ToDoApp.routers import admin, dashboard, todos
+from ToDoApp.sharding import HashRing, ShardRouter, shard_metadata
+
+
+def enforce_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def make_router(tmp_path, shards=3, foreign_keys=False):
+    engines = {}
+    for index in range(shards):
+        engines[f"shard{index}"] = create_engine(f"sqlite:///{tmp_path / f'shard{index}.db'}")
+        if foreign_keys:
+            event.listen(engines[f"shard{index}"], "connect", enforce_foreign_keys)
+        # shard0 is the primary, the others get the shard schema like in main.py
+        metadata = Base.metadata if index == 0 else shard_metadata()
+        metadata.create_all(bind=engines[f"shard{index}"])
+    return ShardRouter(engines, primary=engines["shard0"])
+
+
+def add_user(router, username):
+    with router.session() as db:
+        user = Users(username=username, email=f"{username}@example.com", role="user")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_ring_spreads_owners_and_moves_few_when_a_shard_is_added():
+    ring = HashRing(["shard0", "shard1", "shard2"])
+    owners = range(1, 3001)
+    before = {owner: ring.node_for(owner) for owner in owners}
+    assert all(list(before.values()).count(shard) > 600 for shard in ("shard0", "shard1", "shard2"))
+
+    grown = HashRing(["shard0", "shard1", "shard2", "shard3"])
+    moved = [owner for owner in owners if grown.node_for(owner) != before[owner]]
+    assert len(moved) < len(owners) * 0.4
+    assert all(grown.node_for(owner) == "shard3" for owner in moved)
+
+
+def test_tasks_and_counters_live_on_the_owners_shard(tmp_path):
+    router = make_router(tmp_path)
+    user_ids = [add_user(router, f"user{i}") for i in range(12)]
+
+    for user_id in user_ids:
+        with router.session(user_id) as db:
+            db.add(ToDoItem(title=f"Task of {user_id}", priority=2, owner_id=user_id))
+            db.commit()
+
+    for name, engine in router.engines.items():
+        with engine.connect() as conn:
+            owners = set(conn.execute(select(ToDoItem.owner_id)).scalars())
+            counter_owners = set(conn.execute(select(UserTaskCounters.user_id)).scalars())
+        assert owners == {u for u in user_ids if router.shard_for(u) == name}
+        assert counter_owners == owners
+    # Users stay on the primary
+    with router.engines["shard1"].connect() as conn:
+        assert conn.execute(select(Users.id)).first() is None
+
+
+def test_shards_accept_tasks_with_foreign_keys_enforced(tmp_path):
+    router = make_router(tmp_path, foreign_keys=True)
+    user_ids = [add_user(router, f"user{i}") for i in range(12)]
+    assert {router.shard_for(user_id) for user_id in user_ids} == set(router.engines)
+
+    for user_id in user_ids:
+        with router.session(user_id) as db:
+            db.add(ToDoItem(title=f"Task of {user_id}", priority=2, owner_id=user_id))
+            db.commit()
+            task = db.query(ToDoItem).filter(ToDoItem.owner_id == user_id).one()
+            task.status = "completed"
+            db.commit()
+
+    for name, engine in router.engines.items():
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+            assert conn.execute(select(UserTaskCounters.completed)).scalars().all() == [1] * sum(
+                router.shard_for(user_id) == name for user_id in user_ids
+            )
+
+
+def test_categories_are_written_on_the_primary_and_replicated(tmp_path, monkeypatch):
+    router = make_router(tmp_path, shards=2, foreign_keys=True)
+    monkeypatch.setattr(todos, "shard_router", router)
+    user_ids = [add_user(router, f"grouped{i}") for i in range(6)]
+    owners = {router.shard_for(user_id): user_id for user_id in user_ids}
+    assert set(owners) == {"shard0", "shard1"}
+
+    with router.session(owners["shard0"]) as db:
+        db.add(Category(name="Work"))
+        db.commit()
+        category_id = db.query(Category).filter(Category.name == "Work").one().id
+    for user_id in owners.values():
+        with router.session(user_id) as db:
+            db.add(ToDoItem(title="Report", priority=1, owner_id=user_id, category_id=category_id))
+            db.commit()
+
+    for engine in router.engines.values():
+        with engine.connect() as conn:
+            assert conn.execute(select(Category.name)).scalars().all() == ["Work"]
+
+    # Deleted from a session on the primary, while shard1 still has a task using it
+    with router.session(owners["shard0"]) as db:
+        asyncio.run(todos.delete_category(category_id, db, {"user_id": owners["shard0"]}))
+    for engine in router.engines.values():
+        with engine.connect() as conn:
+            assert conn.execute(select(Category.id)).first() is None
+            assert conn.execute(select(ToDoItem.category_id).where(ToDoItem.category_id.isnot(None))).first() is None
+            assert conn.execute(select(ToDoItem.id)).first() is not None
+
+
+def test_admin_pages_merge_shards_with_per_shard_cursors(tmp_path, monkeypatch):
+    router = make_router(tmp_path)
+    monkeypatch.setattr(admin, "shard_router", router)
+    user_ids = [add_user(router, f"member{i}") for i in range(6)]
+    for user_id in user_ids:
+        with router.session(user_id) as db:
+            db.add_all([ToDoItem(title=f"{user_id}-{n}", priority=3, owner_id=user_id) for n in range(3)])
+            db.commit()
+
+    query = admin.build_admin_todo_query("title,owner_id", None, None, None, None, None)
+    seen, positions = [], {}
+    with router.session() as db:
+        while True:
+            rows, positions = admin.fetch_todo_page(db, query, positions, limit=4)
+            seen.extend((row.owner_id, row.title) for row in rows)
+            if positions is None:
+                break
+            positions = admin.decode_cursor(admin.encode_cursor(positions))
+
+        assert len(seen) == len(set(seen)) == 18
+
+        page = admin.fetch_member_page(db, None, page=1, per_page=10, today=date.today())
+    assert page["pagination"]["total_count"] == 6
+    assert [m["total"] for m in page["members"]] == [3] * 6
+
+
+def test_team_leaderboard_merges_shards_with_shared_ranks(tmp_path, monkeypatch):
+    router = make_router(tmp_path)
+    monkeypatch.setattr(dashboard, "shard_router", router)
+    completed = [3, 1, 3, 0, 2, 1]
+    user_ids = [add_user(router, f"member{i}") for i in range(len(completed))]
+    for user_id, done in zip(user_ids, completed):
+        with router.session(user_id) as db:
+            db.add_all([ToDoItem(title="Done", priority=2, status="completed", owner_id=user_id) for _ in range(done)])
+            db.add(ToDoItem(title="Open", priority=2, owner_id=user_id))
+            db.commit()
+
+    with router.session() as db:
+        stats = dashboard.compute_team_stats(db, date.today(), leaderboard_size=4)
+    assert stats["totals"]["total"] == 16
+    leaders = [(m["rank"], m["username"]) for m in stats["leaderboard"]]
+    assert leaders == [(1, "member0"), (1, "member2"), (3, "member4"), (4, "member1")]
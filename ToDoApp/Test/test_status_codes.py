@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from ToDoApp.main import init_db
+from ToDoApp.models import ToDoItem
+from Test.utils import TestingSessionLocal, clean_database, test_user
+
+
+def test_status_is_stored_as_a_code_and_read_as_a_name(test_user):
+    db = TestingSessionLocal()
+    db.add_all([
+        ToDoItem(title="Open", priority=1, owner_id=test_user.id),
+        ToDoItem(title="Done", priority=3, status="completed", owner_id=test_user.id),
+    ])
+    db.commit()
+
+    stored = dict(db.execute(text("SELECT title, status FROM todo_items")).all())
+    assert stored == {"Open": 0, "Done": 2}
+    assert db.query(ToDoItem.title).filter(ToDoItem.status == "completed").scalar() == "Done"
+    assert db.query(ToDoItem).filter(ToDoItem.status == "finished").count() == 0
+    assert {t.status for t in db.query(ToDoItem)} == {"pending", "completed"}
+    db.close()
+
+
+def test_init_db_converts_legacy_status_words(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE todo_items (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL,"
+            " description TEXT, priority INTEGER NOT NULL, status VARCHAR(50) NOT NULL,"
+            " owner_id INTEGER NOT NULL, category_id INTEGER, due_date DATE, tags VARCHAR(255),"
+            " created_at TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "INSERT INTO todo_items (title, priority, status, owner_id) VALUES"
+            " ('a', 1, 'completed', 1), ('b', 2, 'progress', 1), ('c', 3, '2', 1), ('d', 3, 'pending', 1)"
+        ))
+
+    init_db(engine)
+
+    with Session(engine) as db:
+        statuses = dict(db.query(ToDoItem.title, ToDoItem.status))
+        assert statuses == {"a": "completed", "b": "progress", "c": "completed", "d": "pending"}
+        assert db.query(ToDoItem).filter(ToDoItem.status == "completed").count() == 2
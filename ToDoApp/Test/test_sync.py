@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from fastapi import status
+from ToDoApp import sync
+from ToDoApp.models import Category, TaskTombstone, ToDoItem
+from ToDoApp.sync import SyncCursor, SyncPosition, encode_cursor
+from Test.utils import client, TestingSessionLocal, clean_database, test_user
+
+
+def pull(since=None, **params):
+    if since:
+        params["since"] = since
+    response = client.get("/todos/api/changes", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_changes_return_only_what_happened_since_the_cursor(test_user, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_OVERLAP", timedelta(0))
+    db = TestingSessionLocal()
+    kept = ToDoItem(title="Kept", description="full text", priority=2, owner_id=test_user.id)
+    edited = ToDoItem(title="Edited", priority=2, owner_id=test_user.id)
+    removed = ToDoItem(title="Removed", priority=3, owner_id=test_user.id)
+    db.add_all([kept, edited, removed])
+    db.commit()
+    removed_id = removed.id
+
+    first = pull()
+    assert {change["title"] for change in first["changes"]} == {"Kept", "Edited", "Removed"}
+    assert first["deleted"] == [] and first["has_more"] is False
+    assert next(c for c in first["changes"] if c["title"] == "Kept")["description"] == "full text"
+
+    edited.status = "completed"
+    db.delete(removed)
+    db.commit()
+
+    second = pull(first["cursor"])
+    assert [change["title"] for change in second["changes"]] == ["Edited"]
+    assert second["changes"][0]["status"] == "completed"
+    assert second["deleted"] == [removed_id]
+
+    third = pull(second["cursor"])
+    assert third["changes"] == [] and third["deleted"] == []
+    db.close()
+
+
+def test_changes_page_through_with_has_more(test_user, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_OVERLAP", timedelta(0))
+    db = TestingSessionLocal()
+    db.add_all([ToDoItem(title=f"Task {i}", priority=2, owner_id=test_user.id) for i in range(5)])
+    db.commit()
+    db.close()
+
+    seen, cursor, has_more = [], None, True
+    while has_more:
+        page = pull(cursor, limit=2)
+        seen += [change["id"] for change in page["changes"]]
+        cursor, has_more = page["cursor"], page["has_more"]
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_bad_and_expired_cursors_are_rejected(test_user):
+    assert client.get("/todos/api/changes", params={"since": "not-a-cursor"}).status_code == 400
+
+    old = datetime.utcnow() - timedelta(days=sync.TOMBSTONE_RETENTION_DAYS + 1)
+    expired = encode_cursor(SyncCursor(SyncPosition(old, 0), SyncPosition(old, 0)))
+    response = client.get("/todos/api/changes", params={"since": expired})
+    assert response.status_code == status.HTTP_410_GONE
+
+
+def test_reassigned_task_is_a_deletion_for_the_previous_owner(test_user):
+    db = TestingSessionLocal()
+    task = ToDoItem(title="Handed over", priority=2, owner_id=test_user.id)
+    db.add(task)
+    db.commit()
+    task.owner_id = test_user.id + 1
+    db.commit()
+
+    tombstone = db.query(TaskTombstone).one()
+    assert (tombstone.task_id, tombstone.owner_id) == (task.id, test_user.id)
+    assert sync.prune_tombstones(db, retention_days=0) == 1
+    db.close()
+
+
+def test_polling_without_deletions_keeps_the_cursor_fresh(test_user):
+    db = TestingSessionLocal()
+    db.add(ToDoItem(title="Unchanged", priority=2, owner_id=test_user.id))
+    db.commit()
+
+    # A client polling every few days while nothing is deleted
+    start = datetime.utcnow() - timedelta(days=sync.TOMBSTONE_RETENTION_DAYS + 10)
+    cursor = None
+    for day in range(0, sync.TOMBSTONE_RETENTION_DAYS + 10, 5):
+        page = sync.fetch_changes(db, test_user.id, cursor, now=start + timedelta(days=day))
+        cursor = sync.decode_cursor(page["cursor"])
+    assert cursor.deleted.at > start + timedelta(days=sync.TOMBSTONE_RETENTION_DAYS)
+
+    response = client.get("/todos/api/changes", params={"since": encode_cursor(cursor)})
+    assert response.status_code == status.HTTP_200_OK
+    db.close()
+
+
+def test_deleting_a_category_syncs_the_detached_tasks(test_user, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_OVERLAP", timedelta(0))
+    db = TestingSessionLocal()
+    category = Category(name="Errands")
+    db.add(category)
+    db.flush()
+    db.add(ToDoItem(title="Groceries", priority=2, owner_id=test_user.id, category_id=category.id))
+    db.commit()
+
+    first = pull()
+    assert first["changes"][0]["category"] == "Errands"
+
+    response = client.post(f"/todos/category/{category.id}/delete", follow_redirects=False)
+    assert response.status_code == status.HTTP_302_FOUND
+    second = pull(first["cursor"])
+    assert [(change["title"], change["category_id"], change["category"]) for change in second["changes"]] == [
+        ("Groceries", None, None)
+    ]
+    db.close()
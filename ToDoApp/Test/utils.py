@@ -3,10 +3,13 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-from routers import auth
-from main import app
-from models import Base, Users, ToDoItem
-from routers.todos import get_db
+from ToDoApp.routers import auth
+from ToDoApp.main import app
+from ToDoApp.models import Base, Users, ToDoItem, ToDoItemArchive, UserTaskCounters, TaskTombstone, Job
+from ToDoApp.routers.todos import get_db
+from ToDoApp.replicas import get_read_db
+from ToDoApp.events import event_buffer
+from ToDoApp.jobs import job_runner
 from passlib.context import CryptContext
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # ----------------------------
@@ -34,6 +37,14 @@ def override_get_db():
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+
+# Task events are flushed explicitly; a background writer would share
+# the single in-memory SQLite connection with the tests
+event_buffer.background = False
+# Jobs run inside the submitting request, against the test database
+job_runner.background = False
+job_runner.session_factory = lambda owner_id=None: TestingSessionLocal()
 
 # ----------------------------
 # CLIENT
@@ -48,6 +59,10 @@ def clean_database():
     """Reset DB before each test"""
     db = TestingSessionLocal()
     db.query(ToDoItem).delete()
+    db.query(ToDoItemArchive).delete()
+    db.query(UserTaskCounters).delete()
+    db.query(TaskTombstone).delete()
+    db.query(Job).delete()
     db.query(Users).delete()
     db.commit()
     db.close()
@@ -0,0 +1,159 @@
+"""
+Admission control for database-bound requests.
+
+Each worker can only hold POOL_SIZE + MAX_OVERFLOW database connections at
+once. Requests beyond that used to wait on the pool for the full pool
+timeout, piling up an unbounded backlog. The middleware below admits at most
+that many requests concurrently, parks a short bounded queue behind them and
+rejects everything else straight away with a 503.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from starlette.responses import JSONResponse
+from ToDoApp.database import POOL_SIZE, MAX_OVERFLOW
+
+
+class AdmissionController:
+    """Per-worker concurrency limiter with a bounded FIFO wait queue"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._waiters = deque()
+
+        # Counters exposed through /metrics
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.peak_active = 0
+        self.peak_queue = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _admit(self):
+        self._active += 1
+        self.admitted += 1
+        self.peak_active = max(self.peak_active, self._active)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting briefly if needed. Returns False if shed."""
+        if self._active < self.max_concurrent and not self._waiters:
+            self._admit()
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.peak_queue = max(self.peak_queue, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as the timeout fired; keep it
+                self.admitted += 1
+                return True
+            self._discard(waiter)
+            self.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued; hand the slot on if we got one
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+        # release() transferred its slot to us, so _active is already counted
+        self.admitted += 1
+        return True
+
+    def release(self):
+        """Give the slot to the next queued request, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self._active -= 1
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "peak_active": self.peak_active,
+            "peak_queue": self.peak_queue,
+        }
+
+
+def controller_from_pool() -> AdmissionController:
+    """Build a controller whose limits match the database pool configuration"""
+    return AdmissionController(
+        max_concurrent=POOL_SIZE + MAX_OVERFLOW,
+        max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", str(POOL_SIZE))),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")),
+    )
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware that runs every non-exempt HTTP request through an
+    AdmissionController. The slot is held until the response body has been
+    sent, so streaming responses count against the limit for their whole
+    lifetime.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exempt_prefixes=("/static", "/metrics")):
+        self.app = app
+        self.controller = controller
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        if not await self.controller.acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry shortly."},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["admission_wait"] = time.monotonic() - started
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,69 @@
+"""Store task status as SMALLINT codes and priority as SMALLINT
+
+Revision ID: 20261019_compact_status
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Status words become codes (pending=0, progress=1, completed=2, see
+models.STATUS_CODES) guarded by a check constraint. Legacy digit strings
+are kept, anything unrecognised becomes pending. SQLite cannot change a
+column type, so there only the values are rewritten; its type affinity
+keeps comparisons with the codes working.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20261019_compact_status"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("todo_items", "todo_items_archive")
+
+TO_CODE = (
+    "CASE WHEN status IN ('0', '1', '2') THEN CAST(status AS SMALLINT)"
+    " WHEN status = 'progress' THEN 1 WHEN status = 'completed' THEN 2 ELSE 0 END"
+)
+TO_NAME = (
+    "CASE status WHEN 1 THEN 'progress' WHEN 2 THEN 'completed' ELSE 'pending' END"
+)
+
+
+def _tables_with_status(bind, integer: bool):
+    inspector = sa.inspect(bind)
+    for table in TABLES:
+        if not inspector.has_table(table):
+            continue
+        columns = {col["name"]: col["type"] for col in inspector.get_columns(table)}
+        if "status" in columns and isinstance(columns["status"], sa.Integer) == integer:
+            yield table
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for table in list(_tables_with_status(bind, integer=False)):
+        if bind.dialect.name == "postgresql":
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN status DROP DEFAULT")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN status TYPE SMALLINT USING {TO_CODE}")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN priority TYPE SMALLINT")
+            op.create_check_constraint(f"ck_{table}_status", table, "status IN (0, 1, 2)")
+        else:
+            op.execute(f"UPDATE {table} SET status = {TO_CODE}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for table in list(_tables_with_status(bind, integer=True)):
+            op.drop_constraint(f"ck_{table}_status", table, type_="check")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN status TYPE VARCHAR(50) USING {TO_NAME}")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN priority TYPE INTEGER")
+    else:
+        for table in list(_tables_with_status(bind, integer=False)):
+            op.execute(f"UPDATE {table} SET status = {TO_NAME.replace('CASE status', 'CASE CAST(status AS INTEGER)')}")
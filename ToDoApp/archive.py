@@ -0,0 +1,129 @@
+"""
+Hot/archive split for completed tasks.
+
+Completed tasks untouched for ARCHIVE_AFTER_DAYS days are moved from
+todo_items into todo_items_archive, so listings, stats and searches over
+live work stop wading through finished rows. Work happens in batches of
+ARCHIVE_BATCH_SIZE, each its own short transaction (INSERT ... SELECT then
+DELETE of the same ids), so locks are held briefly and a stopped run
+loses nothing.
+
+Run on demand:
+
+    python -m ToDoApp.archive [--older-than-days N] [--batch-size N] [--max-batches N]
+
+or in-process every ARCHIVE_INTERVAL seconds (0, the default, disables it).
+
+The move uses Core statements on purpose: archiving is not a deletion,
+so it must not fire the counter or event-log hooks. Counters keep
+counting archived tasks (see ToDoApp.counters).
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, literal, select
+
+from ToDoApp.models import ToDoItem, ToDoItemArchive
+
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "0"))
+# Breather between batches so archival never monopolizes the database
+ARCHIVE_PAUSE = float(os.getenv("ARCHIVE_PAUSE", "0.05"))
+
+ARCHIVED_COLUMNS = (
+    "id", "title", "description", "priority", "status", "owner_id",
+    "category_id", "due_date", "tags", "created_at", "updated_at",
+)
+
+
+def archive_batch(connection, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch of completed tasks last updated before `cutoff`; returns rows moved"""
+    is_archivable = (ToDoItem.status == "completed") & (ToDoItem.updated_at < cutoff)
+    ids = connection.execute(
+        select(ToDoItem.id)
+        .where(is_archivable)
+        .order_by(ToDoItem.id)
+        .limit(batch_size)
+        # PostgreSQL: lock just these rows and skip ones another worker holds,
+        # so a concurrent reopen cannot slip between the copy and the delete
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    connection.execute(
+        insert(ToDoItemArchive).from_select(
+            [*ARCHIVED_COLUMNS, "archived_at"],
+            select(*(ToDoItem.__table__.c[name] for name in ARCHIVED_COLUMNS), literal(datetime.utcnow()))
+            .where(ToDoItem.id.in_(ids))
+        )
+    )
+    return connection.execute(delete(ToDoItem).where(ToDoItem.id.in_(ids))).rowcount
+
+
+def archive_completed(
+    bind,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    pause: float = ARCHIVE_PAUSE,
+) -> int:
+    """Archive in batches until nothing is left (or `max_batches`); returns rows moved"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with bind.begin() as connection:
+            count = archive_batch(connection, cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def start_archiver(bind, interval: float = ARCHIVE_INTERVAL) -> Optional[threading.Thread]:
+    """Archive every `interval` seconds from a daemon thread; no-op when interval is 0"""
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                moved = archive_completed(bind)
+                if moved:
+                    print(f"Archived {moved} completed task(s)")
+            except Exception as e:
+                print(f"Warning: task archival failed: {e}")
+
+    thread = threading.Thread(target=run, name="task-archiver", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old completed tasks to todo_items_archive")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from ToDoApp.sharding import shard_router
+
+    moved = sum(
+        archive_completed(shard_engine, args.older_than_days, args.batch_size, args.max_batches)
+        for shard_engine in shard_router.engines.values()
+    )
+    print(f"Archived {moved} completed task(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Micro-benchmark for chatbot message parsing.
+
+Compares the precompiled parser in routers/chatbot_nlp.py against the
+original substring cascade (reproduced below) over a corpus of sample
+messages. Cold numbers parse every message from scratch, bypassing
+parse_message's LRU cache; cached numbers are repeat messages served from
+it, and are reported separately because they say nothing about the parser.
+
+    python -m ToDoApp.benchmarks.bench_chatbot_nlp [rounds]
+"""
+import re
+import sys
+import timeit
+
+from ToDoApp.routers.chatbot_nlp import parse_message
+
+CORPUS = [
+    "hi",
+    "hello there",
+    "help",
+    "Create task: Buy groceries",
+    "Add task: Finish report with description quarterly numbers, priority high",
+    "New task: Call the plumber, urgent",
+    "make a new task 'Renew passport' priority 2",
+    "Update task #12: Pay rent, status completed",
+    "Edit task 4, status progress",
+    "change task #3, priority high",
+    "Delete task #7",
+    "remove task 21",
+    "Show all tasks",
+    "List my tasks",
+    "Show tasks with high priority",
+    "List pending tasks",
+    "Display completed tasks in Work",
+    "Show tasks with medium priority and status progress",
+    "What's my task status?",
+    "show statistics",
+    "What should I do next?",
+    "suggest something",
+    "I need a study plan for my semester exam",
+    "this message matches nothing useful at all",
+]
+
+
+# ---------------- ORIGINAL IMPLEMENTATION ----------------
+def legacy_extract_intent(message):
+    msg = message.lower().strip()
+    if any(w in msg for w in ["what should", "suggest", "recommend", "plan"]):
+        return "suggest"
+    if any(w in msg for w in ["create", "add", "new", "make"]) and "task" in msg:
+        return "create"
+    if any(w in msg for w in ["update", "edit", "change", "modify"]) and "task" in msg:
+        return "update"
+    if any(w in msg for w in ["delete", "remove"]) and "task" in msg:
+        return "delete"
+    if any(w in msg for w in ["list", "show", "display", "my tasks"]):
+        return "list"
+    if any(w in msg for w in ["status", "progress", "statistics"]):
+        return "status"
+    if any(w in msg for w in ["help", "commands"]):
+        return "help"
+    if any(w in msg for w in ["hi", "hello", "hey"]):
+        return "greeting"
+    return "unknown"
+
+
+def legacy_extract_task_id(message):
+    for p in [r'task\s*(?:#|id|number)?\s*(\d{1,3})', r'#(\d{1,3})']:
+        m = re.search(p, message.lower())
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def legacy_extract_title(message):
+    msg = message.strip()
+    for pattern in [
+        r'^(create|add|new|make)\s+(?:a\s+)?(?:new\s+)?(?:task|todo|item)[\s:]*',
+        r'^(update|edit|change|modify)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*',
+        r'^(delete|remove|drop)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*',
+    ]:
+        msg = re.sub(pattern, '', msg, flags=re.IGNORECASE)
+    quoted = re.search(r'["\']([^"\']+)["\']', msg)
+    if quoted:
+        return quoted.group(1).strip()
+    if ':' in msg:
+        title = msg.split(':', 1)[1].strip()
+        if 'description' in title.lower() or 'desc' in title.lower():
+            title = re.sub(r'description[:\s]*.*', '', title, flags=re.IGNORECASE)
+        return title.split(',')[0].strip() if title else None
+    words = msg.split()
+    if words:
+        title = re.sub(r'\b(with|priority|status|description|desc)\b.*', '', ' '.join(words[:10]), flags=re.IGNORECASE)
+        return title.strip() or None
+    return None
+
+
+def legacy_extract_description(message):
+    for pattern in [r'description[:\s]+([^,]+)', r'desc[:\s]+([^,]+)']:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    if ',' in message:
+        desc = re.sub(r'\b(priority|status|high|medium|low|pending|progress|completed)\b.*', '',
+                      message.split(',', 1)[1].strip(), flags=re.IGNORECASE)
+        return desc.strip() or None
+    return None
+
+
+def legacy_extract_priority(message):
+    msg = message.lower()
+    if re.search(r'priority\s*(?:is\s*)?(?:=)?\s*([123])', msg):
+        return int(re.search(r'priority\s*(?:is\s*)?(?:=)?\s*([123])', msg).group(1))
+    if any(w in msg for w in ["high priority", "priority high", "important", "urgent"]):
+        return 1
+    if any(w in msg for w in ["medium priority", "priority medium", "normal"]):
+        return 2
+    return 3
+
+
+def legacy_extract_status(message):
+    msg = message.lower()
+    if any(w in msg for w in ["completed", "complete", "done", "finished"]):
+        return "completed"
+    if any(w in msg for w in ["progress", "in progress", "working", "started"]):
+        return "progress"
+    if any(w in msg for w in ["pending", "not started", "todo"]):
+        return "pending"
+    return None
+
+
+def legacy_parse(message):
+    # What one chat request used to cost: intent plus the slots its handler read
+    intent = legacy_extract_intent(message)
+    if intent in ("create", "update"):
+        legacy_extract_title(message)
+        legacy_extract_description(message)
+        legacy_extract_priority(message)
+        legacy_extract_status(message)
+    if intent in ("update", "delete"):
+        legacy_extract_task_id(message)
+    if intent == "list":
+        # extract_filters: three priority scans plus extract_status
+        msg = message.lower()
+        any(w in msg for w in ["high priority", "priority high", "high"])
+        any(w in msg for w in ["medium priority", "priority medium", "medium"])
+        any(w in msg for w in ["low priority", "priority low", "low"])
+        legacy_extract_status(message)
+    return intent
+
+
+# ---------------- RUNNER ----------------
+uncached_parse = parse_message.__wrapped__
+
+
+def time_per_message(fn, rounds: int) -> float:
+    seconds = min(timeit.repeat(lambda: [fn(m) for m in CORPUS], number=rounds, repeat=5))
+    return seconds / (rounds * len(CORPUS)) * 1e6
+
+
+def run(rounds: int = 2000):
+    print("Cold (no cache):")
+    for label, fn in [("legacy cascade", legacy_parse), ("compiled parser", uncached_parse)]:
+        print(f"  {label:<18} {time_per_message(fn, rounds):7.2f} us/message")
+
+    parse_message.cache_clear()
+    for message in CORPUS:
+        parse_message(message)
+    print("Cached (repeat messages):")
+    print(f"  {'compiled parser':<18} {time_per_message(parse_message, rounds):7.2f} us/message")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
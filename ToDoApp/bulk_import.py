@@ -0,0 +1,308 @@
+"""
+Bulk task import.
+
+`POST /todos/import` takes the formats /todos/export produces (CSV, a JSON
+array, or NDJSON) and adds the tasks to the user's list. The upload is
+parsed as a stream and handled IMPORT_BATCH_SIZE rows at a time: each
+batch is validated, its category names are resolved against a map loaded
+once per import (missing categories are created), and its tasks are
+inserted with one executemany in their own transaction. Invalid rows are
+skipped and reported by number; a batch the database rejects is reported
+as a whole, and the batches before it stay imported.
+
+The inserts bypass the ORM flush hooks, so each batch updates
+user_task_counters and queues its task events itself.
+"""
+import csv
+import io
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ToDoApp.counters import apply_deltas, deltas_for_new_tasks
+from ToDoApp.events import record_task_events
+from ToDoApp.models import STATUS_CODES, Category, ToDoItem, UserTaskCounters
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# The report lists at most this many row errors; `failed` counts them all
+MAX_REPORTED_ERRORS = 100
+READ_CHUNK = 64 * 1024
+
+FORMATS = ("csv", "json", "ndjson")
+PRIORITY_LABELS = {"high": 1, "medium": 2, "low": 3}
+DEFAULT_PRIORITY = 3
+
+TITLE_LENGTH = ToDoItem.title.type.length
+TAGS_LENGTH = ToDoItem.tags.type.length
+CATEGORY_LENGTH = Category.name.type.length
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "jsonl":
+        return "ndjson"
+    return extension if extension in FORMATS else None
+
+
+# ---------------- PARSING ----------------
+
+
+def parse_csv(text) -> Iterator:
+    return csv.DictReader(text)
+
+
+def parse_ndjson(text) -> Iterator:
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield None  # reported by validate_record
+
+
+def parse_json_array(text) -> Iterator:
+    """Items of a top-level JSON array, decoded one at a time"""
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+
+    def more() -> bool:
+        nonlocal buffer, pos
+        chunk = text.read(READ_CHUNK)
+        buffer, pos = buffer[pos:] + chunk, 0
+        return bool(chunk)
+
+    state = "open"
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not more():
+                raise ValueError("the JSON array is not closed")
+            continue
+        char = buffer[pos]
+        if state == "open":
+            if char != "[":
+                raise ValueError("JSON uploads must be an array of tasks")
+            pos, state = pos + 1, "first"
+        elif state == "next":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("expected ',' or ']' between JSON array items")
+            pos, state = pos + 1, "item"
+        else:
+            if state == "first" and char == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                item, end = None, None
+            # An item running to the end of the buffer may continue in the next chunk
+            if (end is None or end == len(buffer)) and more():
+                continue
+            if end is None:
+                raise ValueError("malformed JSON")
+            yield item
+            pos, state = end, "next"
+
+
+PARSERS = {"csv": parse_csv, "json": parse_json_array, "ndjson": parse_ndjson}
+
+
+# ---------------- VALIDATION ----------------
+
+
+def _field(record: dict, *names):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _priority(value) -> int:
+    if value is None:
+        return DEFAULT_PRIORITY
+    if isinstance(value, str) and value.strip().lower() in PRIORITY_LABELS:
+        return PRIORITY_LABELS[value.strip().lower()]
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        priority = None
+    if priority not in PRIORITY_LABELS.values():
+        raise ValueError(f"priority {value!r} is not 1-3 or High/Medium/Low")
+    return priority
+
+
+def _text_field(record: dict, name: str, max_length: Optional[int] = None) -> Optional[str]:
+    value = _field(record, name)
+    if isinstance(value, list) and name == "tags":
+        value = ",".join(str(tag).strip() for tag in value if str(tag).strip())
+    value = str(value).strip() if value is not None else ""
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{name} is longer than {max_length} characters")
+    return value or None
+
+
+def validate_record(record) -> dict:
+    """
+    Column values for one uploaded task, read from export-style fields
+    (CSV headers like "Due Date" or JSON keys like "due_date"). Raises
+    ValueError saying what is wrong.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("not a task object")
+    record = {str(key).strip().lower().replace(" ", "_"): value for key, value in record.items() if key is not None}
+
+    title = _text_field(record, "title", TITLE_LENGTH)
+    if not title:
+        raise ValueError("title is required")
+
+    status = str(_field(record, "status") or "pending").strip().lower()
+    if status not in STATUS_CODES:
+        raise ValueError(f"unknown status {status!r}")
+
+    due_date = _field(record, "due_date")
+    if due_date is not None:
+        try:
+            due_date = date.fromisoformat(str(due_date))
+        except ValueError:
+            raise ValueError(f"due_date {due_date!r} is not YYYY-MM-DD")
+
+    created_at = _field(record, "created_at")
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            raise ValueError(f"created_at {created_at!r} is not an ISO timestamp")
+
+    description = _field(record, "description")
+    return {
+        "title": title,
+        "description": str(description) if description is not None else None,
+        "status": status,
+        # JSON exports carry both the label and the number
+        "priority": _priority(_field(record, "priority_value", "priority")),
+        "category": _text_field(record, "category", CATEGORY_LENGTH),
+        "due_date": due_date,
+        "tags": _text_field(record, "tags", TAGS_LENGTH),
+        "created_at": created_at,
+    }
+
+
+# ---------------- LOADING ----------------
+
+
+def _create_categories(db: Session, names: list, categories: dict) -> list:
+    """
+    Add the categories the batch names but `categories` lacks. Committed on
+    their own so they reach every shard before tasks reference them.
+    """
+    missing = {}
+    for name in names:
+        if name.lower() not in categories:
+            missing.setdefault(name.lower(), name)
+    if not missing:
+        return []
+    created = [Category(name=name) for name in missing.values()]
+    db.add_all(created)
+    db.flush()
+    new_ids = {category.name.lower(): category.id for category in created}
+    db.commit()
+    categories.update(new_ids)
+    return list(missing.values())
+
+
+def _insert_batch(db: Session, owner_id: int, batch: list, categories: dict) -> int:
+    now = datetime.utcnow()
+    rows = []
+    for _, values in batch:
+        category = values["category"]
+        rows.append({
+            "title": values["title"],
+            "description": values["description"],
+            "status": values["status"],
+            "priority": values["priority"],
+            "category_id": categories[category.lower()] if category else None,
+            "due_date": values["due_date"],
+            "tags": values["tags"],
+            "owner_id": owner_id,
+            "created_at": values["created_at"] or now,
+            "updated_at": now,
+        })
+
+    # Core executemany: batched multi-row INSERTs where the driver allows.
+    # RETURNING the status with the id keeps the events right whatever
+    # order the rows come back in.
+    inserted = db.execute(insert(ToDoItem.__table__).returning(ToDoItem.id, ToDoItem.status), rows).all()
+    # Same shard as the tasks when the session is routed
+    apply_deltas(db.connection(bind_arguments={"mapper": UserTaskCounters}), deltas_for_new_tasks(rows))
+    events = []
+    for task_id, task_status in inserted:
+        events.append({"task_id": task_id, "user_id": owner_id, "event_type": "created", "occurred_at": now})
+        if task_status == "completed":
+            events.append({"task_id": task_id, "user_id": owner_id, "event_type": "completed", "occurred_at": now})
+    record_task_events(db, events)
+    db.commit()
+    return len(rows)
+
+
+def import_tasks(db: Session, owner_id: int, stream, format: str, batch_size: int = IMPORT_BATCH_SIZE,
+                 progress: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Import tasks for `owner_id` from a binary `stream` in one of FORMATS.
+    Rows are numbered from 1, not counting a CSV header; progress(rows) is
+    called with the rows handled so far after each batch.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    categories = {name.lower(): category_id for category_id, name in db.execute(select(Category.id, Category.name))}
+    report = {"imported": 0, "failed": 0, "errors": [], "categories_created": []}
+
+    def fail(row: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row, "error": message})
+
+    def load(batch: list):
+        try:
+            names = [values["category"] for _, values in batch if values["category"]]
+            report["categories_created"] += _create_categories(db, names, categories)
+            report["imported"] += _insert_batch(db, owner_id, batch, categories)
+        except SQLAlchemyError as e:
+            db.rollback()
+            for row, _ in batch:
+                fail(row, f"not saved: {getattr(e, 'orig', None) or e}")
+
+    batch, row = [], 0
+    try:
+        for record in PARSERS[format](text):
+            row += 1
+            try:
+                batch.append((row, validate_record(record)))
+            except ValueError as e:
+                fail(row, str(e))
+            if len(batch) >= batch_size:
+                load(batch)
+                batch = []
+                if progress:
+                    progress(row)
+    except (ValueError, csv.Error) as e:
+        # The rest of the upload cannot be read; what came before is kept
+        fail(row + 1, f"upload unreadable from here on: {e}")
+    finally:
+        # Leave the upload open for its owner
+        text.detach()
+    if batch:
+        load(batch)
+    if progress:
+        progress(row)
+    return report
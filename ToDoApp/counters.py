@@ -0,0 +1,243 @@
+"""
+Per-user task counters.
+
+`user_task_counters` holds one row per user with totals by status and by
+priority, so stats reads are a primary-key lookup instead of a scan of
+the user's tasks. Rows are maintained from Session flush hooks: every ORM
+insert, delete, or status/priority/owner change of a ToDoItem turns into an
+`UPDATE ... SET col = col + delta` on the owner's row in the same
+transaction. A missing row is (re)built from todo_items on the spot, in
+a transaction of its own.
+Bulk inserts (ToDoApp.bulk_import) apply `deltas_for_new_tasks` themselves.
+
+Bulk `query.update()` / `query.delete()` on todo_items bypass the ORM and
+therefore this hook; run the reconciliation after such changes:
+
+    python -m ToDoApp.counters rebuild [--user USER_ID ...]
+"""
+import argparse
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, event, func, inspect, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ToDoApp.models import ToDoItem, ToDoItemArchive, UserTaskCounters
+
+
+STATUS_COLUMNS = {"pending": "pending", "progress": "progress", "completed": "completed"}
+PRIORITY_COLUMNS = {1: "priority_high", 2: "priority_medium", 3: "priority_low"}
+COUNTER_COLUMNS = ("total", *STATUS_COLUMNS.values(), *PRIORITY_COLUMNS.values())
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    pass
+
+
+def register_active_history(*attributes):
+    """
+    Make SQLAlchemy load the old value when an expired attribute (e.g.
+    after a commit) is overwritten, so previous_value() sees it. Flush
+    hooks elsewhere register the attributes they read; repeats are no-ops.
+    """
+    for attribute in attributes:
+        if not event.contains(attribute, "set", _noop_set):
+            event.listen(attribute, "set", _noop_set, active_history=True)
+
+
+register_active_history(ToDoItem.status, ToDoItem.priority, ToDoItem.owner_id)
+
+
+def _contribution(status: Optional[str], priority: Optional[int]) -> list:
+    """Counter columns one task with these values adds 1 to"""
+    columns = ["total"]
+    if status in STATUS_COLUMNS:
+        columns.append(STATUS_COLUMNS[status])
+    if priority in PRIORITY_COLUMNS:
+        columns.append(PRIORITY_COLUMNS[priority])
+    return columns
+
+
+def previous_value(state, key: str):
+    """Value of an attribute before the pending flush"""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.obj(), key)
+
+
+def compute_deltas(session: Session) -> dict:
+    """{owner_id: {column: delta}} for the ToDoItem changes being flushed"""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    def add(owner_id, status, priority, sign):
+        if owner_id is None:
+            return
+        for column in _contribution(status, priority):
+            deltas[owner_id][column] += sign
+
+    for obj in session.new:
+        if isinstance(obj, ToDoItem):
+            add(obj.owner_id, obj.status or "pending", obj.priority or 3, +1)
+
+    for obj in session.deleted:
+        if isinstance(obj, ToDoItem):
+            state = inspect(obj)
+            add(previous_value(state, "owner_id"), previous_value(state, "status"), previous_value(state, "priority"), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, ToDoItem):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in ("owner_id", "status", "priority")):
+            continue
+        add(previous_value(state, "owner_id"), previous_value(state, "status"), previous_value(state, "priority"), -1)
+        add(obj.owner_id, obj.status, obj.priority, +1)
+
+    return {
+        owner_id: {column: delta for column, delta in columns.items() if delta}
+        for owner_id, columns in deltas.items()
+        if any(columns.values())
+    }
+
+
+def deltas_for_new_tasks(rows: Iterable[dict]) -> dict:
+    """compute_deltas for task rows inserted in bulk, outside the flush hooks"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        for column in _contribution(row["status"], row["priority"]):
+            deltas[row["owner_id"]][column] += 1
+    return {owner_id: dict(columns) for owner_id, columns in deltas.items()}
+
+
+def counts_from_source(user_ids: Optional[Iterable[int]] = None):
+    """
+    SELECT of counter rows computed from todo_items plus the archive:
+    archiving moves a task, it does not remove it from the user's totals.
+    """
+    parts = []
+    for model in (ToDoItem, ToDoItemArchive):
+        part = select(model.owner_id, model.status, model.priority)
+        if user_ids is not None:
+            part = part.where(model.owner_id.in_(list(user_ids)))
+        parts.append(part)
+    tasks = union_all(*parts).subquery()
+
+    return select(
+        tasks.c.owner_id.label("user_id"),
+        func.count().label("total"),
+        *(
+            func.coalesce(func.sum(case((tasks.c.status == status, 1), else_=0)), 0).label(column)
+            for status, column in STATUS_COLUMNS.items()
+        ),
+        *(
+            func.coalesce(func.sum(case((tasks.c.priority == priority, 1), else_=0)), 0).label(column)
+            for priority, column in PRIORITY_COLUMNS.items()
+        ),
+    ).group_by(tasks.c.owner_id)
+
+
+def apply_deltas(connection, deltas: dict):
+    table = UserTaskCounters.__table__
+    for owner_id, columns in deltas.items():
+        increment = (
+            update(table)
+            .where(table.c.user_id == owner_id)
+            .values({column: table.c[column] + delta for column, delta in columns.items()})
+        )
+        if connection.execute(increment).rowcount:
+            continue
+        # No row yet: the source already reflects this flush, so copy it.
+        # A concurrent writer may create the row first; then increment it.
+        try:
+            with connection.begin_nested():
+                connection.execute(
+                    insert(table).from_select(["user_id", *COUNTER_COLUMNS], counts_from_source([owner_id]))
+                )
+        except IntegrityError:
+            connection.execute(increment)
+
+
+# Deltas are read before the flush, while old values can still be loaded
+# (a deleted row cannot be refreshed afterwards), and written right after
+# it so the counters and the rows commit together.
+@event.listens_for(Session, "before_flush")
+def _collect_counter_deltas(session, flush_context, instances):
+    session.info["counter_deltas"] = compute_deltas(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_counter_deltas(session, flush_context):
+    deltas = session.info.pop("counter_deltas", None)
+    if deltas:
+        # Same shard as the tasks when the session is routed
+        apply_deltas(session.connection(bind_arguments={"mapper": UserTaskCounters}), deltas)
+
+
+def rebuild_counters(db: Session, user_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute counter rows from todo_items (all users, or just `user_ids`).
+    Returns the number of rows written. The caller commits.
+    """
+    table = UserTaskCounters.__table__
+    user_ids = list(user_ids) if user_ids is not None else None
+
+    wipe = delete(table)
+    if user_ids is not None:
+        wipe = wipe.where(table.c.user_id.in_(user_ids))
+    db.execute(wipe)
+
+    result = db.execute(
+        insert(table).from_select(["user_id", *COUNTER_COLUMNS], counts_from_source(user_ids))
+    )
+    return result.rowcount
+
+
+def get_counters(db: Session, user_id: int) -> dict:
+    """Counter values for one user: a primary-key lookup, rebuilt if missing"""
+    # populate_existing: the hooks write with Core UPDATEs, so an instance
+    # already in this session may hold values from before them
+    row = db.get(UserTaskCounters, user_id, populate_existing=True)
+    if row is not None:
+        return {column: getattr(row, column) for column in COUNTER_COLUMNS}
+
+    # Rebuild in a short transaction of its own, so a read never commits
+    # (or discards) the caller's session, on the engine counters are
+    # written with: the primary, even when `db` reads from a replica
+    # (ToDoApp.replicas). If a concurrent request inserts the row first,
+    # read theirs.
+    table = UserTaskCounters.__table__
+    with db.get_bind(mapper=UserTaskCounters).begin() as connection:
+        source = connection.execute(counts_from_source([user_id])).mappings().first()
+        # No row from the source: no tasks yet
+        counts = {column: source[column] if source else 0 for column in COUNTER_COLUMNS}
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(user_id=user_id, **counts))
+        except IntegrityError:
+            counts = connection.execute(select(table).where(table.c.user_id == user_id)).mappings().one()
+    return {column: counts[column] for column in COUNTER_COLUMNS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain user_task_counters")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute counters from todo_items")
+    rebuild.add_argument("--user", type=int, action="append", dest="user_ids", help="limit to these user ids")
+    args = parser.parse_args(argv)
+
+    from ToDoApp.sharding import shard_router
+
+    written = 0
+    for shard in shard_router.engines:
+        with shard_router.session(shard=shard) as db:
+            written += rebuild_counters(db, args.user_ids)
+            db.commit()
+    print(f"Rebuilt {written} counter row(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,69 @@
+import itertools
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+
+def normalize_url(url: str) -> str:
+    # Fix legacy postgres:// URLs
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set")
 
-# Fix legacy postgres:// URLs
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-
-# Configure engine with connection pooling for Render PostgreSQL
-# This prevents "SSL connection has been closed unexpectedly" errors
-connect_args = {}
-if DATABASE_URL.startswith("postgresql://"):
-    # Render PostgreSQL requires SSL, but DATABASE_URL usually includes SSL params
-    # Add explicit SSL mode if not already in URL
-    if "sslmode=" not in DATABASE_URL:
-        connect_args["sslmode"] = "require"
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=5,  # Number of connections to maintain
-    max_overflow=10,  # Maximum number of connections beyond pool_size
-    pool_pre_ping=True,  # Verify connections before using them (prevents stale connections)
-    pool_recycle=300,  # Recycle connections after 5 minutes (prevents timeout issues)
-    connect_args=connect_args
-)
+DATABASE_URL = normalize_url(DATABASE_URL)
+
+# Pool sizing is shared with the admission controller (see admission.py),
+# which derives its per-worker concurrency limit from these values
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+def create_db_engine(url: str):
+    """Engine with the app's pool settings; also used for shard databases"""
+    url = normalize_url(url)
+
+    # Configure engine with connection pooling for Render PostgreSQL
+    # This prevents "SSL connection has been closed unexpectedly" errors
+    connect_args = {}
+    if url.startswith("postgresql://"):
+        # Render PostgreSQL requires SSL, but DATABASE_URL usually includes SSL params
+        # Add explicit SSL mode if not already in URL
+        if "sslmode=" not in url:
+            connect_args["sslmode"] = "require"
+
+    return create_engine(
+        url,
+        pool_size=POOL_SIZE,  # Number of connections to maintain
+        max_overflow=MAX_OVERFLOW,  # Maximum number of connections beyond pool_size
+        pool_timeout=POOL_TIMEOUT,  # Seconds to wait for a free connection before giving up
+        pool_pre_ping=True,  # Verify connections before using them (prevents stale connections)
+        pool_recycle=300,  # Recycle connections after 5 minutes (prevents timeout issues)
+        connect_args=connect_args
+    )
+
+
+engine = create_db_engine(DATABASE_URL)
+
+# Optional read replicas of DATABASE_URL (comma-separated). Read-only
+# endpoints use them through ToDoApp.replicas.get_read_db.
+REPLICA_URLS = [url.strip() for url in os.getenv("REPLICA_URLS", "").split(",") if url.strip()]
+replica_engines = [create_db_engine(url) for url in REPLICA_URLS]
+_replica_turn = itertools.count()
+
+
+def pick_replica(replicas=None):
+    """Next replica engine, round-robin; None when there are none"""
+    replicas = replica_engines if replicas is None else replicas
+    if not replicas:
+        return None
+    return replicas[next(_replica_turn) % len(replicas)]
 
 SessionLocal = sessionmaker(
     autocommit=False,
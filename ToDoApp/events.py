@@ -0,0 +1,345 @@
+"""
+Task event log and daily activity rollup.
+
+Every ORM change to a ToDoItem is recorded as a row in `task_events`
+(created, completed, reopened, updated, deleted). Events are gathered by
+Session flush hooks, handed to a write-behind buffer only once the
+transaction commits, and inserted by a background thread in batches, so a
+request pays for neither the extra INSERTs nor a second round trip.
+Buffered events not yet flushed are lost if the process dies; the log
+feeds trends, not anything transactional.
+
+`run_rollup` folds new events into `task_daily_stats` (one row per user
+per local day) and advances a cursor in the same transaction, so charts
+over a year read at most 365 small rows. Run it periodically:
+
+    python -m ToDoApp.events rollup
+
+The buffer thread also runs it every TASK_ROLLUP_INTERVAL seconds.
+Bulk `query.update()` / `query.delete()` statements bypass the hooks and
+are not logged.
+"""
+import argparse
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from ToDoApp.counters import previous_value, register_active_history
+from ToDoApp.models import RollupCursor, TaskDailyStats, TaskEvent, ToDoItem, Users
+from ToDoApp.sharding import shard_router
+from ToDoApp.timewindows import resolve_timezone, to_local
+
+
+FLUSH_BATCH_SIZE = int(os.getenv("TASK_EVENTS_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("TASK_EVENTS_FLUSH_INTERVAL", "1"))
+MAX_PENDING = int(os.getenv("TASK_EVENTS_MAX_PENDING", "100000"))
+ROLLUP_INTERVAL = float(os.getenv("TASK_ROLLUP_INTERVAL", "60"))
+# 0 leaves flushing to explicit flush() calls (tests, one-off scripts)
+BACKGROUND = os.getenv("TASK_EVENTS_BACKGROUND", "1") != "0"
+ROLLUP_BATCH_SIZE = 5000
+# Events younger than this are left for the next run, so rows from
+# buffer transactions still in flight are not skipped by the cursor
+ROLLUP_LAG = timedelta(seconds=5)
+ROLLUP_NAME = "task_daily_stats"
+
+ROLLUP_EVENT_TYPES = ("created", "completed", "reopened", "deleted")
+
+
+# ---------------- CAPTURE ----------------
+
+
+# Load the old status and owner when an expired instance is overwritten,
+# so a completion can be told apart from a re-save
+register_active_history(ToDoItem.status, ToDoItem.owner_id)
+
+
+def _status_event(old_status: Optional[str], new_status: Optional[str]) -> Optional[str]:
+    if new_status == "completed" and old_status != "completed":
+        return "completed"
+    if old_status == "completed" and new_status != "completed":
+        return "reopened"
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_task_events(session, flush_context, instances):
+    """Queue (task or id, user_id, event_type) for the rows about to change"""
+    now = datetime.utcnow()
+    pending = session.info.setdefault("task_events_flush", [])
+
+    for obj in session.new:
+        if isinstance(obj, ToDoItem):
+            pending.append((obj, obj.owner_id, "created", now))
+            if obj.status == "completed":
+                pending.append((obj, obj.owner_id, "completed", now))
+
+    for obj in session.deleted:
+        if isinstance(obj, ToDoItem):
+            pending.append((obj.id, previous_value(inspect(obj), "owner_id"), "deleted", now))
+
+    for obj in session.dirty:
+        if not isinstance(obj, ToDoItem) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        status_event = None
+        if state.attrs.status.history.has_changes():
+            status_event = _status_event(previous_value(state, "status"), obj.status)
+        pending.append((obj.id, obj.owner_id, status_event or "updated", now))
+
+
+@event.listens_for(Session, "after_flush")
+def _resolve_task_events(session, flush_context):
+    """New tasks have ids now; keep the rows until the transaction ends"""
+    pending = session.info.pop("task_events_flush", None)
+    if not pending:
+        return
+    rows = session.info.setdefault("task_events", [])
+    for task, user_id, event_type, occurred_at in pending:
+        task_id = task.id if isinstance(task, ToDoItem) else task
+        if task_id is None or user_id is None:
+            continue
+        rows.append({
+            "task_id": task_id, "user_id": user_id,
+            "event_type": event_type, "occurred_at": occurred_at,
+        })
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_task_events(session):
+    rows = session.info.pop("task_events", None)
+    if rows:
+        # The owner's shard when the session is routed (see ToDoApp.sharding)
+        bind = session.get_bind(TaskEvent)
+        event_buffer.add(getattr(bind, "engine", bind), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_task_events(session):
+    session.info.pop("task_events", None)
+    session.info.pop("task_events_flush", None)
+
+
+def record_task_events(session: Session, rows: list):
+    """
+    Queue events for rows written outside the ORM (bulk inserts); like the
+    hooks' own, they are buffered once the session commits.
+    """
+    session.info.setdefault("task_events", []).extend(rows)
+
+
+# ---------------- WRITE-BEHIND BUFFER ----------------
+
+
+class EventBuffer:
+    """
+    Collects committed events per engine and inserts them in batches from
+    a daemon thread, at least every `flush_interval` seconds or as soon as
+    `batch_size` rows are waiting. Beyond `max_pending` rows the oldest
+    are dropped rather than growing without bound while the DB is down.
+    """
+
+    def __init__(self, batch_size: int = FLUSH_BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_pending: int = MAX_PENDING, rollup_interval: float = ROLLUP_INTERVAL,
+                 background: bool = BACKGROUND):
+        self.batch_size = batch_size
+        self.background = background
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rollup_interval = rollup_interval
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._engines = set()
+        self._last_rollup = time.monotonic()
+
+        self.flushed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def add(self, engine, rows: list):
+        with self._lock:
+            self._engines.add(engine)
+            for row in rows:
+                self._pending.append((engine, row))
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            full = len(self._pending) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def _take(self) -> list:
+        with self._lock:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        return batch
+
+    def flush(self) -> int:
+        """Insert everything buffered so far; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return written
+                by_engine = defaultdict(list)
+                for engine, row in batch:
+                    by_engine[engine].append(row)
+                for engine, rows in list(by_engine.items()):
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(insert(TaskEvent), rows)
+                    except Exception as e:
+                        self.errors += 1
+                        print(f"Warning: could not write {len(rows)} task events: {e}")
+                        # Put back everything not yet written and retry later
+                        unwritten = [(engine, row) for engine, rows in by_engine.items() for row in rows]
+                        with self._lock:
+                            self._pending.extendleft(reversed(unwritten))
+                        return written
+                    del by_engine[engine]
+                    written += len(rows)
+                    self.flushed += len(rows)
+
+    def _ensure_thread(self):
+        if not self.background:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="task-events", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                self._last_rollup = time.monotonic()
+                for engine in list(self._engines):
+                    try:
+                        # Routed so the timezone lookup reaches the primary's users
+                        with shard_router.session_for_engine(engine) as db:
+                            run_rollup(db)
+                    except Exception as e:
+                        print(f"Warning: task rollup failed: {e}")
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+event_buffer = EventBuffer()
+# Write out what is still buffered on a clean shutdown
+atexit.register(event_buffer.flush)
+
+
+# ---------------- ROLLUP ----------------
+
+
+def run_rollup(db: Session, batch_size: int = ROLLUP_BATCH_SIZE, lag: timedelta = ROLLUP_LAG) -> int:
+    """
+    Fold events past the cursor into task_daily_stats, one batch per
+    transaction, until caught up. Safe to run from several workers: the
+    cursor only moves if nobody else moved it first, otherwise the batch
+    is rolled back. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        cursor = db.get(RollupCursor, ROLLUP_NAME, populate_existing=True)
+        if cursor is None:
+            db.add(RollupCursor(name=ROLLUP_NAME, last_event_id=0))
+            db.commit()
+            continue
+        last_id = cursor.last_event_id
+
+        events = db.execute(
+            select(TaskEvent.id, TaskEvent.user_id, TaskEvent.event_type, TaskEvent.occurred_at)
+            .where(
+                TaskEvent.id > last_id,
+                TaskEvent.recorded_at <= datetime.utcnow() - lag,
+                TaskEvent.event_type.in_(ROLLUP_EVENT_TYPES),
+            )
+            .order_by(TaskEvent.id)
+            .limit(batch_size)
+        ).all()
+        if not events:
+            db.rollback()
+            return processed
+
+        timezones = {
+            user_id: resolve_timezone(tz_name)
+            for user_id, tz_name in db.execute(
+                select(Users.id, Users.timezone).where(Users.id.in_({e.user_id for e in events}))
+            )
+        }
+        deltas = defaultdict(lambda: defaultdict(int))
+        for e in events:
+            tz = timezones.get(e.user_id) or resolve_timezone()
+            deltas[(e.user_id, to_local(e.occurred_at, tz).date())][e.event_type] += 1
+
+        table = TaskDailyStats.__table__
+        for (user_id, day), counts in deltas.items():
+            result = db.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.day == day)
+                .values({column: table.c[column] + n for column, n in counts.items()})
+            )
+            if result.rowcount == 0:
+                db.execute(insert(table).values(user_id=user_id, day=day, **{
+                    column: counts.get(column, 0) for column in ROLLUP_EVENT_TYPES
+                }))
+
+        moved = db.execute(
+            update(RollupCursor.__table__)
+            .where(RollupCursor.name == ROLLUP_NAME, RollupCursor.last_event_id == last_id)
+            .values(last_event_id=events[-1].id)
+        ).rowcount
+        if not moved:
+            db.rollback()
+            return processed
+        db.commit()
+        processed += len(events)
+
+
+def daily_stats(db: Session, user_id: int, first_day, last_day) -> dict:
+    """{day: row} of rolled-up activity for local days first_day..last_day"""
+    rows = db.execute(
+        select(TaskDailyStats).where(
+            TaskDailyStats.user_id == user_id,
+            TaskDailyStats.day >= first_day,
+            TaskDailyStats.day <= last_day,
+        )
+    ).scalars()
+    return {row.day: row for row in rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task event log maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rollup", help="fold new task_events into task_daily_stats")
+    parser.parse_args(argv)
+
+    processed = 0
+    for shard in shard_router.engines:
+        with shard_router.session(shard=shard) as db:
+            processed += run_rollup(db)
+    print(f"Rolled up {processed} event(s)")
+
+
+if __name__ == "__main__":
+    main()
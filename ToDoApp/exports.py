@@ -0,0 +1,115 @@
+"""
+Task export as a stream of text chunks.
+
+`iter_export` reads a user's tasks EXPORT_BATCH_SIZE at a time and yields
+the CSV, JSON or NDJSON text for each batch, so neither the rows nor the
+document are held in memory at once. /todos/export joins the chunks for
+a direct download; export jobs (ToDoApp.jobs) write them to a compressed
+file as they come. ToDoApp.bulk_import reads all three formats back.
+"""
+import csv
+import io
+import json
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, undefer
+
+from ToDoApp.models import ToDoItem, ToDoItemArchive
+
+
+EXPORT_BATCH_SIZE = 1000
+FORMATS = ("csv", "json", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "json": "application/json", "ndjson": "application/x-ndjson"}
+CSV_HEADER = ["ID", "Title", "Description", "Status", "Priority", "Category", "Due Date", "Tags", "Created At"]
+PRIORITY_LABELS = {1: "High", 2: "Medium", 3: "Low"}
+
+
+def _models(include_archive: bool) -> list:
+    return [ToDoItem, ToDoItemArchive] if include_archive else [ToDoItem]
+
+
+def count_export(db: Session, owner_id: int, include_archive: bool = False) -> int:
+    return sum(
+        db.execute(select(func.count(model.id)).where(model.owner_id == owner_id)).scalar()
+        for model in _models(include_archive)
+    )
+
+
+def iter_tasks(db: Session, owner_id: int, include_archive: bool = False) -> Iterator[list]:
+    """The owner's tasks (then archived ones) in batches, with category and description loaded"""
+    for model in _models(include_archive):
+        last_id = 0
+        while True:
+            batch = db.query(model)\
+                .options(joinedload(model.category), undefer(model.description))\
+                .filter(model.owner_id == owner_id, model.id > last_id)\
+                .order_by(model.id)\
+                .limit(EXPORT_BATCH_SIZE)\
+                .all()
+            if not batch:
+                break
+            yield batch
+            last_id = batch[-1].id
+            # Tasks already written need not stay in the identity map
+            for todo in batch:
+                db.expunge(todo)
+
+
+def csv_row(todo) -> list:
+    return [
+        todo.id,
+        todo.title,
+        todo.description or "",
+        todo.status,
+        PRIORITY_LABELS.get(todo.priority, "Low"),
+        todo.category.name if todo.category else "",
+        todo.due_date.strftime("%Y-%m-%d") if todo.due_date else "",
+        todo.tags or "",
+        todo.created_at.strftime("%Y-%m-%d %H:%M:%S") if todo.created_at else "",
+    ]
+
+
+def json_item(todo) -> dict:
+    return {
+        "id": todo.id,
+        "title": todo.title,
+        "description": todo.description,
+        "status": todo.status,
+        "priority": PRIORITY_LABELS.get(todo.priority, "Low"),
+        "priority_value": todo.priority,
+        "category": todo.category.name if todo.category else None,
+        "due_date": todo.due_date.isoformat() if todo.due_date else None,
+        "tags": [tag.strip() for tag in (todo.tags or "").split(",") if tag.strip()],
+        "created_at": todo.created_at.isoformat() if todo.created_at else None,
+        "updated_at": todo.updated_at.isoformat() if todo.updated_at else None,
+        "archived": isinstance(todo, ToDoItemArchive),
+    }
+
+
+def iter_export(db: Session, owner_id: int, format: str, include_archive: bool = False,
+                on_batch: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """Text chunks of the export; on_batch(n) is called after each n tasks"""
+    first = True
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_HEADER)
+        yield buffer.getvalue()
+    elif format == "json":
+        yield "["
+
+    for batch in iter_tasks(db, owner_id, include_archive):
+        if format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(csv_row(todo) for todo in batch)
+            yield buffer.getvalue()
+        elif format == "json":
+            yield ("" if first else ",") + ",".join("\n" + json.dumps(json_item(todo), indent=2) for todo in batch)
+        else:
+            yield "".join(json.dumps(json_item(todo)) + "\n" for todo in batch)
+        first = False
+        if on_batch:
+            on_batch(len(batch))
+
+    if format == "json":
+        yield "\n]\n" if not first else "]\n"
@@ -0,0 +1,287 @@
+"""
+Background jobs for large exports and imports.
+
+A request only records a job in the `jobs` table (plus the upload, for
+imports) and returns its id; JOB_WORKERS daemon threads run queued jobs
+off the request path, so a 100k-task export holds neither a request
+worker nor its DB connection. With JOB_BACKEND=process each job runs in
+a process-pool worker instead, keeping CSV/JSON work off the web
+process's GIL; the threads then only wait on the pool.
+
+Clients poll GET /jobs/{id} for status and progress (rows handled, out
+of `total` when known) and fetch an export's gzip-compressed file from
+GET /jobs/{id}/download. Results are spooled under JOB_DIR.
+
+Jobs are claimed with a conditional UPDATE, so several web processes can
+share the table: on start each requeues the queued jobs it finds, and
+marks failed any running job whose progress stopped more than
+JOB_STALE_MINUTES ago (its worker died). Old jobs and their files are
+removed with:
+
+    python -m ToDoApp.jobs prune [--hours N]
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ToDoApp.bulk_import import import_tasks
+from ToDoApp.exports import count_export, iter_export
+from ToDoApp.models import Job
+from ToDoApp.sharding import shard_router
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BACKEND = os.getenv("JOB_BACKEND", "thread")  # thread | process
+# 0 runs each job inside submit() (tests, one-off scripts)
+JOB_BACKGROUND = os.getenv("JOB_BACKGROUND", "1") != "0"
+JOB_DIR = Path(os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "todo-jobs")))
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_STALE_MINUTES = int(os.getenv("JOB_STALE_MINUTES", "15"))
+# Queued or running jobs one user may have at a time
+MAX_ACTIVE_JOBS = int(os.getenv("MAX_ACTIVE_JOBS", "3"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def default_session(owner_id: Optional[int] = None) -> Session:
+    # Routed: `jobs` on the primary, tasks on the owner's shard
+    return shard_router.session(owner_id)
+
+
+def upload_path(job_id: int) -> Path:
+    return JOB_DIR / f"{job_id}.upload"
+
+
+def spool_upload(source) -> Path:
+    """
+    Copy an import's upload to a temporary file under JOB_DIR, before its
+    job exists; the caller renames it to upload_path() once the job is
+    committed, or deletes it.
+    """
+    JOB_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=JOB_DIR, suffix=".part", delete=False) as target:
+        shutil.copyfileobj(source, target)
+    return Path(target.name)
+
+
+def _update_job(session_factory, job_id: int, **values):
+    with session_factory() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
+
+
+# ---------------- HANDLERS ----------------
+
+
+def run_export(db: Session, job: dict, report_progress) -> dict:
+    params = job["params"]
+    report_progress(0, count_export(db, job["owner_id"], params.get("include_archive", False)))
+    JOB_DIR.mkdir(parents=True, exist_ok=True)
+    path = JOB_DIR / f"{job['id']}.{params['format']}.gz"
+    partial = path.with_suffix(".part")
+    written = 0
+
+    def on_batch(count: int):
+        nonlocal written
+        written += count
+        report_progress(written)
+
+    # Renamed into place once complete, so a download never sees half a file
+    with gzip.open(partial, "wt", encoding="utf-8", newline="") as out:
+        for chunk in iter_export(db, job["owner_id"], params["format"], params.get("include_archive", False), on_batch):
+            out.write(chunk)
+    os.replace(partial, path)
+    return {"rows": written, "result_path": str(path)}
+
+
+def run_import(db: Session, job: dict, report_progress) -> dict:
+    params = job["params"]
+    path = upload_path(job["id"])
+    try:
+        with open(path, "rb") as upload:
+            report = import_tasks(db, job["owner_id"], upload, params["format"], progress=report_progress)
+    finally:
+        path.unlink(missing_ok=True)
+    # The chatbot's title index of this process; other processes expire theirs
+    from ToDoApp.routers.chatbot import title_index
+    title_index.invalidate(job["owner_id"])
+    return {"result": report}
+
+
+JOB_HANDLERS = {"export": run_export, "import": run_import}
+
+
+def run_job(job_id: int, session_factory=None):
+    """
+    Claim a queued job and run it to completion, recording the outcome.
+    Does nothing if another worker claimed it first.
+    """
+    session_factory = session_factory or job_runner.session_factory
+    now = datetime.utcnow()
+    with session_factory() as db:
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", started_at=now, updated_at=now)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+        row = db.execute(select(Job.id, Job.owner_id, Job.kind, Job.params).where(Job.id == job_id)).one()
+    job = {"id": row.id, "owner_id": row.owner_id, "params": json.loads(row.params or "{}")}
+
+    def report_progress(done: int, total: Optional[int] = None):
+        values = {"progress": done}
+        if total is not None:
+            values["total"] = total
+        _update_job(session_factory, job_id, **values)
+
+    try:
+        with session_factory(job["owner_id"]) as db:
+            outcome = JOB_HANDLERS[row.kind](db, job, report_progress)
+    except Exception as e:
+        _update_job(session_factory, job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        return
+    result = outcome.get("result")
+    _update_job(
+        session_factory, job_id,
+        status="succeeded",
+        result=json.dumps(result) if result is not None else None,
+        result_path=outcome.get("result_path"),
+        finished_at=datetime.utcnow(),
+    )
+
+
+# ---------------- RUNNER ----------------
+
+
+class JobRunner:
+    """
+    In-process queue of job ids served by `workers` daemon threads,
+    started on first use. backend="process" hands each job to a process
+    pool of the same size.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, backend: str = JOB_BACKEND, background: bool = JOB_BACKGROUND):
+        self.workers = workers
+        self.backend = backend
+        self.background = background
+        self.session_factory = default_session
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pool = None
+
+        self.completed = 0
+        self.errors = 0
+
+    def submit(self, job_id: int):
+        if not self.background:
+            self._execute(job_id)
+            return
+        self._ensure_threads()
+        self._queue.put(job_id)
+
+    def _execute(self, job_id: int):
+        if self.backend == "process":
+            with self._lock:
+                if self._pool is None:
+                    # Spawned, not forked: a fork would inherit this process's
+                    # threads' locks and its pooled DB connections
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            # The child uses its own default_session
+            self._pool.submit(run_job, job_id).result()
+        else:
+            run_job(job_id, self.session_factory)
+
+    def _ensure_threads(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._execute(job_id)
+                self.completed += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Warning: job {job_id} could not be run: {e}")
+            finally:
+                self._queue.task_done()
+
+    def recover(self):
+        """Requeue jobs left queued by a previous run; fail those whose worker died"""
+        stale = datetime.utcnow() - timedelta(minutes=JOB_STALE_MINUTES)
+        with self.session_factory() as db:
+            db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.updated_at < stale)
+                .values(status="failed", error="Interrupted, please submit the job again", finished_at=datetime.utcnow())
+            )
+            db.commit()
+            queued = db.execute(select(Job.id).where(Job.status == "queued").order_by(Job.id)).scalars().all()
+        for job_id in queued:
+            self.submit(job_id)
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": self.backend,
+            "queued": self._queue.qsize(),
+            "completed": self.completed,
+            "errors": self.errors,
+        }
+
+
+job_runner = JobRunner()
+
+
+def prune_jobs(db: Session, retention_hours: int = JOB_RETENTION_HOURS) -> int:
+    """Delete finished jobs past retention and their files; returns jobs deleted. The caller commits."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    old = db.execute(
+        select(Job).where(Job.status.not_in(ACTIVE_STATUSES), Job.created_at < cutoff)
+    ).scalars().all()
+    for job in old:
+        if job.result_path:
+            Path(job.result_path).unlink(missing_ok=True)
+        db.delete(job)
+    # Uploads and exports a crashed process never finished
+    for partial in JOB_DIR.glob("*.part"):
+        if datetime.fromtimestamp(partial.stat().st_mtime) < datetime.now() - timedelta(hours=retention_hours):
+            partial.unlink(missing_ok=True)
+    return len(old)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background job maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prune = sub.add_parser("prune", help="delete finished jobs and their files")
+    prune.add_argument("--hours", type=int, default=JOB_RETENTION_HOURS)
+    args = parser.parse_args(argv)
+
+    with default_session() as db:
+        pruned = prune_jobs(db, args.hours)
+        db.commit()
+    print(f"Pruned {pruned} job(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,36 @@
 import os
 from pathlib import Path
-from fastapi import FastAPI, Request, status
+from typing import Annotated
+from fastapi import Depends, FastAPI, Request, status
 from starlette.responses import RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from ToDoApp import models
+from ToDoApp import counters  # registers the user_task_counters flush hooks
+from ToDoApp import events  # registers the task_events hooks and writer
+from ToDoApp import sync  # registers the deletion-log hook
+from ToDoApp.archive import start_archiver
 from ToDoApp.database import engine
-from ToDoApp.routers import auth, todos, admin, users, chatbot, dashboard
+from ToDoApp.sharding import shard_metadata, shard_router
+from ToDoApp.replicas import ReadYourWritesMiddleware
+from ToDoApp.query_stats import QueryStatsMiddleware
+from ToDoApp.admission import AdmissionControlMiddleware, controller_from_pool
+from ToDoApp.jobs import job_runner
+from ToDoApp.routers import auth, todos, admin, users, chatbot, dashboard, jobs
+from ToDoApp.routers.rbac import Permission, Principal, require_permission
 
 app = FastAPI()
 
+# ---------------- QUERY STATS ----------------
+# Innermost, so the counts cover just the endpoint and its dependencies
+app.add_middleware(QueryStatsMiddleware)
+
+# ---------------- READ REPLICAS ----------------
+# Added before SessionMiddleware so it runs inside it and can stamp the
+# session cookie after writes (see replicas.py)
+app.add_middleware(ReadYourWritesMiddleware)
+
 # ---------------- SESSION ----------------
 app.add_middleware(
     SessionMiddleware,
@@ -19,24 +39,69 @@ app.add_middleware(
     https_only=True
 )
 
+# ---------------- ADMISSION CONTROL ----------------
+# Added last so it is the outermost middleware: excess requests are shed
+# before any session decoding or database work happens.
+admission_controller = controller_from_pool()
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+
 # ---------------- DATABASE ----------------
-def init_db():
+# Legacy status words (and digit strings) to SMALLINT codes; anything
+# unrecognised becomes pending
+STATUS_TO_CODE_SQL = (
+    "CASE WHEN status IN ('0', '1', '2') THEN CAST(status AS SMALLINT)"
+    " WHEN status = 'progress' THEN 1 WHEN status = 'completed' THEN 2 ELSE 0 END"
+)
+
+
+def compact_status_columns(bind):
+    """
+    Store status as SMALLINT codes and priority as SMALLINT (mirrors the
+    alembic revision 20261019_compact_status). PostgreSQL changes the
+    column types; SQLite cannot, so only the values are rewritten.
+    """
+    from sqlalchemy import Integer, inspect, text
+    inspector = inspect(bind)
+    for table in ("todo_items", "todo_items_archive"):
+        if not inspector.has_table(table):
+            continue
+        columns = {col["name"]: col["type"] for col in inspector.get_columns(table)}
+        if "status" not in columns or isinstance(columns["status"], Integer):
+            continue
+        with bind.begin() as conn:
+            if bind.dialect.name == "postgresql":
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN status DROP DEFAULT"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN status TYPE SMALLINT USING {STATUS_TO_CODE_SQL}"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN priority TYPE SMALLINT"))
+                conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT ck_{table}_status CHECK (status IN (0, 1, 2))"))
+            else:
+                legacy = conn.execute(text(
+                    f"SELECT 1 FROM {table} WHERE status NOT IN ('0', '1', '2') LIMIT 1"
+                )).first()
+                if legacy is None:
+                    continue
+                conn.execute(text(f"UPDATE {table} SET status = {STATUS_TO_CODE_SQL}"))
+        print(f"Converted {table}.status to SMALLINT codes")
+
+
+def init_db(bind=engine, metadata=models.Base.metadata):
     """Initialize database: create tables and add missing columns"""
     try:
         # Create all tables (for new databases)
-        models.Base.metadata.create_all(bind=engine)
+        metadata.create_all(bind=bind)
         
         # Add missing columns to existing tables (for Render deployments)
         from sqlalchemy import text, inspect
-        inspector = inspect(engine)
+        inspector = inspect(bind)
         
         # Check if todo_items table exists and add missing columns
         if inspector.has_table("todo_items"):
-            with engine.begin() as conn:
+            with bind.begin() as conn:
                 columns = [col['name'] for col in inspector.get_columns("todo_items")]
                 
                 if 'status' not in columns:
-                    conn.execute(text("ALTER TABLE todo_items ADD COLUMN status VARCHAR(50) DEFAULT 'pending'"))
+                    # 0 = pending (see models.STATUS_CODES)
+                    conn.execute(text("ALTER TABLE todo_items ADD COLUMN status SMALLINT DEFAULT 0"))
                     conn.execute(text("ALTER TABLE todo_items ALTER COLUMN status SET NOT NULL"))
                     print("Added 'status' column to todo_items table")
                 
@@ -66,10 +131,41 @@ def init_db():
                     print("Updated 'description' column to TEXT")
                 except:
                     pass  # Column might already be TEXT or not exist
+
+        compact_status_columns(bind)
+
+        if inspector.has_table("users"):
+            with bind.begin() as conn:
+                columns = [col['name'] for col in inspector.get_columns("users")]
+
+                if 'timezone' not in columns:
+                    conn.execute(text("ALTER TABLE users ADD COLUMN timezone VARCHAR(64)"))
+                    print("Added 'timezone' column to users table")
+
+        if inspector.has_table("todo_items"):
+            # create_all skips existing tables, so add any new indexes here
+            for index in models.ToDoItem.__table__.indexes:
+                index.create(bind=bind, checkfirst=True)
     except Exception as e:
         print(f"Warning: Could not initialize database: {e}")
 
 init_db()
+# Shard databases (SHARD_URLS) hold the same schema, minus the foreign
+# keys to the primary-only tables
+for shard_engine in shard_router.engines.values():
+    if shard_engine is not engine:
+        init_db(shard_engine, shard_metadata())
+shard_router.sync_replicated()
+
+# Moves old completed tasks to todo_items_archive when ARCHIVE_INTERVAL is set
+for shard_engine in shard_router.engines.values():
+    start_archiver(shard_engine)
+
+# Picks up export/import jobs a previous run left queued
+try:
+    job_runner.recover()
+except Exception as e:
+    print(f"Warning: could not recover background jobs: {e}")
 
 # ---------------- STATIC FILES ----------------
 # Use absolute path for static files (works on Render)
@@ -84,11 +180,24 @@ app.include_router(admin.router)
 app.include_router(users.router)
 app.include_router(chatbot.router)
 app.include_router(dashboard.router)
+app.include_router(jobs.router)
 # ---------------- TEMPLATES ----------------
 # Use absolute path for templates (works on Render)
 template_dir = BASE_DIR / "template"
 templates = Jinja2Templates(directory=str(template_dir))
 
+# ---------------- METRICS ----------------
+@app.get("/metrics")
+async def metrics(principal: Annotated[Principal, Depends(require_permission(Permission.MANAGE_ALL_TASKS))]):
+    """Per-worker admission control and chatbot AI counters, for admins"""
+    return {
+        "admission": admission_controller.snapshot(),
+        "chatbot_ai": chatbot.normalizer.snapshot(),
+        "task_events": events.event_buffer.snapshot(),
+        "jobs": job_runner.snapshot(),
+    }
+
+
 # ---------------- ROOT (LANDING PAGE) ----------------
 @app.get("/")
 async def root(request: Request):
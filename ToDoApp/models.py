@@ -1,9 +1,36 @@
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, ForeignKey, DateTime, Date, Text, Index, CheckConstraint
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.types import TypeDecorator
 from ToDoApp.database import Base
 
 
+# Task status is stored as a SMALLINT code; Python code, queries and
+# templates keep using the names
+STATUS_CODES = {"pending": 0, "progress": 1, "completed": 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+# Bound for names outside STATUS_CODES: matches no row, fails the check constraint
+UNKNOWN_STATUS_CODE = -1
+
+
+class StatusCode(TypeDecorator):
+    """Status name <-> SMALLINT code. Reads tolerate legacy word and digit-string values."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return STATUS_CODES.get(value, UNKNOWN_STATUS_CODE)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str) and not value.isdigit():
+            return value
+        return STATUS_NAMES.get(int(value), str(value))
+
+
 class Users(Base):
     __tablename__ = "users"
 
@@ -15,6 +42,7 @@ class Users(Base):
     role = Column(String(50))
     hashed_password = Column(String(255))
     is_active = Column(Boolean, default=True)
+    timezone = Column(String(64), nullable=True)  # IANA name, e.g. "Asia/Kolkata"
 
     # relationship
     todos = relationship("ToDoItem", back_populates="owner")
@@ -32,12 +60,14 @@ class ToDoItem(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), nullable=False, index=True)
-    description = Column(Text)  # Changed to Text for longer descriptions
-    priority = Column(Integer, nullable=False, default=3)  # 1=High, 2=Medium, 3=Low
+    # Changed to Text for longer descriptions. Deferred: list views never
+    # load it (see ToDoApp.read_models); full views undefer it.
+    description = deferred(Column(Text))
+    priority = Column(SmallInteger, nullable=False, default=3)  # 1=High, 2=Medium, 3=Low
 
     # SINGLE source of truth
-    status = Column(String(50), default="pending", nullable=False)
-    # pending | progress | completed
+    status = Column(StatusCode, default="pending", nullable=False)
+    # pending | progress | completed (stored as STATUS_CODES)
 
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
@@ -52,3 +82,143 @@ class ToDoItem(Base):
     # relationships
     owner = relationship("Users", back_populates="todos")
     category = relationship("Category", back_populates="todos")
+
+    __table_args__ = (
+        # Serves per-owner listings (newest first) and manager/admin scopes
+        Index("ix_todo_items_owner_created", "owner_id", "created_at"),
+        # Open-task lookups per owner (recommendations), nearest deadline first
+        Index("ix_todo_items_owner_status_due", "owner_id", "status", "due_date"),
+        # Finds completed tasks old enough to archive
+        Index("ix_todo_items_status_updated", "status", "updated_at"),
+        # Delta sync: a user's tasks changed since a cursor (ToDoApp.sync)
+        Index("ix_todo_items_owner_updated", "owner_id", "updated_at"),
+        CheckConstraint("status IN (0, 1, 2)", name="ck_todo_items_status"),
+    )
+
+
+class ToDoItemArchive(Base):
+    """
+    Completed tasks moved out of todo_items by ToDoApp.archive. Same
+    columns and ids as the live table, plus when the row was archived.
+    """
+    __tablename__ = "todo_items_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String(100), nullable=False)
+    description = deferred(Column(Text))
+    priority = Column(SmallInteger, nullable=False, default=3)
+    status = Column(StatusCode, default="completed", nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    due_date = Column(Date, nullable=True)
+    tags = Column(String(255), nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    category = relationship("Category", viewonly=True)
+
+    __table_args__ = (
+        Index("ix_todo_items_archive_owner_created", "owner_id", "created_at"),
+        CheckConstraint("status IN (0, 1, 2)", name="ck_todo_items_archive_status"),
+    )
+
+
+class UserTaskCounters(Base):
+    """
+    Denormalized per-user task counts, kept in step with todo_items by the
+    flush hook in ToDoApp.counters (same transaction as the change).
+    """
+    __tablename__ = "user_task_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    pending = Column(Integer, nullable=False, default=0)
+    progress = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    priority_high = Column(Integer, nullable=False, default=0)
+    priority_medium = Column(Integer, nullable=False, default=0)
+    priority_low = Column(Integer, nullable=False, default=0)
+
+
+class TaskEvent(Base):
+    """
+    Append-only log of task changes, written behind the request by
+    ToDoApp.events. No foreign key to todo_items: deleted tasks keep
+    their history.
+    """
+    __tablename__ = "task_events"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    event_type = Column(String(20), nullable=False)  # created | completed | reopened | updated | deleted
+    occurred_at = Column(DateTime, nullable=False)
+    recorded_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TaskDailyStats(Base):
+    """Per-user, per-local-day rollup of task_events"""
+    __tablename__ = "task_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    reopened = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+
+
+class RollupCursor(Base):
+    """Last task_events id folded into a rollup"""
+    __tablename__ = "rollup_cursors"
+
+    name = Column(String(50), primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+
+
+class TaskTombstone(Base):
+    """
+    Deletion log for delta sync: one row per task deleted (or moved to
+    another owner), written in the same flush by ToDoApp.sync.
+    """
+    __tablename__ = "task_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_task_tombstones_owner_deleted", "owner_id", "deleted_at"),
+    )
+
+
+class Job(Base):
+    """
+    Background export/import job run by ToDoApp.jobs. Kept on the primary
+    so any worker process can claim, update and report it.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # export | import
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | succeeded | failed
+    params = Column(Text)  # JSON
+    progress = Column(Integer, nullable=False, default=0)  # rows handled so far
+    total = Column(Integer)  # rows expected, when known up front
+    result = Column(Text)  # JSON summary, e.g. the import report
+    result_path = Column(String(255))  # compressed export file
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # Touched on every progress report; a running job that stops updating
+    # was lost with its worker
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_jobs_owner_created", "owner_id", "created_at"),
+        Index("ix_jobs_status_created", "status", "created_at"),
+    )
@@ -0,0 +1,140 @@
+"""
+Per-request SQL query counting and timing.
+
+Cursor-execute hooks on every Engine add each statement's count and
+duration to the QueryStats of the current request, held in a context
+variable that QueryStatsMiddleware sets. The middleware reports the
+totals as response headers:
+
+    X-Query-Count: 4
+    Server-Timing: db;dur=3.1;desc="4 queries"
+
+Sync endpoints and dependencies run in a threadpool with a copy of the
+context, and ShardRouter.scatter copies it into its workers, so their
+queries count too. Queries issued after the response has started (a
+streamed body) are not in the headers.
+
+Tests guard against per-row queries with `assert_max_queries`, which
+counts every statement the process runs while the block is open:
+
+    with assert_max_queries(3):
+        client.get("/todos/export")
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "1") != "0"
+
+
+class QueryStats:
+    """Statement count and total database time in seconds"""
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = [] if keep_statements else None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            if self.statements is not None:
+                self.statements.append(statement)
+
+    def headers(self) -> list:
+        return [
+            (b"x-query-count", str(self.count).encode()),
+            (b"server-timing", f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'.encode()),
+        ]
+
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Process-wide collectors opened by capture_queries()
+_captures = []
+_captures_lock = threading.Lock()
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    duration = time.perf_counter() - started
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for capture in tuple(_captures):
+        capture.record(statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_query_timer(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+@contextmanager
+def capture_queries():
+    """QueryStats (with the statements) for every query run while the block is open"""
+    stats = QueryStats(keep_statements=True)
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail if the block runs more than `limit` queries; for tests"""
+    with capture_queries() as stats:
+        yield stats
+    assert stats.count <= limit, (
+        f"{stats.count} queries, expected at most {limit}:\n" + "\n".join(stats.statements)
+    )
+
+
+class QueryStatsMiddleware:
+    """Counts the queries of each HTTP request and reports them as response headers"""
+
+    def __init__(self, app, headers: bool = QUERY_STATS_HEADERS):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.headers:
+                message["headers"] = list(message.get("headers", [])) + stats.headers()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
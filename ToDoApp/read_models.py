@@ -0,0 +1,131 @@
+"""
+Read models for task list views.
+
+List pages show a handful of fields per task, so they select just those
+columns into NamedTuples instead of hydrating ToDoItem entities: the
+category name is joined in, and the description is cut to a preview in
+SQL. On the entity `description` is deferred; views that show it in full
+(details, edit, export) undefer it.
+"""
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import asc, desc, func, or_, select
+from sqlalchemy.orm import Session
+
+from ToDoApp.models import Category, ToDoItem
+
+
+# Templates show this many characters; one more is fetched so they can
+# tell a cut description from one that is exactly this long
+DESCRIPTION_PREVIEW = 50
+
+SORT_COLUMNS = {
+    "title": ToDoItem.title,
+    "priority": ToDoItem.priority,
+    "status": ToDoItem.status,
+    "due_date": ToDoItem.due_date,
+    "created_at": ToDoItem.created_at,
+    "updated_at": ToDoItem.updated_at,
+}
+
+
+class TaskListRow(NamedTuple):
+    id: int
+    title: str
+    description: Optional[str]  # first DESCRIPTION_PREVIEW + 1 characters
+    priority: int
+    status: str
+    due_date: Optional[date]
+    tags: Optional[str]
+    category_id: Optional[int]
+    category_name: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+
+class RecentTask(NamedTuple):
+    id: int
+    title: str
+    status: str
+    created_at: Optional[datetime]
+
+    @property
+    def created_at_iso(self) -> Optional[str]:
+        return self.created_at.isoformat() if self.created_at else None
+
+
+LIST_COLUMNS = (
+    ToDoItem.id,
+    ToDoItem.title,
+    func.substr(ToDoItem.description, 1, DESCRIPTION_PREVIEW + 1).label("description"),
+    ToDoItem.priority,
+    ToDoItem.status,
+    ToDoItem.due_date,
+    ToDoItem.tags,
+    ToDoItem.category_id,
+    Category.name.label("category_name"),
+    ToDoItem.created_at,
+    ToDoItem.updated_at,
+)
+
+
+def task_list_filters(
+    owner_id: int,
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category_id: Optional[int] = None,
+    priority: Optional[int] = None,
+) -> list:
+    """WHERE criteria shared by the list and its count"""
+    criteria = [ToDoItem.owner_id == owner_id]
+    if search:
+        search_term = f"%{search}%"
+        criteria.append(or_(
+            ToDoItem.title.ilike(search_term),
+            ToDoItem.description.ilike(search_term),
+            ToDoItem.tags.ilike(search_term),
+        ))
+    if status:
+        criteria.append(ToDoItem.status == status)
+    if category_id:
+        criteria.append(ToDoItem.category_id == category_id)
+    if priority:
+        criteria.append(ToDoItem.priority == priority)
+    return criteria
+
+
+def fetch_task_page(
+    db: Session,
+    criteria: list,
+    sort_by: Optional[str],
+    sort_order: Optional[str],
+    page: int,
+    per_page: int,
+) -> tuple:
+    """(rows, total_count) for one page; only that page's rows are fetched"""
+    total_count = db.execute(select(func.count(ToDoItem.id)).where(*criteria)).scalar()
+
+    sort_column = SORT_COLUMNS.get(sort_by, ToDoItem.created_at)
+    direction = asc if sort_order == "asc" else desc
+    rows = db.execute(
+        select(*LIST_COLUMNS)
+        .outerjoin(Category, Category.id == ToDoItem.category_id)
+        .where(*criteria)
+        # id breaks ties so pages neither repeat nor skip rows
+        .order_by(direction(sort_column), direction(ToDoItem.id))
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+    return [TaskListRow(*row) for row in rows], total_count
+
+
+def recent_tasks(db: Session, owner_id: int, limit: int = 4) -> list:
+    """Newest tasks first, for the dashboard's "today" panel"""
+    rows = db.execute(
+        select(ToDoItem.id, ToDoItem.title, ToDoItem.status, ToDoItem.created_at)
+        .where(ToDoItem.owner_id == owner_id)
+        .order_by(ToDoItem.created_at.desc())
+        .limit(limit)
+    )
+    return [RecentTask(*row) for row in rows]
@@ -0,0 +1,115 @@
+"""
+"What should I do next?" ranking for open tasks.
+
+The score is a SQL expression, so the database filters a user's open tasks
+through the (owner_id, status, due_date) index, sorts by score and stops
+after LIMIT rows; nothing but the returned tasks reaches Python. Because
+the score is relative to today it is computed per query rather than
+stored, with every date boundary bound as a parameter so the same SQL
+works on SQLite and PostgreSQL.
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from ToDoApp.models import ToDoItem
+from ToDoApp.timewindows import local_today, resolve_timezone
+
+
+OPEN_STATUSES = ("pending", "progress")
+
+# Score weights. Priority dominates, a missed deadline outranks everything
+# else, and the nearer a deadline the more it adds.
+PRIORITY_WEIGHT = 30        # High=90, Medium=60, Low=30
+OVERDUE_BONUS = 100
+DUE_SOON_BONUSES = ((1, 60), (3, 40), (7, 20))   # (within N days, bonus)
+AGE_BONUSES = ((30, 15), (7, 8))                 # (older than N days, bonus)
+IN_PROGRESS_BONUS = 10      # finish what was started
+
+
+class Recommendation(NamedTuple):
+    id: int
+    title: str
+    priority: int
+    status: str
+    due_date: Optional[date]
+    created_at: Optional[datetime]
+    score: int
+
+
+def score_expression(today: date, now: datetime):
+    due = ToDoItem.due_date
+    due_bonus = case(
+        (due.is_(None), 0),
+        (due < today, OVERDUE_BONUS),
+        *((due <= today + timedelta(days=days), bonus) for days, bonus in DUE_SOON_BONUSES),
+        else_=0,
+    )
+    age_bonus = case(
+        *((ToDoItem.created_at < now - timedelta(days=days), bonus) for days, bonus in AGE_BONUSES),
+        else_=0,
+    )
+    status_bonus = case((ToDoItem.status == "progress", IN_PROGRESS_BONUS), else_=0)
+    return (4 - ToDoItem.priority) * PRIORITY_WEIGHT + due_bonus + age_bonus + status_bonus
+
+
+def recommend_tasks(
+    db: Session,
+    user_id: int,
+    limit: int = 3,
+    task_ids: Optional[Iterable[int]] = None,
+    today: Optional[date] = None,
+) -> list:
+    """
+    Top `limit` open tasks for a user, best first. `task_ids` restricts the
+    ranking to a candidate set (e.g. from a title search). `today` is the
+    user's local day; it defaults to today in DEFAULT_TIMEZONE.
+    """
+    today = today or local_today(resolve_timezone())
+    now = datetime.utcnow()
+    score = score_expression(today, now).label("score")
+
+    query = select(
+        ToDoItem.id, ToDoItem.title, ToDoItem.priority, ToDoItem.status,
+        ToDoItem.due_date, ToDoItem.created_at, score
+    ).where(
+        ToDoItem.owner_id == user_id,
+        ToDoItem.status.in_(OPEN_STATUSES),
+    )
+    if task_ids is not None:
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        query = query.where(ToDoItem.id.in_(task_ids))
+
+    query = query.order_by(
+        score.desc(),
+        ToDoItem.due_date.is_(None),
+        ToDoItem.due_date,
+        ToDoItem.id,
+    ).limit(limit)
+
+    return [Recommendation(*row) for row in db.execute(query)]
+
+
+def explain(task: Recommendation, today: Optional[date] = None) -> str:
+    """Short human reason for a recommendation"""
+    today = today or local_today(resolve_timezone())
+    reasons = []
+    if task.due_date is not None:
+        days = (task.due_date - today).days
+        if days < 0:
+            reasons.append(f"overdue by {-days} day{'s' if days != -1 else ''}")
+        elif days == 0:
+            reasons.append("due today")
+        elif days <= DUE_SOON_BONUSES[-1][0]:
+            reasons.append(f"due in {days} day{'s' if days != 1 else ''}")
+    if task.priority == 1:
+        reasons.append("high priority")
+    if task.status == "progress":
+        reasons.append("already in progress")
+    if not reasons and task.created_at is not None and task.created_at < datetime.utcnow() - timedelta(days=AGE_BONUSES[-1][0]):
+        reasons.append("waiting for a while")
+    return ", ".join(reasons)
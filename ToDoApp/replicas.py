@@ -0,0 +1,74 @@
+"""
+Read sessions for read-only endpoints.
+
+`get_read_db` opens a routed session whose SELECTs against the primary go
+to one of the REPLICA_URLS engines (round-robin per request), so GET
+traffic such as dashboard polling stays off the primary. Without
+replicas it is the same session `get_db` would give.
+
+Replicas lag behind the primary, so after a user's successful write
+request (any method but GET/HEAD/OPTIONS) ReadYourWritesMiddleware stamps
+their session cookie, and for READ_YOUR_WRITES_SECONDS their reads go to
+the primary as well. Writes made over the chatbot WebSocket cannot update
+the cookie and are not covered.
+"""
+import os
+import time
+from typing import Annotated
+
+from fastapi import Depends
+from fastapi.requests import HTTPConnection
+from sqlalchemy.orm import Session
+
+from ToDoApp.sharding import session_owner_id, shard_router
+
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PRIMARY_PIN_KEY = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def pin_primary(session: dict, seconds: float = READ_YOUR_WRITES_SECONDS):
+    session[PRIMARY_PIN_KEY] = time.time() + seconds
+
+
+def is_pinned(session: dict) -> bool:
+    """True while a recent write by this user may not have reached the replicas"""
+    return session.get(PRIMARY_PIN_KEY, 0) > time.time()
+
+
+def get_read_db(connection: HTTPConnection):
+    session = connection.session
+    db = shard_router.session(session_owner_id(connection), read_only=not is_pinned(session))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+read_db_dependency = Annotated[Session, Depends(get_read_db)]
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins the user's reads to the primary after a successful write request.
+    Must sit inside SessionMiddleware so the stamp is saved in the cookie.
+    """
+
+    def __init__(self, app, seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                session = scope.get("session")
+                if session is not None and session.get("user"):
+                    pin_primary(session, self.seconds)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,13 +1,22 @@
-from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends, Path, Request
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Annotated, Optional
+from fastapi import APIRouter, HTTPException, Depends, Path, Request, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from ToDoApp import models
 from ToDoApp.database import engine, SessionLocal
+from sqlalchemy import select, func, case, and_, or_
 from sqlalchemy.orm import Session as session
 from ToDoApp.routers import auth
 from ToDoApp.routers.todos import get_db
-from ToDoApp.routers.rbac import require_role, is_admin
+from ToDoApp.routers.rbac import Permission, Principal, require_permission
+from ToDoApp.replicas import read_db_dependency
+from ToDoApp.sharding import shard_router
+from ToDoApp.timewindows import local_today, timezone_dependency
 
 router = APIRouter(prefix='/admin', tags=['admin'])
 templates = Jinja2Templates(directory="ToDoApp/template")
@@ -23,34 +32,355 @@ models.Base.metadata.create_all(bind=engine)
 
 db_dependency = Annotated[session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(auth.get_current_user)]
+admin_dependency = Annotated[Principal, Depends(require_permission(Permission.MANAGE_ALL_TASKS))]
+members_dependency = Annotated[Principal, Depends(require_permission(Permission.VIEW_MEMBERS))]
+
+# Columns that may be requested through ?fields=
+TODO_COLUMNS = {column.name: column for column in models.ToDoItem.__table__.columns}
+STREAM_BATCH_SIZE = 1000
+
+
+def build_admin_todo_query(
+    fields: Optional[str],
+    owner_id: Optional[int],
+    status: Optional[str],
+    category_id: Optional[int],
+    created_from: Optional[date],
+    created_to: Optional[date],
+):
+    """Column-projected, filtered select over all todos, ordered by id"""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in TODO_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        # id is always returned because it is the pagination key
+        columns = [TODO_COLUMNS["id"]] + [TODO_COLUMNS[name] for name in names if name != "id"]
+    else:
+        columns = list(TODO_COLUMNS.values())
+
+    ToDoItem = models.ToDoItem
+    query = select(*columns).order_by(ToDoItem.id)
+    if owner_id is not None:
+        query = query.where(ToDoItem.owner_id == owner_id)
+    if status:
+        query = query.where(ToDoItem.status == status)
+    if category_id is not None:
+        query = query.where(ToDoItem.category_id == category_id)
+    # Date bounds are inclusive days; compare on the raw column so indexes apply
+    if created_from:
+        query = query.where(ToDoItem.created_at >= datetime.combine(created_from, time.min))
+    if created_to:
+        query = query.where(ToDoItem.created_at < datetime.combine(created_to + timedelta(days=1), time.min))
+    return query
+
+
+def stream_ndjson(binds, query):
+    """Yield one JSON document per row using a server-side cursor, one shard after another"""
+    for bind in binds:
+        with session(bind=bind) as stream_db:
+            result = stream_db.execute(
+                query.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+            )
+            for partition in result.partitions():
+                yield "".join(
+                    json.dumps(jsonable_encoder(dict(row._mapping))) + "\n" for row in partition
+                )
+
+
+def encode_cursor(positions: dict) -> str:
+    """Per-shard last ids as an opaque token; a bare id when there is one shard"""
+    if len(shard_router) == 1:
+        return str(next(iter(positions.values())))
+    raw = json.dumps(positions, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> dict:
+    """{shard: last id}; a bare id applies to every shard"""
+    if not cursor:
+        return {}
+    if cursor.isdigit():
+        return {shard: int(cursor) for shard in shard_router.engines}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        positions = json.loads(raw)
+        return {str(shard): int(last_id) for shard, last_id in positions.items()}
+    except (binascii.Error, ValueError, AttributeError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def fetch_todo_page(db, query, positions: dict, limit: int, owner_id: Optional[int] = None) -> tuple:
+    """
+    One keyset page across shards. Every shard returns its next limit + 1
+    rows after its own cursor, in parallel; the rows are merged on
+    (id, shard) and each shard's new cursor is the last id taken from it.
+    Returns (rows, next positions or None on the last page).
+    """
+    default_shard = next(iter(shard_router.engines))
+
+    def shard_page(shard_db):
+        shard = shard_db.info.get("shard", default_shard)
+        shard_query = query
+        if shard in positions:
+            shard_query = shard_query.where(models.ToDoItem.id > positions[shard])
+        return shard, shard_db.execute(shard_query.limit(limit + 1)).all()
+
+    merged = sorted(
+        (
+            (row.id, index, shard, row)
+            for index, (shard, rows) in enumerate(shard_router.scatter(db, shard_page, owner_id))
+            for row in rows
+        ),
+        key=lambda item: item[:2],
+    )
+    page = merged[:limit]
+    if len(merged) <= limit:
+        return [row for *_, row in page], None
+
+    next_positions = dict(positions)
+    for row_id, _, shard, _ in page:
+        next_positions[shard] = row_id
+    return [row for *_, row in page], next_positions
+
 
 @router.get("/todo", status_code=200)
-@require_role(["admin", "superuser"])
-async def read_all_todos(db: db_dependency, user: user_dependency):
-    """Get all todos - Admin only"""
-    return db.query(models.ToDoItem).all()
+async def read_all_todos(
+    request: Request,
+    db: read_db_dependency,
+    principal: admin_dependency,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    owner_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    category_id: Optional[int] = Query(None),
+    created_from: Optional[date] = Query(None),
+    created_to: Optional[date] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated column names"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Get all todos - Admin only
+
+    JSON pages are keyset-paginated on id (per shard, merged); the next
+    page's cursor is sent in the X-Next-Cursor header (absent on the last
+    page). format=ndjson streams every matching row instead, shard by
+    shard, ignoring cursor and limit.
+    """
+    query = build_admin_todo_query(fields, owner_id, status, category_id, created_from, created_to)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(shard_router.binds(db, owner_id), query),
+            media_type="application/x-ndjson"
+        )
+
+    rows, next_positions = fetch_todo_page(db, query, decode_cursor(cursor), limit, owner_id)
+
+    headers = {}
+    if next_positions is not None:
+        next_cursor = encode_cursor(next_positions)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+
+    return JSONResponse(
+        content=jsonable_encoder([dict(row._mapping) for row in rows]),
+        headers=headers
+    )
 
 @router.delete("/todo/{todo_id}", status_code=204)
-@require_role(["admin", "superuser"])
-async def delete_todo(db: db_dependency, user: user_dependency, todo_id: int = Path(gt=0)):
+async def delete_todo(
+    db: db_dependency,
+    principal: admin_dependency,
+    todo_id: int = Path(gt=0),
+    owner_id: Optional[int] = Query(None, description="Owner of the todo; needed when the id exists on several shards")
+):
     """Delete any todo - Admin only"""
-    todo = db.query(models.ToDoItem).filter(models.ToDoItem.id == todo_id).first()
-    if todo is None:
+    ToDoItem = models.ToDoItem
+    lookup = select(ToDoItem.owner_id).where(ToDoItem.id == todo_id)
+    if owner_id is not None:
+        lookup = lookup.where(ToDoItem.owner_id == owner_id)
+    # Ids are only unique within a shard
+    owners = [
+        found for found in shard_router.scatter(db, lambda shard_db: shard_db.execute(lookup).scalar(), owner_id)
+        if found is not None
+    ]
+    if not owners:
         raise HTTPException(status_code=404, detail='Todo not found.')
-    db.delete(todo)
-    db.commit()
+    if len(owners) > 1:
+        raise HTTPException(status_code=409, detail='Todo id exists for several owners; pass owner_id.')
+
+    with shard_router.owner_session(db, owners[0]) as owner_db:
+        todo = owner_db.query(ToDoItem).filter(ToDoItem.id == todo_id, ToDoItem.owner_id == owners[0]).first()
+        owner_db.delete(todo)
+        owner_db.commit()
     return
 
+# ---------------- MEMBERS ----------------
+def build_member_stats_query(search: Optional[str], today: date):
+    """
+    One LEFT JOIN ... GROUP BY producing each member's task aggregates.
+    `matching` is the total number of members matching the search, computed
+    with a window function so a page needs a single round trip.
+    """
+    Users, ToDoItem = models.Users, models.ToDoItem
+    is_open = and_(ToDoItem.id.isnot(None), ToDoItem.status != "completed")
+
+    query = (
+        select(
+            Users.id,
+            Users.username,
+            Users.email,
+            Users.first_name,
+            Users.last_name,
+            Users.role,
+            Users.is_active,
+            func.count(ToDoItem.id).label("total"),
+            func.coalesce(func.sum(case((is_open, 1), else_=0)), 0).label("open"),
+            func.coalesce(func.sum(case((and_(is_open, ToDoItem.due_date < today), 1), else_=0)), 0).label("overdue"),
+            func.coalesce(func.sum(case((ToDoItem.status == "completed", 1), else_=0)), 0).label("completed"),
+            func.max(ToDoItem.updated_at).label("last_activity"),
+            func.count().over().label("matching"),
+        )
+        .outerjoin(ToDoItem, ToDoItem.owner_id == Users.id)
+        .group_by(Users.id)
+        .order_by(Users.username, Users.id)
+    )
+    return filter_members(query, search)
+
+
+def filter_members(query, search: Optional[str]):
+    if search:
+        term = f"%{search}%"
+        Users = models.Users
+        query = query.where(or_(
+            Users.username.ilike(term),
+            Users.email.ilike(term),
+            Users.first_name.ilike(term),
+            Users.last_name.ilike(term),
+        ))
+    return query
+
+
+MEMBER_COLUMNS = ("id", "username", "email", "first_name", "last_name", "role", "is_active")
+MEMBER_TASK_COLUMNS = ("total", "open", "overdue", "completed", "last_activity")
+
+
+def fetch_sharded_member_rows(db, query, today: date) -> list:
+    """
+    Member page when tasks are sharded: `query` selects one page of users
+    on the primary, then each shard aggregates tasks for those users in
+    parallel. Every owner's tasks live on one shard, so nothing is summed
+    across shards.
+    """
+    users = [dict(row._mapping) for row in db.execute(query)]
+    if not users:
+        return []
+
+    ToDoItem = models.ToDoItem
+    is_open = ToDoItem.status != "completed"
+    task_query = (
+        select(
+            ToDoItem.owner_id,
+            func.count(ToDoItem.id).label("total"),
+            func.coalesce(func.sum(case((is_open, 1), else_=0)), 0).label("open"),
+            func.coalesce(func.sum(case((and_(is_open, ToDoItem.due_date < today), 1), else_=0)), 0).label("overdue"),
+            func.coalesce(func.sum(case((ToDoItem.status == "completed", 1), else_=0)), 0).label("completed"),
+            func.max(ToDoItem.updated_at).label("last_activity"),
+        )
+        .where(ToDoItem.owner_id.in_([user["id"] for user in users]))
+        .group_by(ToDoItem.owner_id)
+    )
+    stats = {}
+    for shard_rows in shard_router.scatter(db, lambda shard_db: shard_db.execute(task_query).all()):
+        stats.update((row.owner_id, row) for row in shard_rows)
+
+    for user in users:
+        row = stats.get(user["id"])
+        for column in MEMBER_TASK_COLUMNS:
+            user[column] = getattr(row, column) if row is not None else (None if column == "last_activity" else 0)
+    return users
+
+
+def fetch_member_page(db, search: Optional[str], page: int, per_page: int, today: date) -> dict:
+    if len(shard_router) > 1:
+        Users = models.Users
+        query = filter_members(
+            select(
+                *(getattr(Users, column) for column in MEMBER_COLUMNS),
+                func.count().over().label("matching"),
+            ).order_by(Users.username, Users.id),
+            search,
+        )
+        rows = fetch_sharded_member_rows(db, query.limit(per_page).offset((page - 1) * per_page), today)
+    else:
+        query = build_member_stats_query(search, today)
+        rows = [dict(row._mapping) for row in db.execute(query.limit(per_page).offset((page - 1) * per_page))]
+
+    members = []
+    for row in rows:
+        member = dict(row)
+        member.pop("matching")
+        members.append(member)
+
+    if rows:
+        total_count = rows[0]["matching"]
+    elif page > 1:
+        # Past the last page; the window count is unavailable without rows
+        total_count = db.execute(
+            select(func.count()).select_from(query.with_only_columns(models.Users.id).subquery())
+        ).scalar()
+    else:
+        total_count = 0
+    total_pages = (total_count + per_page - 1) // per_page
+
+    return {
+        "members": members,
+        "pagination": {
+            "page": page,
+            "per_page": per_page,
+            "total_pages": total_pages,
+            "total_count": total_count,
+            "has_prev": page > 1,
+            "has_next": page < total_pages,
+        },
+    }
+
+
 @router.get("/members")
-async def members_page(request: Request, db: db_dependency, user: user_dependency):
+async def members_page(
+    request: Request,
+    db: read_db_dependency,
+    user: user_dependency,
+    principal: members_dependency,
+    tz: timezone_dependency,
+    search: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=200)
+):
     """Members management page - Manager and above"""
-    if not is_admin(user) and user.get('user_role', '').lower() != 'manager':
-        raise HTTPException(status_code=403, detail="Access denied. Manager or Admin role required.")
-    
-    from ToDoApp.models import Users
-    all_users = db.query(Users).all()
-    
+    result = fetch_member_page(db, search, page, per_page, local_today(tz))
+
     return templates.TemplateResponse(
         "admin/members.html",
-        {"request": request, "user": user, "users": all_users}
+        {
+            "request": request,
+            "user": user,
+            "members": result["members"],
+            "pagination": result["pagination"],
+            "search": search or "",
+        }
     )
+
+
+@router.get("/api/members")
+async def members_api(
+    db: read_db_dependency,
+    principal: members_dependency,
+    tz: timezone_dependency,
+    search: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=200)
+):
+    """Paginated members with per-user task counts - Manager and above"""
+    return JSONResponse(content=jsonable_encoder(fetch_member_page(db, search, page, per_page, local_today(tz))))
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, WebSocket, WebSocketException, status
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
@@ -74,6 +74,14 @@ def get_current_user(request: Request):
     return user
 
 
+def get_current_ws_user(websocket: WebSocket):
+    """Session user for a WebSocket handshake; closes with 1008 if absent"""
+    user = websocket.session.get("user")
+    if not user:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+    return user
+
+
 # ---------------- AUTH ENDPOINTS ----------------
 
 @router.post("/")
@@ -128,7 +136,8 @@ async def login_user(
     request.session["user"] = {
         "username": user.username,
         "user_id": user.id,
-        "user_role": user.role
+        "user_role": user.role,
+        "timezone": user.timezone
     }
 
     response = RedirectResponse("/dashboard/", status_code=302)
@@ -1,16 +1,28 @@
-import re
+import asyncio
+import base64
 from datetime import datetime, date
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.requests import HTTPConnection
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy import or_, event, select, func, inspect
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from typing import Annotated, Optional
-from ToDoApp.routers.auth import get_current_user
+from ToDoApp.routers.auth import get_current_user, get_current_ws_user
 from ToDoApp.models import ToDoItem, Category
-from ToDoApp.database import SessionLocal
+from ToDoApp.cache import TTLCache
+from ToDoApp.counters import get_counters
+from ToDoApp.recommendations import explain, recommend_tasks
+from ToDoApp.sharding import session_owner_id, shard_router
+from ToDoApp.routers import chatbot_nlp
+from ToDoApp.routers.chatbot_ai import normalizer_from_env
+from ToDoApp.routers.chatbot_index import TitleIndexRegistry
+from ToDoApp.routers.chatbot_nlp import CategoryMatcher, ParsedMessage, parse_message
+from ToDoApp.timewindows import TIMEZONE_HEADER, local_today, resolve_timezone, timezone_dependency
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 user_dependency = Annotated[dict, Depends(get_current_user)]
+ws_user_dependency = Annotated[dict, Depends(get_current_ws_user)]
 
 
 class ChatbotRequest(BaseModel):
@@ -21,8 +33,9 @@ class ChatbotResponse(BaseModel):
     reply: str
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(connection: HTTPConnection):
+    # Bound to the logged-in user's shard (see ToDoApp.sharding)
+    db = shard_router.session(session_owner_id(connection))
     try:
         yield db
     finally:
@@ -36,190 +49,126 @@ db_dependency = Annotated[Session, Depends(get_db)]
 
 
 def extract_intent(message: str) -> str:
-    msg = message.lower().strip()
+    return chatbot_nlp.resolve_intent(chatbot_nlp.scan_keywords(message.lower()))
 
-    if any(w in msg for w in ["what should", "suggest", "recommend", "plan"]):
-        return "suggest"
 
-    if any(w in msg for w in ["create", "add", "new", "make"]) and "task" in msg:
-        return "create"
+def extract_task_id(message: str):
+    return chatbot_nlp.extract_task_id(message.lower())
 
-    if any(w in msg for w in ["update", "edit", "change", "modify"]) and "task" in msg:
-        return "update"
 
-    if any(w in msg for w in ["delete", "remove"]) and "task" in msg:
-        return "delete"
+def extract_title(message: str, intent: str) -> Optional[str]:
+    """Extract task title from message"""
+    return chatbot_nlp.extract_title(message)
 
-    if any(w in msg for w in ["list", "show", "display", "my tasks"]):
-        return "list"
 
-    if any(w in msg for w in ["status", "progress", "statistics"]):
-        return "status"
+def extract_description(message: str) -> Optional[str]:
+    """Extract description from message"""
+    return chatbot_nlp.extract_description(message)
 
-    if any(w in msg for w in ["help", "commands"]):
-        return "help"
 
-    if any(w in msg for w in ["hi", "hello", "hey"]):
-        return "greeting"
-    
-    if any(w in msg for w in ["study plan", "study planner", "exam plan","plan my study", "help me study", "semester exam"]):
-        return "study_plan"
+def extract_priority(message: str) -> int:
+    """Extract priority from message (default: 3 = Low)"""
+    msg = message.lower()
+    return chatbot_nlp.resolve_priority(chatbot_nlp.scan_keywords(msg), msg)
 
-    return "unknown"
 
+def extract_status(message: str) -> Optional[str]:
+    """Extract status from message"""
+    return chatbot_nlp.resolve_status(chatbot_nlp.scan_keywords(message.lower()))
 
 
-def extract_task_id(message: str):
-    patterns = [
-        r'task\s*(?:#|id|number)?\s*(\d{1,3})',
-        r'#(\d{1,3})'
-    ]
+def load_category_names(db: Session):
+    return db.query(Category.id, Category.name).all()
 
-    for p in patterns:
-        m = re.search(p, message.lower())
-        if m:
-            return int(m.group(1))
-    return None
 
+category_matcher = CategoryMatcher(load_category_names)
 
 
-def extract_title(message: str, intent: str) -> Optional[str]:
-    """Extract task title from message"""
-    msg = message.strip()
-    
-    # Remove intent keywords
-    remove_patterns = [
-        r'^(create|add|new|make)\s+(?:a\s+)?(?:new\s+)?(?:task|todo|item)[\s:]*',
-        r'^(update|edit|change|modify)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*',
-        r'^(delete|remove|drop)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*',
-    ]
-    
-    for pattern in remove_patterns:
-        msg = re.sub(pattern, '', msg, flags=re.IGNORECASE)
-    
-    # Extract text in quotes
-    quoted = re.search(r'["\']([^"\']+)["\']', msg)
-    if quoted:
-        return quoted.group(1).strip()
-    
-    # Extract text after colon
-    if ':' in msg:
-        parts = msg.split(':', 1)
-        if len(parts) > 1:
-            title = parts[1].strip()
-            # Remove description if present
-            if 'description' in title.lower() or 'desc' in title.lower():
-                title = re.sub(r'description[:\s]*.*', '', title, flags=re.IGNORECASE)
-            return title.split(',')[0].strip() if title else None
-    
-    # Extract first meaningful phrase
-    words = msg.split()
-    if len(words) > 0:
-        # Take first 5-10 words as title
-        title = ' '.join(words[:10])
-        # Remove common words
-        title = re.sub(r'\b(with|priority|status|description|desc)\b.*', '', title, flags=re.IGNORECASE)
-        return title.strip() if title.strip() else None
-    
-    return None
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+@event.listens_for(Category, "after_delete")
+def _invalidate_category_matcher(mapper, connection, target):
+    category_matcher.invalidate()
+    # Invalidate again once the change is visible to other sessions
+    session = object_session(target)
+    if session is not None:
+        session.info["categories_changed"] = True
 
 
-def extract_description(message: str) -> Optional[str]:
-    """Extract description from message"""
-    # Look for "description:", "desc:", or text after comma
-    patterns = [
-        r'description[:\s]+([^,]+)',
-        r'desc[:\s]+([^,]+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, message, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    
-    # If message has comma, description might be after it
-    if ',' in message:
-        parts = message.split(',', 1)
-        if len(parts) > 1:
-            desc = parts[1].strip()
-            # Remove priority/status keywords
-            desc = re.sub(r'\b(priority|status|high|medium|low|pending|progress|completed)\b.*', '', desc, flags=re.IGNORECASE)
-            return desc.strip() if desc.strip() else None
-    
-    return None
+@event.listens_for(Session, "after_commit")
+def _invalidate_category_matcher_on_commit(session):
+    if session.info.pop("categories_changed", False):
+        category_matcher.invalidate()
 
 
-def extract_priority(message: str) -> int:
-    """Extract priority from message (default: 3 = Low)"""
-    msg = message.lower()
-    
-    # Check for explicit priority numbers
-    if re.search(r'priority\s*(?:is\s*)?(?:=)?\s*([123])', msg):
-        match = re.search(r'priority\s*(?:is\s*)?(?:=)?\s*([123])', msg)
-        return int(match.group(1))
-    
-    # Check for priority words
-    if any(word in msg for word in ["high priority", "priority high", "important", "urgent"]):
-        return 1
-    if any(word in msg for word in ["medium priority", "priority medium", "normal"]):
-        return 2
-    if any(word in msg for word in ["low priority", "priority low", "not important"]):
-        return 3
-    
-    return 3  # Default to low
+def load_task_titles(db: Session, user_id: int):
+    return db.query(ToDoItem.id, ToDoItem.title).filter(ToDoItem.owner_id == user_id).all()
 
 
-def extract_status(message: str) -> Optional[str]:
-    """Extract status from message"""
-    msg = message.lower()
-    
-    if any(word in msg for word in ["completed", "complete", "done", "finished"]):
-        return "completed"
-    if any(word in msg for word in ["progress", "in progress", "working", "started"]):
-        return "progress"
-    if any(word in msg for word in ["pending", "not started", "todo"]):
-        return "pending"
-    
-    return None
+title_index = TitleIndexRegistry(load_task_titles)
+
+
+def _mark_title_index_stale(target):
+    title_index.invalidate(target.owner_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("title_index_owners", set()).add(target.owner_id)
+
+
+@event.listens_for(ToDoItem, "after_insert")
+@event.listens_for(ToDoItem, "after_delete")
+def _invalidate_title_index(mapper, connection, target):
+    _mark_title_index_stale(target)
+
+
+@event.listens_for(ToDoItem, "after_update")
+def _invalidate_title_index_on_rename(mapper, connection, target):
+    # Status and priority edits leave the index as it is
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.owner_id.history.has_changes():
+        _mark_title_index_stale(target)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_title_index_on_commit(session):
+    for owner_id in session.info.pop("title_index_owners", ()):
+        title_index.invalidate(owner_id)
+
+
+def resolve_task_id(parsed: ParsedMessage, db: Session, user_id: int) -> tuple:
+    """
+    (task_id, None) for the task a command refers to, by id or by fuzzy
+    title, or (None, reply) explaining why it could not be resolved.
+    """
+    if parsed.task_id:
+        return parsed.task_id, None
+    if not parsed.target:
+        return None, None
+
+    match, candidates = title_index.resolve(db, user_id, parsed.target)
+    if match:
+        return match.task_id, None
+    if candidates:
+        options = "\n".join(f"• #{c.task_id} {c.title}" for c in candidates)
+        return None, f"🤔 Several tasks match '{parsed.target}':\n{options}\nPlease use the task ID."
+    return None, f"❌ No task matching '{parsed.target}'. Say 'show my tasks' to see them."
 
 
 def extract_category_name(message: str, db: Session) -> Optional[int]:
     """Extract category ID from message by matching category name"""
-    msg = message.lower()
-    
-    # Get all categories
-    categories = db.query(Category).all()
-    
-    # Check if any category name appears in the message
-    for category in categories:
-        if category.name.lower() in msg:
-            return category.id
-    
-    return None
+    # The database is only consulted when the compiled matcher is rebuilt
+    return category_matcher.match(message.lower(), db)
 
 
-def extract_filters(message: str, db: Session) -> dict:
+def extract_filters(message: str, db: Session, parsed: Optional[ParsedMessage] = None) -> dict:
     """Extract all filter parameters from message"""
+    parsed = parsed or parse_message(message)
     filters = {
-        "priority": None,
-        "status": None,
+        "priority": parsed.filter_priority,
+        "status": parsed.status,
         "category_id": None
     }
     
-    # Extract priority filter
-    msg_lower = message.lower()
-    if any(word in msg_lower for word in ["high priority", "priority high", "high"]):
-        filters["priority"] = 1
-    elif any(word in msg_lower for word in ["medium priority", "priority medium", "medium"]):
-        filters["priority"] = 2
-    elif any(word in msg_lower for word in ["low priority", "priority low", "low"]):
-        filters["priority"] = 3
-    
-    # Extract status filter
-    status = extract_status(message)
-    if status:
-        filters["status"] = status
-    
     # Extract category filter
     category_id = extract_category_name(message, db)
     if category_id:
@@ -259,10 +208,13 @@ def handle_help() -> str:
 - "Update task #1: [new title]"
 - "Edit task 2, status completed"
 - "Change task #3, priority high"
+- "Complete buy groceries" (tasks can be named instead of numbered)
+- "Rename buy milk to buy oat milk"
 
 **Delete a task:**
 - "Delete task #1"
 - "Remove task 2"
+- "Delete 'call mom'"
 
 **List tasks (with filters):**
 - "Show all tasks"
@@ -281,24 +233,30 @@ def handle_help() -> str:
 You can filter tasks by priority (high/medium/low), status (pending/progress/completed), and category name when listing tasks."""
 
 
-def handle_create(message: str, db: Session, user_id: int) -> str:
-    """Handle task creation"""
-    title = extract_title(message, "create")
-    if not title:
-        return "I couldn't find a task title. Please try: 'Create task: [your task title]'"
-    
-    description = extract_description(message) or "Created via chatbot"
-    priority = extract_priority(message)
-    status = extract_status(message) or "pending"
-    
-    # Create the task
-    todo = ToDoItem(
-        title=title,
-        description=description,
-        priority=priority,
-        status=status,
+MISSING_TITLE_REPLY = "I couldn't find a task title. Please try: 'Create task: [your task title]'"
+MISSING_UPDATE_ID_REPLY = "I couldn't find a task ID. Please specify which task to update, e.g., 'Update task #1: [new title]'"
+MISSING_DELETE_ID_REPLY = "I couldn't find a task ID. Please specify which task to delete, e.g., 'Delete task #1'"
+
+
+def build_task(parsed: ParsedMessage, user_id: int) -> Optional[ToDoItem]:
+    """New (unsaved) task from a parsed create command, or None without a title"""
+    if not parsed.title:
+        return None
+    return ToDoItem(
+        title=parsed.title,
+        description=parsed.description or "Created via chatbot",
+        priority=parsed.priority,
+        status=parsed.status or "pending",
         owner_id=user_id
     )
+
+
+def handle_create(message: str, db: Session, user_id: int, parsed: Optional[ParsedMessage] = None) -> str:
+    """Handle task creation"""
+    parsed = parsed or parse_message(message)
+    todo = build_task(parsed, user_id)
+    if todo is None:
+        return MISSING_TITLE_REPLY
     
     db.add(todo)
     db.commit()
@@ -312,11 +270,12 @@ def handle_create(message: str, db: Session, user_id: int) -> str:
            f"Status: {todo.status}"
 
 
-def handle_update(message: str, db: Session, user_id: int) -> str:
+def handle_update(message: str, db: Session, user_id: int, parsed: Optional[ParsedMessage] = None) -> str:
     """Handle task update"""
-    task_id = extract_task_id(message)
+    parsed = parsed or parse_message(message)
+    task_id, reply = resolve_task_id(parsed, db, user_id)
     if not task_id:
-        return "I couldn't find a task ID. Please specify which task to update, e.g., 'Update task #1: [new title]'"
+        return reply or MISSING_UPDATE_ID_REPLY
     
     # Find the task
     todo = db.query(ToDoItem).filter(
@@ -327,13 +286,22 @@ def handle_update(message: str, db: Session, user_id: int) -> str:
     if not todo:
         return f"❌ Task #{task_id} not found. Please check the task ID."
     
-    # Extract updates
-    title = extract_title(message, "update")
-    description = extract_description(message)
-    priority = extract_priority(message)
-    status = extract_status(message)
+    updates = apply_update(todo, parsed)
+    if not updates:
+        return f"Task #{task_id} found, but no changes detected. Please specify what to update."
+    
+    db.commit()
+    
+    return f"✅ Task #{task_id} updated successfully!\n" + "\n".join([f"• {u}" for u in updates])
+
+
+def apply_update(todo: ToDoItem, parsed: ParsedMessage) -> list:
+    """Apply a parsed update command to a task; returns the changes made"""
+    title = parsed.title
+    description = parsed.description
+    priority = parsed.priority
+    status = parsed.status
     
-    # Apply updates
     updates = []
     if title and title != todo.title:
         todo.title = title
@@ -343,7 +311,7 @@ def handle_update(message: str, db: Session, user_id: int) -> str:
         todo.description = description
         updates.append(f"Description: {description}")
     
-    if priority != todo.priority:
+    if priority is not None and priority != todo.priority:
         todo.priority = priority
         updates.append(f"Priority: {get_priority_label(priority)}")
     
@@ -351,20 +319,17 @@ def handle_update(message: str, db: Session, user_id: int) -> str:
         todo.status = status
         updates.append(f"Status: {status}")
     
-    if not updates:
-        return f"Task #{task_id} found, but no changes detected. Please specify what to update."
-    
-    todo.updated_at = datetime.utcnow()
-    db.commit()
-    
-    return f"✅ Task #{task_id} updated successfully!\n" + "\n".join([f"• {u}" for u in updates])
+    if updates:
+        todo.updated_at = datetime.utcnow()
+    return updates
 
 
-def handle_delete(message: str, db: Session, user_id: int) -> str:
+def handle_delete(message: str, db: Session, user_id: int, parsed: Optional[ParsedMessage] = None) -> str:
     """Handle task deletion"""
-    task_id = extract_task_id(message)
+    parsed = parsed or parse_message(message)
+    task_id, reply = resolve_task_id(parsed, db, user_id)
     if not task_id:
-        return "I couldn't find a task ID. Please specify which task to delete, e.g., 'Delete task #1'"
+        return reply or MISSING_DELETE_ID_REPLY
     
     # Find the task
     todo = db.query(ToDoItem).filter(
@@ -382,98 +347,171 @@ def handle_delete(message: str, db: Session, user_id: int) -> str:
     return f"✅ Task #{task_id} '{title}' deleted successfully!"
 
 
-def handle_list(message: str, db: Session, user_id: int) -> str:
-    """Handle listing all tasks with optional filters"""
-    # Extract filters from message
-    filters = extract_filters(message, db)
-    
-    # Build query with filters
-    query = db.query(ToDoItem).filter(ToDoItem.owner_id == user_id)
-    
-    # Apply priority filter
+LIST_PAGE_SIZE = 10
+LIST_DESCRIPTION_PREVIEW = 50
+
+STATUS_EMOJI = {"completed": "✅", "progress": "🔄", "pending": "⏳"}
+PRIORITY_EMOJI = {1: "🔴", 2: "🟡", 3: "🟢"}
+
+# Last continuation token per user, so a bare "show more" works
+last_list_tokens = TTLCache(ttl=1800, maxsize=10000)
+
+
+def encode_list_token(filters: dict, last_id: int, shown: int, total: int) -> str:
+    raw = ".".join(str(v) for v in (
+        filters["priority"] or "", filters["status"] or "", filters["category_id"] or "",
+        last_id, shown, total
+    ))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_list_token(token: str) -> Optional[tuple]:
+    """(filters, last_id, shown, total), or None for a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        priority, status, category_id, last_id, shown, total = raw.split(".")
+        filters = {
+            "priority": int(priority) if priority else None,
+            "status": status or None,
+            "category_id": int(category_id) if category_id else None,
+        }
+        return filters, int(last_id), int(shown), int(total)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def describe_filters(filters: dict, db: Session) -> list:
+    parts = []
     if filters["priority"]:
-        query = query.filter(ToDoItem.priority == filters["priority"])
-    
-    # Apply status filter
+        parts.append(f"Priority: {get_priority_label(filters['priority'])}")
     if filters["status"]:
-        query = query.filter(ToDoItem.status == filters["status"])
-    
-    # Apply category filter
+        parts.append(f"Status: {filters['status']}")
     if filters["category_id"]:
-        query = query.filter(ToDoItem.category_id == filters["category_id"])
-    
-    # Get filtered results
-    todos = query.order_by(ToDoItem.created_at.desc()).all()
-    
-    if not todos:
+        name = category_matcher.name_for(filters["category_id"], db)
+        if name:
+            parts.append(f"Category: {name}")
+    return parts
+
+
+def iter_list_reply(message: str, db: Session, user_id: int, parsed: Optional[ParsedMessage] = None):
+    """
+    Yield the list reply piece by piece: a header, one block per task, and a
+    continuation hint. At most LIST_PAGE_SIZE tasks are fetched, newest
+    first, through a single projected query joined to categories.
+    """
+    parsed = parsed or parse_message(message)
+
+    if parsed.continuation is not None:
+        token = parsed.continuation or last_list_tokens.get(user_id)
+        state = decode_list_token(token) if token else None
+        if state is None:
+            yield "There's nothing more to show. Try 'Show all tasks'."
+            return
+        filters, last_id, shown, total = state
+    else:
+        filters = extract_filters(message, db, parsed)
+        last_id, shown, total = None, 0, None
+
+    conditions = [ToDoItem.owner_id == user_id]
+    if filters["priority"]:
+        conditions.append(ToDoItem.priority == filters["priority"])
+    if filters["status"]:
+        conditions.append(ToDoItem.status == filters["status"])
+    if filters["category_id"]:
+        conditions.append(ToDoItem.category_id == filters["category_id"])
+    if last_id is not None:
+        conditions.append(ToDoItem.id < last_id)
+
+    query = (
+        select(
+            ToDoItem.id,
+            ToDoItem.title,
+            ToDoItem.status,
+            ToDoItem.priority,
+            # One character past the preview so we know whether to add "..."
+            func.substr(ToDoItem.description, 1, LIST_DESCRIPTION_PREVIEW + 1).label("description"),
+            Category.name.label("category_name"),
+        )
+        .outerjoin(Category, Category.id == ToDoItem.category_id)
+        .where(*conditions)
+        .order_by(ToDoItem.id.desc())
+        .limit(LIST_PAGE_SIZE)
+    )
+    if total is None:
+        # Total matches for the header, computed alongside the first page
+        query = query.add_columns(func.count().over().label("matching"))
+    rows = db.execute(query).all()
+
+    if total is None:
+        total = rows[0].matching if rows else 0
+
+    if not rows:
+        if shown:
+            yield "That's all of them — no more tasks to show."
+            return
         filter_info = []
         if filters["priority"]:
             filter_info.append(f"priority {get_priority_label(filters['priority'])}")
         if filters["status"]:
             filter_info.append(f"status {filters['status']}")
         if filters["category_id"]:
-            category = db.query(Category).filter(Category.id == filters["category_id"]).first()
-            if category:
-                filter_info.append(f"category '{category.name}'")
-        
+            name = category_matcher.name_for(filters["category_id"], db)
+            if name:
+                filter_info.append(f"category '{name}'")
         if filter_info:
-            return f"📝 No tasks found with filters: {', '.join(filter_info)}.\nTry removing filters or create a new task."
-        return "📝 You don't have any tasks yet. Create one by saying 'Create task: [your task]'"
-    
-    # Build filter description
-    filter_desc = []
-    if filters["priority"]:
-        filter_desc.append(f"Priority: {get_priority_label(filters['priority'])}")
-    if filters["status"]:
-        filter_desc.append(f"Status: {filters['status']}")
-    if filters["category_id"]:
-        category = db.query(Category).filter(Category.id == filters["category_id"]).first()
-        if category:
-            filter_desc.append(f"Category: {category.name}")
-    
+            yield f"📝 No tasks found with filters: {', '.join(filter_info)}.\nTry removing filters or create a new task."
+            return
+        yield "📝 You don't have any tasks yet. Create one by saying 'Create task: [your task]'"
+        return
+
+    filter_desc = describe_filters(filters, db)
     filter_text = f" (filtered: {', '.join(filter_desc)})" if filter_desc else ""
-    response = f"📋 **Your Tasks ({len(todos)} total{filter_text}):**\n\n"
-    
-    for todo in todos:
-        status_emoji = {
-            "completed": "✅",
-            "progress": "🔄",
-            "pending": "⏳"
-        }.get(todo.status, "⏳")
-        
-        priority_emoji = {
-            1: "🔴",
-            2: "🟡",
-            3: "🟢"
-        }.get(todo.priority, "🟢")
-        
-        category_text = f" | Category: {todo.category.name}" if todo.category else ""
-        
-        response += f"{status_emoji} **#{todo.id}** {priority_emoji} {todo.title}\n"
-        response += f"   Status: {todo.status} | Priority: {get_priority_label(todo.priority)}{category_text}\n"
-        if todo.description:
-            desc = todo.description[:50] + "..." if len(todo.description) > 50 else todo.description
-            response += f"   {desc}\n"
-        response += "\n"
-    
-    return response
+    first, last = shown + 1, shown + len(rows)
+    range_text = f", showing {first}-{last}" if total > len(rows) or shown else ""
+    yield f"📋 **Your Tasks ({total} total{filter_text}{range_text}):**\n\n"
+
+    for row in rows:
+        lines = [
+            f"{STATUS_EMOJI.get(row.status, '⏳')} **#{row.id}** {PRIORITY_EMOJI.get(row.priority, '🟢')} {row.title}\n",
+            f"   Status: {row.status} | Priority: {get_priority_label(row.priority)}",
+            f" | Category: {row.category_name}\n" if row.category_name else "\n",
+        ]
+        if row.description:
+            desc = row.description
+            if len(desc) > LIST_DESCRIPTION_PREVIEW:
+                desc = desc[:LIST_DESCRIPTION_PREVIEW] + "..."
+            lines.append(f"   {desc}\n")
+        lines.append("\n")
+        yield "".join(lines)
+
+    if last < total:
+        token = encode_list_token(filters, rows[-1].id, last, total)
+        last_list_tokens.set(user_id, token)
+        yield f"…{total - last} more. Say 'show more' (or 'show more {token}') to continue."
+    else:
+        last_list_tokens.invalidate(user_id)
+
+
+def handle_list(message: str, db: Session, user_id: int, parsed: Optional[ParsedMessage] = None) -> str:
+    """Handle listing tasks with optional filters, one page at a time"""
+    return "".join(iter_list_reply(message, db, user_id, parsed))
 
 
 def handle_status(db: Session, user_id: int) -> str:
     """Handle status query"""
-    todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user_id).all()
+    counts = get_counters(db, user_id)
+    total = counts["total"]
     
-    if not todos:
+    if not total:
         return "📊 You don't have any tasks yet."
     
-    total = len(todos)
-    completed = len([t for t in todos if t.status == "completed"])
-    progress = len([t for t in todos if t.status == "progress"])
-    pending = len([t for t in todos if t.status == "pending"])
+    completed = counts["completed"]
+    progress = counts["progress"]
+    pending = counts["pending"]
     
-    high_priority = len([t for t in todos if t.priority == 1])
-    medium_priority = len([t for t in todos if t.priority == 2])
-    low_priority = len([t for t in todos if t.priority == 3])
+    high_priority = counts["priority_high"]
+    medium_priority = counts["priority_medium"]
+    low_priority = counts["priority_low"]
     
     completion_rate = (completed / total * 100) if total > 0 else 0
     
@@ -501,48 +539,54 @@ def handle_unknown(message: str) -> str:
            "• Check status: 'What's my task status?'\n\n" \
            "Type 'help' for more information."
 
-def handle_suggest(db: Session, user_id: int) -> str:
-    todos = db.query(ToDoItem)\
-              .filter(ToDoItem.owner_id == user_id)\
-              .all()
+SUGGEST_LIMIT = 3
+STUDY_PLAN_LIMIT = 10
+STUDY_KEYWORDS = ("study", "exam", "revise", "revision")
 
-    if not todos:
-        return "You have no tasks yet."
 
-    high = [t for t in todos if t.priority == 1 and t.status != "completed"]
+def handle_suggest(db: Session, user_id: int, today: date) -> str:
+    """Best next tasks, ranked by the database"""
+    tasks = recommend_tasks(db, user_id, limit=SUGGEST_LIMIT, today=today)
 
-    if high:
-        return (
-            f"You have {len(high)} high-priority pending tasks.\n"
-            f"I suggest starting with '{high[0].title}'."
-        )
+    if not tasks:
+        return "All tasks are under control. You have nothing open right now."
 
-    return "All tasks are under control. You can work on any pending task."
+    first = tasks[0]
+    reason = explain(first, today)
+    reply = f"I suggest starting with '{first.title}' (#{first.id})"
+    reply += f": {reason}.\n" if reason else ".\n"
 
+    if len(tasks) > 1:
+        reply += "\nAfter that:\n"
+        for task in tasks[1:]:
+            reason = explain(task, today)
+            reply += f"• #{task.id} {task.title}" + (f" ({reason})" if reason else "") + "\n"
 
-def handle_study_plan(db: Session, user_id: int) -> str:
-    todos = db.query(ToDoItem)\
-              .filter(ToDoItem.owner_id == user_id)\
-              .all()
+    return reply.rstrip("\n")
 
-    study_tasks = [
-        t for t in todos
-        if any(word in t.title.lower() for word in ["study", "exam", "revise", "revision"])
-        and t.status != "completed"
-    ]
+
+def iter_study_plan_reply(db: Session, user_id: int, today: date):
+    """
+    Yield the study plan line by line. Study tasks are found through the
+    title index and ranked in SQL, highest priority and nearest exam first.
+    """
+    candidate_ids = title_index.get(db, user_id).ids_matching_any(STUDY_KEYWORDS)
+    study_tasks = recommend_tasks(db, user_id, limit=STUDY_PLAN_LIMIT, task_ids=candidate_ids, today=today)
 
     if not study_tasks:
-        return (
+        yield (
             "I don’t see any study-related tasks yet.\n\n"
             "Would you like me to create a semester study plan for you?"
         )
+        return
 
-    plan = "📘 **Suggested Study Plan:**\n\n"
+    yield "📘 **Suggested Study Plan:**\n\n"
 
     for i, task in enumerate(study_tasks, start=1):
-        plan += f"{i}. {task.title} (Priority: {get_priority_label(task.priority)})\n"
+        due = f", due {task.due_date.isoformat()}" if task.due_date else ""
+        yield f"{i}. {task.title} (Priority: {get_priority_label(task.priority)}{due})\n"
 
-    plan += (
+    yield (
         "\nI recommend studying high-priority subjects first.\n"
         "Would you like me to:\n"
         "1️⃣ Break this into daily tasks\n"
@@ -551,7 +595,135 @@ def handle_study_plan(db: Session, user_id: int) -> str:
         "Reply with 1, 2, or 3."
     )
 
-    return plan
+
+def handle_study_plan(db: Session, user_id: int, today: date) -> str:
+    return "".join(iter_study_plan_reply(db, user_id, today))
+
+
+def iter_reply(message: str, parsed: ParsedMessage, db: Session, user_id: int, today: date):
+    """
+    Route a parsed message to its handler. Lists and study plans are
+    yielded in pieces so the WebSocket endpoint can stream them; every
+    other intent yields its whole reply once. `today` is the user's
+    local day, for ranking suggestions by deadline.
+    """
+    intent = parsed.intent
+
+    if intent == "list":
+        yield from iter_list_reply(message, db, user_id, parsed)
+    elif intent == "study_plan":
+        yield from iter_study_plan_reply(db, user_id, today)
+    elif intent == "greeting":
+        yield handle_greeting()
+    elif intent == "help":
+        yield handle_help()
+    elif intent == "create":
+        yield handle_create(message, db, user_id, parsed)
+    elif intent == "update":
+        yield handle_update(message, db, user_id, parsed)
+    elif intent == "delete":
+        yield handle_delete(message, db, user_id, parsed)
+    elif intent == "status":
+        yield handle_status(db, user_id)
+    elif intent == "suggest":
+        yield handle_suggest(db, user_id, today)
+    else:
+        yield handle_unknown(message)
+
+def iter_batch_reply(commands: list, db: Session, user_id: int, today: date):
+    """
+    Run several (message, parsed) commands in one transaction and yield a
+    numbered reply line per command.
+
+    Tasks named by title are resolved against the index before anything
+    is written. Every task an update/delete names is loaded with one IN query, new
+    tasks are flushed together so the INSERTs go out as one batch, and a
+    single commit covers the lot. If anything fails, nothing is kept.
+    Read-only commands see the batch's earlier writes.
+    """
+    resolved = {}
+    for index, (_, parsed) in enumerate(commands):
+        if parsed.intent in ("update", "delete"):
+            resolved[index] = resolve_task_id(parsed, db, user_id)
+    task_ids = {task_id for task_id, _ in resolved.values() if task_id}
+    tasks = {}
+    if task_ids:
+        tasks = {
+            todo.id: todo for todo in db.query(ToDoItem).filter(
+                ToDoItem.id.in_(task_ids),
+                ToDoItem.owner_id == user_id
+            )
+        }
+
+    lines = []
+    created = []
+    writes = 0
+    try:
+        for index, (message, parsed) in enumerate(commands):
+            intent = parsed.intent
+
+            if intent == "create":
+                todo = build_task(parsed, user_id)
+                if todo is None:
+                    lines.append(MISSING_TITLE_REPLY)
+                    continue
+                db.add(todo)
+                created.append((len(lines), todo))
+                lines.append(None)
+                writes += 1
+
+            elif intent in ("update", "delete"):
+                task_id, reply = resolved[index]
+                todo = tasks.get(task_id)
+                if not task_id:
+                    lines.append(reply or (MISSING_UPDATE_ID_REPLY if intent == "update" else MISSING_DELETE_ID_REPLY))
+                elif todo is None:
+                    lines.append(f"❌ Task #{task_id} not found. Please check the task ID.")
+                elif intent == "update":
+                    updates = apply_update(todo, parsed)
+                    if updates:
+                        lines.append(f"✅ Task #{task_id} updated: " + ", ".join(updates))
+                        writes += 1
+                    else:
+                        lines.append(f"Task #{task_id} found, but no changes detected.")
+                else:
+                    db.delete(todo)
+                    del tasks[task_id]
+                    lines.append(f"✅ Task #{task_id} '{todo.title}' deleted")
+                    writes += 1
+
+            else:
+                db.flush()
+                lines.append("".join(iter_reply(message, parsed, db, user_id, today)))
+
+        db.flush()
+        for position, todo in created:
+            lines[position] = (
+                f"✅ Task #{todo.id} created: {todo.title} "
+                f"({get_priority_label(todo.priority)}, {todo.status})"
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    yield f"📋 Ran {len(commands)} commands ({writes} changes saved together):\n\n"
+    for number, line in enumerate(lines, start=1):
+        yield f"{number}. {line}\n"
+
+
+async def prepare_commands(raw_message: str) -> list:
+    """Split, normalize and parse a message into (message, parsed) pairs"""
+    parts = chatbot_nlp.split_commands(raw_message)
+    messages = await asyncio.gather(*(normalize_with_ai(part) for part in parts))
+    return [(message, parse_message(message)) for message in messages]
+
+
+def iter_commands_reply(commands: list, db: Session, user_id: int, today: date):
+    if len(commands) == 1:
+        message, parsed = commands[0]
+        return iter_reply(message, parsed, db, user_id, today)
+    return iter_batch_reply(commands, db, user_id, today)
 
 # ---------------- MAIN CHATBOT ENDPOINT ----------------
 
@@ -560,50 +732,21 @@ def handle_study_plan(db: Session, user_id: int) -> str:
 async def chatbot(
     request: ChatbotRequest,
     user: user_dependency,
-    db: db_dependency
+    db: db_dependency,
+    tz: timezone_dependency
 ):
     raw_message = request.message.strip()
     if not raw_message:
         return ChatbotResponse(reply="Please type a message.")
 
-    # ✅ AI NORMALIZATION (NEW)
-    message = normalize_with_ai(raw_message)
+    # ✅ AI NORMALIZATION (NEW), once per command
+    commands = await prepare_commands(raw_message)
 
-    intent = extract_intent(message)
     user_id = user["user_id"]
     username = user.get("username", "User")
 
     try:
-        if intent == "greeting":
-            reply = handle_greeting()
-
-        elif intent == "help":
-            reply = handle_help()
-
-        elif intent == "create":
-            reply = handle_create(message, db, user_id)
-
-        elif intent == "update":
-            reply = handle_update(message, db, user_id)
-
-        elif intent == "delete":
-            reply = handle_delete(message, db, user_id)
-
-        elif intent == "list":
-            reply = handle_list(message, db, user_id)
-
-        elif intent == "status":
-            reply = handle_status(db, user_id)
-
-        elif intent == "suggest":
-            reply = handle_suggest(db, user_id)
-
-        elif intent == "study_plan":
-            reply = handle_study_plan(db, user_id)
-
-        else:
-            reply = handle_unknown(message)
-
+        reply = "".join(iter_commands_reply(commands, db, user_id, local_today(tz)))
         return ChatbotResponse(reply=f"{reply}\n\n— {username}")
 
     except Exception as e:
@@ -612,31 +755,72 @@ async def chatbot(
         )
 
 
+@router.websocket("/ws")
+async def chatbot_ws(
+    websocket: WebSocket,
+    user: ws_user_dependency,
+    db: db_dependency
+):
+    """
+    Chat over one long-lived connection. The session user and DB session
+    are resolved once at handshake and reused for every message.
+
+    Client sends text frames (or {"message": ...} JSON). Each reply is sent
+    as {"type": "chunk", "text": ...} frames followed by one
+    {"type": "done"} frame carrying the signature line.
+    """
+    await websocket.accept()
+    user_id = user["user_id"]
+    username = user.get("username", "User")
+    tz = resolve_timezone(user.get("timezone"), websocket.headers.get(TIMEZONE_HEADER))
+
+    try:
+        while True:
+            raw_message = (await websocket.receive_text()).strip()
+            if raw_message.startswith("{"):
+                try:
+                    raw_message = ChatbotRequest.model_validate_json(raw_message).message.strip()
+                except ValueError:
+                    pass
+
+            if not raw_message:
+                await websocket.send_json({"type": "chunk", "text": "Please type a message."})
+                await websocket.send_json({"type": "done", "text": ""})
+                continue
+
+            commands = await prepare_commands(raw_message)
+
+            try:
+                # Each chunk's queries run in the threadpool, off the event loop
+                async for chunk in iterate_in_threadpool(iter_commands_reply(commands, db, user_id, local_today(tz))):
+                    await websocket.send_json({"type": "chunk", "text": chunk})
+                await websocket.send_json({"type": "done", "text": f"\n\n— {username}"})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "text": f"❌ Something went wrong.\n{str(e)}\n\n— {username}"
+                })
+            finally:
+                # End the transaction so an idle connection holds no pooled
+                # DB connection between messages
+                await run_in_threadpool(db.rollback)
+    except WebSocketDisconnect:
+        pass
+
+
 # ---------------- AI NORMALIZATION LAYER ----------------
 
-def normalize_with_ai(message: str) -> str:
+normalizer = normalizer_from_env()
+
+
+async def normalize_with_ai(message: str) -> str:
     """
     AI rewrites user input into a clean task command.
     This function is SAFE:
     - No DB access
     - No task IDs invented
-    - If AI fails, original message is used
+    - If AI fails or times out, original message is used
     """
-    try:
-        # PLACEHOLDER: replace with OpenAI / local LLM
-        # Example prompt behavior shown below
-
-        """
-        System Prompt:
-        You are a task assistant.
-        Rewrite user input into a clear command.
-        Do not invent task IDs.
-        Do not confirm actions.
-        Output ONE short sentence.
-        """
-
-        # MOCK RESPONSE (for now)
-        return message
-
-    except Exception:
-        return message
+    return await normalizer.normalize(message)
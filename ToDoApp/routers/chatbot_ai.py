@@ -0,0 +1,117 @@
+"""
+AI normalization backends for the chatbot.
+
+A provider rewrites raw user input into a clean task command. Calls go
+through `Normalizer`, which keeps a slow or overloaded model from stalling
+chat: every call has a timeout (queueing included) and falls back to the
+raw message, a global semaphore caps concurrent model calls per worker, and
+an LRU remembers recent outputs so repeated messages skip the model.
+"""
+import asyncio
+import importlib
+import os
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+# Prompt for real model backends
+SYSTEM_PROMPT = """You are a task assistant.
+Rewrite user input into a clear command.
+Do not invent task IDs.
+Do not confirm actions.
+Output ONE short sentence."""
+
+
+class NormalizationProvider(ABC):
+    """Backend that rewrites one message. Must not touch the database."""
+
+    @abstractmethod
+    async def normalize(self, message: str) -> str:
+        ...
+
+
+class LocalNormalizer(NormalizationProvider):
+    """
+    Stand-in until a model is configured: collapses runs of whitespace and
+    otherwise returns the message unchanged.
+    """
+    _whitespace = re.compile(r"[ \t]+")
+
+    async def normalize(self, message: str) -> str:
+        return self._whitespace.sub(" ", message).strip()
+
+
+class Normalizer:
+    """Timeout, concurrency cap and result cache around a provider"""
+
+    def __init__(self, provider: NormalizationProvider, timeout: float, max_concurrency: int, cache_size: int):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = OrderedDict()
+
+        self.cache_hits = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def _call_provider(self, message: str) -> str:
+        async with self._semaphore:
+            return await self.provider.normalize(message)
+
+    async def normalize(self, message: str) -> str:
+        cached = self._cache.get(message)
+        if cached is not None:
+            self._cache.move_to_end(message)
+            self.cache_hits += 1
+            return cached
+
+        self.calls += 1
+        try:
+            result = await asyncio.wait_for(self._call_provider(message), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return message
+        except Exception:
+            self.errors += 1
+            return message
+
+        if not result or not result.strip():
+            return message
+
+        self._cache[message] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "provider": type(self.provider).__name__,
+            "timeout": self.timeout,
+            "max_concurrency": self.max_concurrency,
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+
+def load_provider(spec: str) -> NormalizationProvider:
+    """'local' or a 'package.module:ClassName' path to a provider class"""
+    if spec == "local":
+        return LocalNormalizer()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def normalizer_from_env() -> Normalizer:
+    return Normalizer(
+        provider=load_provider(os.getenv("CHATBOT_AI_PROVIDER", "local")),
+        timeout=float(os.getenv("CHATBOT_AI_TIMEOUT", "1.5")),
+        max_concurrency=int(os.getenv("CHATBOT_AI_CONCURRENCY", "8")),
+        cache_size=int(os.getenv("CHATBOT_AI_CACHE_SIZE", "2048")),
+    )
@@ -0,0 +1,167 @@
+"""
+Per-user fuzzy title index for the chatbot.
+
+Lets commands name a task ("complete buy groceries") instead of quoting its
+id. Each user's titles are tokenized into an inverted index (token -> task
+ids) plus a trigram index over the distinct tokens, so a lookup only scores
+tasks sharing a token or a near-miss spelling with the query rather than
+scanning every row. Indexes are built lazily on first use and dropped when
+the user's tasks change.
+"""
+import re
+import threading
+from typing import NamedTuple, Optional
+
+from ToDoApp.cache import TTLCache
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Words that say nothing about which task is meant
+STOPWORDS = frozenset({"a", "an", "the", "my", "task", "todo", "item", "to", "for", "of"})
+
+# Minimum trigram similarity for a query word to count as a spelling of a
+# title word, and minimum overall score for a task to be a match at all
+TOKEN_SIMILARITY = 0.4
+MATCH_THRESHOLD = 0.45
+# Two candidates closer than this are reported as ambiguous
+AMBIGUITY_MARGIN = 0.1
+
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def trigrams(token: str) -> frozenset:
+    padded = f"  {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b)
+
+
+class TitleMatch(NamedTuple):
+    task_id: int
+    title: str
+    score: float
+
+
+class TitleIndex:
+    """Inverted token + trigram index over one user's task titles"""
+
+    def __init__(self, rows):
+        self.titles = {}
+        self.postings = {}
+        self.token_trigrams = {}
+        self.trigram_tokens = {}
+
+        for task_id, title in rows:
+            self.titles[task_id] = title
+            for token in set(tokenize(title)):
+                self.postings.setdefault(token, set()).add(task_id)
+
+        for token in self.postings:
+            grams = trigrams(token)
+            self.token_trigrams[token] = grams
+            for gram in grams:
+                self.trigram_tokens.setdefault(gram, set()).add(token)
+
+    def _similar_tokens(self, token: str, exact_wins: bool = True) -> dict:
+        """
+        Indexed tokens close to `token`, with their similarity. Tokens that
+        extend it ("study" -> "studying") count as close.
+        """
+        if exact_wins and token in self.postings:
+            return {token: 1.0}
+        grams = trigrams(token)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.trigram_tokens.get(gram, set())
+        scored = {}
+        for candidate in candidates:
+            score = similarity(grams, self.token_trigrams[candidate])
+            if score >= TOKEN_SIMILARITY or candidate.startswith(token):
+                scored[candidate] = score
+        return scored
+
+    def ids_matching_any(self, words) -> set:
+        """Ids of tasks with a title word close to any of `words`"""
+        ids = set()
+        for word in words:
+            for token in self._similar_tokens(word.lower(), exact_wins=False):
+                ids |= self.postings[token]
+        return ids
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """Best matches first. Score is the mean per-word match, so every word counts."""
+        words = tokenize(query)
+        if not words:
+            return []
+
+        scores = {}
+        for word in words:
+            best = {}
+            for token, score in self._similar_tokens(word).items():
+                for task_id in self.postings[token]:
+                    if score > best.get(task_id, 0.0):
+                        best[task_id] = score
+            for task_id, score in best.items():
+                scores[task_id] = scores.get(task_id, 0.0) + score
+
+        wanted = query.strip().lower()
+        matches = []
+        for task_id, total in scores.items():
+            score = total / len(words)
+            title = self.titles[task_id]
+            if title.lower() == wanted:
+                score += 1.0
+            elif len(tokenize(title)) == len(words):
+                # Prefer titles with nothing extra over longer ones
+                score += 0.05
+            matches.append(TitleMatch(task_id, title, score))
+
+        matches.sort(key=lambda m: (-m.score, m.task_id))
+        return matches[:limit]
+
+    def resolve(self, query: str) -> tuple:
+        """
+        (match, candidates): the task `query` names, or None with the
+        runners-up when nothing matches well or several match equally.
+        """
+        matches = [m for m in self.search(query) if m.score >= MATCH_THRESHOLD]
+        if not matches:
+            return None, []
+        if len(matches) > 1 and matches[0].score - matches[1].score < AMBIGUITY_MARGIN:
+            return None, matches
+        return matches[0], matches
+
+
+class TitleIndexRegistry:
+    """
+    One lazily built TitleIndex per user. `loader(db, user_id)` returns
+    (id, title) pairs and is only called on a miss; entries also expire
+    after `ttl` seconds to bound staleness across worker processes.
+    """
+
+    def __init__(self, loader, ttl: float = 600, maxsize: int = 1000):
+        self.loader = loader
+        self._indexes = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, db, user_id: int) -> TitleIndex:
+        index = self._indexes.get(user_id)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(user_id)
+                if index is None:
+                    index = TitleIndex(self.loader(db, user_id))
+                    self._indexes.set(user_id, index)
+                    self.builds += 1
+        return index
+
+    def resolve(self, db, user_id: int, query: str) -> tuple:
+        return self.get(db, user_id).resolve(query)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        self._indexes.invalidate(user_id)
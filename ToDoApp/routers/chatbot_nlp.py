@@ -0,0 +1,464 @@
+"""
+Precompiled message parser for the chatbot.
+
+Every keyword the chatbot reacts to is compiled once into a single
+trie-shaped regex. One scan over the lowercased message yields a bitmask
+of the keyword groups that occur anywhere in it (substring semantics, same
+as the old `any(w in msg ...)` checks); intent, status and the priority
+phrases are resolved from that mask. The remaining slots (task id,
+"priority N", title, description) come from their own precompiled
+patterns, run only for the intents that read them: a parse is the
+keyword scan plus those few searches, not a single pass.
+"""
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+
+# Keyword groups, in the order the chatbot has always tested them. Matching
+# is by substring, so "hi" also fires inside "this" -- kept for compatibility.
+KEYWORD_GROUPS = {
+    "study_plan": ["study plan", "study planner", "exam plan", "plan my study", "help me study", "semester exam"],
+    "suggest": ["what should", "suggest", "recommend", "plan"],
+    "create": ["create", "add", "new", "make"],
+    "update": ["update", "edit", "change", "modify"],
+    "delete": ["delete", "remove"],
+    "task": ["task"],
+    "list": ["list", "show", "display", "my tasks"],
+    "status": ["status", "progress", "statistics"],
+    "help": ["help", "commands"],
+    "greeting": ["hi", "hello", "hey"],
+
+    # Priority phrases used when creating/updating a task
+    "priority_high": ["high priority", "priority high", "important", "urgent"],
+    "priority_medium": ["medium priority", "priority medium", "normal"],
+    "priority_low": ["low priority", "priority low", "not important"],
+
+    # Looser priority words used when filtering a task list
+    "filter_high": ["high priority", "priority high", "high"],
+    "filter_medium": ["medium priority", "priority medium", "medium"],
+    "filter_low": ["low priority", "priority low", "low"],
+
+    "status_completed": ["completed", "complete", "done", "finished"],
+    "status_progress": ["progress", "in progress", "working", "started"],
+    "status_pending": ["pending", "not started", "todo"],
+}
+
+GROUP_BITS = {name: 1 << i for i, name in enumerate(KEYWORD_GROUPS)}
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex source for a set of literal words, factored into a trie so the
+    engine follows one branch per character instead of trying every word.
+    Optional groups are greedy, so the longest word at a position wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _compile_keywords(groups: dict):
+    """
+    Compile every keyword into one trie regex, plus a group mask per
+    keyword. The longest keyword starting at a position is the one matched,
+    so its mask also carries every keyword that is a prefix of it.
+    """
+    masks = {}
+    for name, words in groups.items():
+        for word in words:
+            masks[word] = masks.get(word, 0) | GROUP_BITS[name]
+
+    closed = {}
+    for word in masks:
+        closed[word] = 0
+        for other, mask in masks.items():
+            if word.startswith(other):
+                closed[word] |= mask
+    return re.compile(_trie_pattern(masks)), closed
+
+
+KEYWORD_PATTERN, KEYWORD_MASKS = _compile_keywords(KEYWORD_GROUPS)
+
+
+def scan_keywords(msg_lower: str) -> int:
+    """Bitmask of keyword groups occurring in an already-lowercased message"""
+    mask = 0
+    search = KEYWORD_PATTERN.search
+    match = search(msg_lower)
+    while match is not None:
+        mask |= KEYWORD_MASKS[match.group()]
+        # Resume one character in so keywords overlapping this one are found
+        match = search(msg_lower, match.start() + 1)
+    return mask
+
+
+# Ordered (bits, result) tables for the resolvers below
+INTENT_RULES = [
+    (GROUP_BITS["study_plan"], 0, "study_plan"),
+    (GROUP_BITS["suggest"], 0, "suggest"),
+    (GROUP_BITS["create"], GROUP_BITS["task"], "create"),
+    (GROUP_BITS["update"], GROUP_BITS["task"], "update"),
+    (GROUP_BITS["delete"], GROUP_BITS["task"], "delete"),
+    (GROUP_BITS["list"], 0, "list"),
+    (GROUP_BITS["status"], 0, "status"),
+    (GROUP_BITS["help"], 0, "help"),
+    (GROUP_BITS["greeting"], 0, "greeting"),
+]
+PRIORITY_RULES = [(GROUP_BITS["priority_high"], 1), (GROUP_BITS["priority_medium"], 2)]
+FILTER_PRIORITY_RULES = [
+    (GROUP_BITS["filter_high"], 1),
+    (GROUP_BITS["filter_medium"], 2),
+    (GROUP_BITS["filter_low"], 3),
+]
+STATUS_RULES = [
+    (GROUP_BITS["status_completed"], "completed"),
+    (GROUP_BITS["status_progress"], "progress"),
+    (GROUP_BITS["status_pending"], "pending"),
+]
+
+
+# ---------------- SLOT PATTERNS ----------------
+TASK_ID_PATTERNS = (
+    re.compile(r'task\s*(?:#|id|number)?\s*(\d+)'),
+    re.compile(r'#(\d+)'),
+)
+TITLE_PREFIX_PATTERN = re.compile(
+    r'^(?:'
+    r'(?:create|add|new|make)\s+(?:a\s+)?(?:new\s+)?(?:task|todo|item)[\s:]*'
+    r'|(?:update|edit|change|modify)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*'
+    r'|(?:delete|remove|drop)\s+(?:task|todo|item)\s*(?:#|number|id)?\s*\d*[\s:]*'
+    r')',
+    re.IGNORECASE
+)
+QUOTED_PATTERN = re.compile(r'["\']([^"\']+)["\']')
+TITLE_DESCRIPTION_PATTERN = re.compile(r'description[:\s]*.*', re.IGNORECASE)
+TITLE_TRAILER_PATTERN = re.compile(r'\b(with|priority|status|description|desc)\b.*', re.IGNORECASE)
+DESCRIPTION_PATTERNS = (
+    re.compile(r'description[:\s]+([^,]+)', re.IGNORECASE),
+    re.compile(r'desc[:\s]+([^,]+)', re.IGNORECASE),
+)
+DESCRIPTION_TRAILER_PATTERN = re.compile(
+    r'\b(priority|status|high|medium|low|pending|progress|completed)\b.*', re.IGNORECASE
+)
+PRIORITY_NUMBER_PATTERN = re.compile(r'priority\s*(?:is\s*)?(?:=)?\s*([123])')
+# Multi-command messages: one command per line or per ";" and list markers
+# ("1.", "2)", "-", "•") stripped from the front of each. "1) a 2) b" on a
+# single line is split too; "N." is only a marker at the start of a line
+# because "priority 2." is an ordinary sentence ending.
+COMMAND_SEPARATOR_PATTERN = re.compile(r'[\n;]+|\s+(?=\d+\)\s)')
+LIST_MARKER_PATTERN = re.compile(r'^\s*(?:\d+[.)]|[-*•])\s+')
+# Commands that name a task instead of giving its id: "complete buy
+# groceries", "delete task 'call mom'", "rename buy milk to buy oat milk"
+TARGET_VERB_PATTERN = re.compile(
+    r'^\s*(update|edit|change|modify|rename|delete|remove|drop|complete|finish|mark)\s+(?=\S)',
+    re.IGNORECASE
+)
+TARGET_VERB_INTENTS = {
+    "update": "update", "edit": "update", "change": "update", "modify": "update", "rename": "update",
+    "delete": "delete", "remove": "delete", "drop": "delete",
+    "complete": "complete", "finish": "complete", "mark": "complete",
+}
+TARGET_PREFIX_PATTERN = re.compile(
+    r'^\s*(?:update|edit|change|modify|rename|delete|remove|drop|complete|finish|mark)\s+'
+    r'(?:the\s+)?(?:(?:task|todo|item)\s+)?(?:(?:called|named)\s+)?',
+    re.IGNORECASE
+)
+TARGET_TRAILER_PATTERN = re.compile(
+    r'(?:[:,]|\s+(?:as|to|with|priority|status|description|desc|set)\b|\s+(?:task|todo|item)\s*$).*$',
+    re.IGNORECASE | re.DOTALL
+)
+RENAME_PATTERN = re.compile(r'(?:\brename\b.*?\bto\b|\btitle\b\s*(?:to\b|:)?)\s*["\']?([^"\',]+)', re.IGNORECASE)
+PRIORITY_MENTION_PATTERN = re.compile(r'priority|important|urgent|normal')
+# "more" / "show more <token>" continues a paginated task list
+CONTINUATION_PATTERN = re.compile(r'^\s*(?:show\s+)?more(?:\s+([A-Za-z0-9_-]+))?\s*[.!]?\s*$', re.IGNORECASE)
+
+
+# ---------------- RESOLVERS ----------------
+def resolve_intent(mask: int) -> str:
+    """
+    First matching rule wins. Study plans are checked before suggestions:
+    "plan" is a suggest keyword, so the study_plan intent was unreachable
+    when it came last.
+    """
+    for bits, required, intent in INTENT_RULES:
+        if mask & bits and mask & required == required:
+            return intent
+    return "unknown"
+
+
+def resolve_priority(mask: int, msg_lower: str) -> int:
+    """Explicit 'priority N' wins, then priority phrases; default 3 (Low)"""
+    match = PRIORITY_NUMBER_PATTERN.search(msg_lower)
+    if match:
+        return int(match.group(1))
+    for bits, priority in PRIORITY_RULES:
+        if mask & bits:
+            return priority
+    return 3
+
+
+def resolve_filter_priority(mask: int) -> Optional[int]:
+    for bits, priority in FILTER_PRIORITY_RULES:
+        if mask & bits:
+            return priority
+    return None
+
+
+def resolve_status(mask: int) -> Optional[str]:
+    for bits, status in STATUS_RULES:
+        if mask & bits:
+            return status
+    return None
+
+
+def extract_task_id(msg_lower: str) -> Optional[int]:
+    for pattern in TASK_ID_PATTERNS:
+        match = pattern.search(msg_lower)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def extract_target(message: str) -> Optional[str]:
+    """Title text of the task a command names, e.g. "buy groceries" """
+    quoted = QUOTED_PATTERN.search(message)
+    if quoted:
+        return quoted.group(1).strip() or None
+    target = TARGET_PREFIX_PATTERN.sub('', message, count=1)
+    target = TARGET_TRAILER_PATTERN.sub('', target).strip()
+    return target or None
+
+
+def extract_new_title(message: str) -> Optional[str]:
+    """New title from "rename X to Y" / "title: Y" """
+    match = RENAME_PATTERN.search(message)
+    return match.group(1).strip() if match else None
+
+
+def extract_title(message: str) -> Optional[str]:
+    """Extract task title from message"""
+    msg = TITLE_PREFIX_PATTERN.sub('', message.strip(), count=1)
+
+    # Text in quotes
+    quoted = QUOTED_PATTERN.search(msg)
+    if quoted:
+        return quoted.group(1).strip()
+
+    # Text after colon
+    if ':' in msg:
+        title = msg.split(':', 1)[1].strip()
+        lowered = title.lower()
+        if 'description' in lowered or 'desc' in lowered:
+            title = TITLE_DESCRIPTION_PATTERN.sub('', title)
+        return title.split(',')[0].strip() if title else None
+
+    # First meaningful phrase (up to 10 words)
+    words = msg.split()
+    if words:
+        title = TITLE_TRAILER_PATTERN.sub('', ' '.join(words[:10])).strip(' ,;.')
+        return title or None
+
+    return None
+
+
+def extract_description(message: str) -> Optional[str]:
+    """Extract description from message"""
+    for pattern in DESCRIPTION_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return match.group(1).strip()
+
+    # Anything after the first comma, minus priority/status keywords
+    if ',' in message:
+        desc = DESCRIPTION_TRAILER_PATTERN.sub('', message.split(',', 1)[1].strip()).strip()
+        return desc or None
+
+    return None
+
+
+# ---------------- PARSED MESSAGE ----------------
+class ParsedMessage(NamedTuple):
+    """
+    Intent plus the slots its handler reads. Free-text and id slots are
+    only extracted for the intents that use them.
+    """
+    text: str
+    intent: str
+    task_id: Optional[int] = None
+    priority: int = 3
+    filter_priority: Optional[int] = None
+    status: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    # "" for a bare "show more", the token when one was given
+    continuation: Optional[str] = None
+    # Title text naming the task, for updates/deletes without an id
+    target: Optional[str] = None
+
+
+@lru_cache(maxsize=4096)
+def parse_message(message: str) -> ParsedMessage:
+    """
+    Parse a chat message. Results are cached: quick replies such as
+    "show all tasks" or "help" recur constantly.
+    """
+    continuation = CONTINUATION_PATTERN.match(message)
+    if continuation:
+        return ParsedMessage(message, "list", continuation=continuation.group(1) or "")
+
+    msg_lower = message.lower()
+    mask = scan_keywords(msg_lower)
+    intent = resolve_intent(mask)
+
+    # A leading update/delete verb beats keywords found later in the text
+    # ("hi" in "high", "new" in "new title", "progress" in "as in progress")
+    verb = TARGET_VERB_PATTERN.match(message)
+    if verb:
+        return _parse_named_command(message, msg_lower, mask, verb.group(1).lower())
+
+    task_id = title = description = None
+    priority = 3
+    if intent in ("update", "delete"):
+        task_id = extract_task_id(msg_lower)
+    if intent in ("create", "update"):
+        priority = resolve_priority(mask, msg_lower)
+        title = extract_title(message)
+        description = extract_description(message)
+
+    return ParsedMessage(
+        message, intent, task_id, priority,
+        resolve_filter_priority(mask), resolve_status(mask), title, description
+    )
+
+
+def _parse_named_command(message: str, msg_lower: str, mask: int, verb: str) -> ParsedMessage:
+    """
+    Verb-led update/delete. An explicit id still wins; otherwise the task is
+    named by its title and only fields the message mentions are changed.
+    """
+    verb_intent = TARGET_VERB_INTENTS[verb]
+    intent = "delete" if verb_intent == "delete" else "update"
+
+    task_id = extract_task_id(msg_lower)
+    if task_id is not None and intent == "delete":
+        return ParsedMessage(message, intent, task_id)
+
+    status = resolve_status(mask)
+    if verb_intent == "complete":
+        status = status or "completed"
+        if task_id is not None:
+            return ParsedMessage(message, intent, task_id, None, None, status)
+
+    if task_id is not None:
+        # Keeps the legacy update slots when a numeric id was given
+        return ParsedMessage(
+            message, intent, task_id, resolve_priority(mask, msg_lower),
+            None, status, extract_title(message), extract_description(message)
+        )
+
+    target = extract_target(message)
+    if intent == "delete":
+        return ParsedMessage(message, intent, target=target)
+
+    priority = resolve_priority(mask, msg_lower) if PRIORITY_MENTION_PATTERN.search(msg_lower) else None
+    return ParsedMessage(
+        message, intent, None, priority, None, status,
+        extract_new_title(message), extract_description(message), target=target
+    )
+
+
+def split_commands(message: str) -> list:
+    """Split a message into its commands; a plain message yields one"""
+    commands = []
+    for part in COMMAND_SEPARATOR_PATTERN.split(message):
+        part = LIST_MARKER_PATTERN.sub('', part).strip()
+        if part:
+            commands.append(part)
+    return commands
+
+
+# ---------------- CATEGORY MATCHER ----------------
+class CategoryMatcher:
+    """
+    Finds which category a message names, using one trie regex compiled
+    from all category names. The compiled form is kept in memory and only
+    rebuilt after `invalidate()` (wired to Category writes) or once `ttl`
+    seconds have passed, which bounds staleness across worker processes.
+
+    `loader` returns (id, name) pairs; it is only called on a rebuild.
+    """
+
+    def __init__(self, loader, ttl: float = 300):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._built_at = 0.0
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self._compiled = None
+
+    def _build(self, *loader_args):
+        ids_by_name = {}
+        names_by_id = {}
+        for category_id, name in self.loader(*loader_args):
+            names_by_id[category_id] = name
+            key = (name or "").lower()
+            if key:
+                ids_by_name[key] = min(category_id, ids_by_name.get(key, category_id))
+
+        if not ids_by_name:
+            return None, {}, names_by_id
+        # A name also matches wherever a longer name it prefixes does; the
+        # lowest id wins, as with the old scan in table order
+        best = {}
+        for name in ids_by_name:
+            best[name] = min(i for other, i in ids_by_name.items() if name.startswith(other))
+        return re.compile(_trie_pattern(ids_by_name)), best, names_by_id
+
+    def _current(self, *loader_args):
+        compiled = self._compiled
+        if compiled is None or time.monotonic() - self._built_at > self.ttl:
+            with self._lock:
+                compiled = self._compiled
+                if compiled is None or time.monotonic() - self._built_at > self.ttl:
+                    compiled = self._build(*loader_args)
+                    self._compiled = compiled
+                    self._built_at = time.monotonic()
+                    self.rebuilds += 1
+        return compiled
+
+    def match(self, msg_lower: str, *loader_args) -> Optional[int]:
+        """Id of the category named in the message, if any"""
+        pattern, best, _ = self._current(*loader_args)
+        if pattern is None:
+            return None
+
+        found = None
+        match = pattern.search(msg_lower)
+        while match is not None:
+            category_id = best[match.group()]
+            if found is None or category_id < found:
+                found = category_id
+            match = pattern.search(msg_lower, match.start() + 1)
+        return found
+
+    def name_for(self, category_id: int, *loader_args) -> Optional[str]:
+        """Category name from the in-memory snapshot"""
+        return self._current(*loader_args)[2].get(category_id)
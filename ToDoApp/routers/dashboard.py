@@ -3,23 +3,33 @@ Dashboard router with role-based access control
 """
 from datetime import datetime, date, timedelta
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from fastapi.requests import HTTPConnection
 from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, asc
+from sqlalchemy.orm import Session, joinedload, undefer
+from sqlalchemy import func, and_, case, select
 from typing import Annotated, Optional
 from urllib.parse import urlencode
-from ToDoApp.database import SessionLocal
-from ToDoApp.models import ToDoItem, Category, Users
+import heapq
+import os
+from ToDoApp.cache import TTLCache
+from ToDoApp.counters import get_counters
+from ToDoApp.read_models import fetch_task_page, recent_tasks, task_list_filters
+from ToDoApp.events import daily_stats
+from ToDoApp.replicas import read_db_dependency
+from ToDoApp.sharding import session_owner_id, shard_router
+from ToDoApp.models import ToDoItem, ToDoItemArchive, Category, Users
 from ToDoApp.routers.auth import get_current_user
-from ToDoApp.routers.rbac import require_role, check_role_access, is_admin
+from ToDoApp.routers.rbac import Permission, Principal, principal_dependency, require_permission, task_scope
+from ToDoApp.timewindows import day_window, days_window, in_window, local_day_bucket, local_today, timezone_dependency
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 templates = Jinja2Templates(directory="ToDoApp/template")
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(connection: HTTPConnection):
+    # Bound to the logged-in user's shard (see ToDoApp.sharding)
+    db = shard_router.session(session_owner_id(connection))
     try:
         yield db
     finally:
@@ -28,11 +38,56 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
+manager_dependency = Annotated[Principal, Depends(require_permission(Permission.VIEW_ALL_TASKS))]
+
+# Team-wide aggregates are shared by every manager, so a short TTL keeps
+# repeated refreshes from re-running the grouped queries
+team_stats_cache = TTLCache(ttl=float(os.getenv("TEAM_DASHBOARD_TTL", "30")), maxsize=32)
 
 
 # ---------------- DASHBOARD PAGE ----------------
 
 
+def created_per_local_day(db: Session, owner_id: int, tz, days: int) -> list:
+    """
+    (local day, tasks created) for the last `days` local days. One range
+    scan on (owner_id, created_at), grouped by local day in SQL, so at
+    most `days` rows come back however many tasks were created.
+    """
+    today = local_today(tz)
+    first_day = today - timedelta(days=days - 1)
+    bucket = local_day_bucket(ToDoItem.created_at, first_day, days, tz).label("bucket")
+    counts = dict(db.execute(
+        select(bucket, func.count()).where(
+            ToDoItem.owner_id == owner_id,
+            in_window(ToDoItem.created_at, days_window(first_day, today, tz))
+        ).group_by(bucket)
+    ).all())
+    return [(first_day + timedelta(days=i), counts.get(i, 0)) for i in range(days)]
+
+
+def count_upcoming(db: Session, owner_id: int, today: date) -> int:
+    """Pending tasks due after today; date-relative, so not a stored counter"""
+    return db.execute(
+        select(func.count(ToDoItem.id)).where(
+            ToDoItem.owner_id == owner_id,
+            ToDoItem.status == "pending",
+            ToDoItem.due_date > today
+        )
+    ).scalar_one()
+
+
+def category_counts(db: Session, owner_id: int) -> list:
+    """(category name, task count, category id) for the user's non-empty categories"""
+    return db.execute(
+        select(Category.name, func.count(ToDoItem.id), Category.id)
+        .join(ToDoItem, ToDoItem.category_id == Category.id)
+        .where(ToDoItem.owner_id == owner_id)
+        .group_by(Category.id, Category.name)
+        .order_by(Category.id)
+    ).all()
+
+
 def build_qs(request: Request, exclude: str | None = None) -> str:
     """Build a safe query string excluding one parameter."""
     params = dict(request.query_params)
@@ -44,8 +99,10 @@ def build_qs(request: Request, exclude: str | None = None) -> str:
 @router.get("/")
 async def dashboard_page(
     request: Request,
-    db: db_dependency,
+    db: read_db_dependency,
     user: user_dependency,
+    principal: principal_dependency,
+    tz: timezone_dependency,
     search: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None, alias="status"),
     category_id: Optional[int] = Query(None),
@@ -58,115 +115,40 @@ async def dashboard_page(
     """Main dashboard page with task list and filters"""
     # Get user info
     db_user = db.query(Users).filter(Users.id == user["user_id"]).first()
-    today = date.today()
+    today = local_today(tz)
     
     # Get today's tasks (or recent tasks if none today)
-    today_tasks_raw = db.query(ToDoItem).filter(
-        ToDoItem.owner_id == user["user_id"]
-    ).order_by(ToDoItem.created_at.desc()).limit(4).all()
-    
-    # Create a list with formatted datetime strings for easier template rendering
-    today_tasks = []
-    for task in today_tasks_raw:
-        # Create a simple object-like structure for the template
-        class TaskObj:
-            def __init__(self, task):
-                self.id = task.id
-                self.title = task.title
-                self.status = task.status
-                if task.created_at:
-                    self.created_at_iso = task.created_at.isoformat()
-                else:
-                    self.created_at_iso = None
-                self.created_at = task.created_at  # Keep original for other uses
-        today_tasks.append(TaskObj(task))
+    today_tasks = recent_tasks(db, user["user_id"])
     
     # Get statistics
-    all_todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"]).all()
-    
+    counts = get_counters(db, user["user_id"])
     stats = {
-        "total": len(all_todos),
-        "completed": len([t for t in all_todos if t.status == "completed"]),
-        "progress": len([t for t in all_todos if t.status == "progress"]),
-        "pending": len([t for t in all_todos if t.status == "pending"]),
-        "upcoming": len([t for t in all_todos if t.status == "pending" and t.due_date and t.due_date > today])
+        "total": counts["total"],
+        "completed": counts["completed"],
+        "progress": counts["progress"],
+        "pending": counts["pending"],
+        "upcoming": count_upcoming(db, user["user_id"], today)
     }
     
     # Get project categories (for donut chart and filters)
     categories = db.query(Category).all()
-    category_stats = []
-    for cat in categories:
-        count = len([t for t in all_todos if t.category_id == cat.id])
-        if count > 0:
-            category_stats.append({
-                "name": cat.name,
-                "count": count
-            })
+    category_stats = [
+        {"name": name, "count": count}
+        for name, count, _ in category_counts(db, user["user_id"])
+    ]
     
     # Get task analytics data (last 7 days)
-    analytics_data = []
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_tasks = db.query(ToDoItem).filter(
-            and_(
-                ToDoItem.owner_id == user["user_id"],
-                func.date(ToDoItem.created_at) == day
-            )
-        ).count()
-        analytics_data.append({
-            "day": day.strftime("%a"),
-            "count": day_tasks
-        })
+    analytics_data = [
+        {"day": day.strftime("%a"), "count": count}
+        for day, count in created_per_local_day(db, user["user_id"], tz, 7)
+    ]
     
     # Get filtered and paginated todos for the task list
-    query = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"])
-    
-    # Search functionality
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                ToDoItem.title.ilike(search_term),
-                ToDoItem.description.ilike(search_term),
-                ToDoItem.tags.ilike(search_term)
-            )
-        )
-    
-    # Status filter
-    if status_filter:
-        query = query.filter(ToDoItem.status == status_filter)
-    
-    # Category filter
-    if category_id:
-        query = query.filter(ToDoItem.category_id == category_id)
-    
-    # Priority filter
-    if priority_filter:
-        query = query.filter(ToDoItem.priority == priority_filter)
-    
-    # Sorting
-    sort_column = {
-        "title": ToDoItem.title,
-        "priority": ToDoItem.priority,
-        "status": ToDoItem.status,
-        "due_date": ToDoItem.due_date,
-        "created_at": ToDoItem.created_at,
-        "updated_at": ToDoItem.updated_at
-    }.get(sort_by, ToDoItem.created_at)
-    
-    if sort_order == "asc":
-        query = query.order_by(asc(sort_column))
-    else:
-        query = query.order_by(desc(sort_column))
-    
-    # Get all for pagination
-    all_filtered_todos = query.all()
-    
-    # Pagination
-    total_count = len(all_filtered_todos)
-    start = (page - 1) * per_page
-    end = start + per_page
-    todos = all_filtered_todos[start:end]
+    todos, total_count = fetch_task_page(
+        db,
+        task_list_filters(user["user_id"], search, status_filter, category_id, priority_filter),
+        sort_by, sort_order, page, per_page
+    )
     
     # Calculate pagination info
     total_pages = (total_count + per_page - 1) // per_page
@@ -187,8 +169,8 @@ async def dashboard_page(
             "category_stats": category_stats,
             "analytics_data": analytics_data,
             "today": today,
-            "is_admin": is_admin(user),
-            "is_manager": check_role_access(user, ["manager", "admin", "superuser"]),
+            "is_admin": principal.is_admin,
+            "is_manager": principal.is_manager,
             "todos": todos,
             "categories": categories,
             "filters": {
@@ -216,13 +198,13 @@ async def dashboard_page(
 
 @router.get("/api/analytics")
 async def get_analytics(
-    db: db_dependency,
+    db: read_db_dependency,
     user: user_dependency,
+    tz: timezone_dependency,
     period: str = "week"  # week, month, year
 ):
-    """Get task analytics data"""
-    today = date.today()
-    
+    """Get task analytics data, bucketed by the user's local day"""
+
     if period == "week":
         days = 7
     elif period == "month":
@@ -230,68 +212,88 @@ async def get_analytics(
     else:  # year
         days = 365
     
-    analytics = []
-    for i in range(days - 1, -1, -1):
-        day = today - timedelta(days=i)
-        day_tasks = db.query(ToDoItem).filter(
-            and_(
-                ToDoItem.owner_id == user["user_id"],
-                func.date(ToDoItem.created_at) == day
-            )
-        ).count()
-        analytics.append({
+    analytics = [
+        {"date": day.isoformat(), "day": day.strftime("%a"), "count": count}
+        for day, count in created_per_local_day(db, user["user_id"], tz, days)
+    ]
+    
+    return JSONResponse(content={"data": analytics, "timezone": tz.key})
+
+
+@router.get("/api/productivity")
+async def get_productivity(
+    db: read_db_dependency,
+    user: user_dependency,
+    tz: timezone_dependency,
+    days: int = Query(30, ge=1, le=366)
+):
+    """
+    Tasks created, completed, reopened and deleted per local day, read
+    from the daily rollup (one small row per active day). The rollup runs
+    in the background, so the last minute or so may not be included yet.
+    """
+    today = local_today(tz)
+    first_day = today - timedelta(days=days - 1)
+    rows = daily_stats(db, user["user_id"], first_day, today)
+
+    data = []
+    for i in range(days):
+        day = first_day + timedelta(days=i)
+        row = rows.get(day)
+        data.append({
             "date": day.isoformat(),
-            "day": day.strftime("%a"),
-            "count": day_tasks
+            "created": row.created if row else 0,
+            "completed": row.completed if row else 0,
+            "reopened": row.reopened if row else 0,
+            "deleted": row.deleted if row else 0,
         })
-    
-    return JSONResponse(content={"data": analytics})
+
+    return JSONResponse(content={"data": data, "timezone": tz.key})
 
 
 @router.get("/api/project-categories")
 async def get_project_categories(
-    db: db_dependency,
+    db: read_db_dependency,
     user: user_dependency
 ):
     """Get project category statistics"""
-    all_todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"]).all()
-    categories = db.query(Category).all()
+    total = get_counters(db, user["user_id"])["total"]
     
     category_data = []
-    total = len(all_todos)
-    
-    for cat in categories:
-        count = len([t for t in all_todos if t.category_id == cat.id])
-        if count > 0:
-            percentage = (count / total * 100) if total > 0 else 0
-            category_data.append({
-                "name": cat.name,
-                "count": count,
-                "percentage": round(percentage, 1)
-            })
+    for name, count, _ in category_counts(db, user["user_id"]):
+        percentage = (count / total * 100) if total > 0 else 0
+        category_data.append({
+            "name": name,
+            "count": count,
+            "percentage": round(percentage, 1)
+        })
     
     return JSONResponse(content={"categories": category_data, "total": total})
 
 
 @router.get("/api/today-tasks")
 async def get_today_tasks(
-    db: db_dependency,
-    user: user_dependency
+    db: read_db_dependency,
+    user: user_dependency,
+    tz: timezone_dependency
 ):
-    """Get today's tasks"""
-    today = date.today()
-    tasks = db.query(ToDoItem).filter(
-        and_(
+    """Get tasks created during the user's local today"""
+    window = day_window(local_today(tz), tz)
+    tasks = db.execute(
+        select(ToDoItem.id, ToDoItem.title, ToDoItem.status, ToDoItem.created_at)
+        .where(
             ToDoItem.owner_id == user["user_id"],
-            func.date(ToDoItem.created_at) == today
+            in_window(ToDoItem.created_at, window)
         )
-    ).order_by(ToDoItem.created_at.desc()).all()
+        .order_by(ToDoItem.created_at.desc())
+    ).all()
     
     tasks_data = []
+    now = datetime.utcnow()
     for task in tasks:
         time_ago = "just now"
         if task.created_at:
-            delta = datetime.now() - task.created_at
+            delta = now - task.created_at
             if delta.seconds < 60:
                 time_ago = "just now"
             elif delta.seconds < 3600:
@@ -309,40 +311,64 @@ async def get_today_tasks(
             "completed": task.status == "completed"
         })
     
-    return JSONResponse(content={"tasks": tasks_data})
+    return JSONResponse(content={
+        "tasks": tasks_data,
+        "timezone": tz.key,
+        "window": {"start": window[0].isoformat() + "Z", "end": window[1].isoformat() + "Z"},
+    })
 
 
 @router.get("/api/summary")
 async def get_summary(
-    db: db_dependency,
-    user: user_dependency
+    db: read_db_dependency,
+    user: user_dependency,
+    tz: timezone_dependency
 ):
     """Get summary statistics"""
-    all_todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"]).all()
-    today = date.today()
+    counts = get_counters(db, user["user_id"])
     
     return JSONResponse(content={
-        "total_project": len(all_todos),
-        "ongoing_project": len([t for t in all_todos if t.status == "progress"]),
-        "upcoming_projects": len([t for t in all_todos if t.status == "pending" and t.due_date and t.due_date > today]),
-        "complete_project": len([t for t in all_todos if t.status == "completed"])
+        "total_project": counts["total"],
+        "ongoing_project": counts["progress"],
+        "upcoming_projects": count_upcoming(db, user["user_id"], local_today(tz)),
+        "complete_project": counts["completed"]
     })
 
 
 @router.get("/api/all-tasks")
 async def get_all_tasks(
-    db: db_dependency,
-    user: user_dependency,
-    status: Optional[str] = None
+    db: read_db_dependency,
+    principal: principal_dependency,
+    status: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    include_archive: bool = False
 ):
-    """Get all tasks (with optional status filter) - Role-based access"""
-    query = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"])
-    
-    # Managers and admins can see all tasks, regular users only their own
-    if is_admin(user) and status:
-        query = query.filter(ToDoItem.status == status)
-    
-    tasks = query.order_by(ToDoItem.created_at.desc()).all()
+    """
+    Get all tasks (with optional status filter) - Role-based access.
+    Archived (old completed) tasks are only read when include_archive is set.
+    """
+    models_to_read = [ToDoItem, ToDoItemArchive] if include_archive else [ToDoItem]
+
+    def read_tasks(shard_db):
+        results = []
+        for model in models_to_read:
+            # Managers and admins can see all tasks, regular users only their own
+            query = shard_db.query(model).options(joinedload(model.category), undefer(model.description))\
+                .filter(task_scope(principal, owner_id, model))
+            
+            if status:
+                query = query.filter(model.status == status)
+            
+            results.append(query.order_by(model.created_at.desc()).all())
+        return results
+    
+    # Everyone but managers reads just their own shard
+    scope_owner = owner_id if principal.can(Permission.VIEW_ALL_TASKS) else principal.user_id
+    results = [
+        tasks for shard_results in shard_router.scatter(db, read_tasks, scope_owner)
+        for tasks in shard_results
+    ]
+    tasks = heapq.merge(*results, key=lambda t: t.created_at or datetime.min, reverse=True)
     
     tasks_data = []
     for task in tasks:
@@ -354,7 +380,9 @@ async def get_all_tasks(
             "priority": task.priority,
             "category": task.category.name if task.category else None,
             "due_date": task.due_date.isoformat() if task.due_date else None,
-            "created_at": task.created_at.isoformat() if task.created_at else None
+            "created_at": task.created_at.isoformat() if task.created_at else None,
+            "owner_id": task.owner_id,
+            "archived": isinstance(task, ToDoItemArchive)
         })
     
     return JSONResponse(content={"tasks": tasks_data})
@@ -385,3 +413,167 @@ async def toggle_task(
     db.commit()
     
     return JSONResponse(content={"status": "success", "new_status": task.status})
+
+
+
+# ---------------- TEAM DASHBOARD (MANAGERS) ----------------
+
+
+def merge_leaderboards(db: Session, candidates: list) -> list:
+    """
+    (rank, username, row, user) for the shards' top members, best first.
+    Competition ranking, as SQL rank(): ties share a rank.
+    """
+    if not candidates:
+        return []
+    names = {
+        row.id: row
+        for row in db.execute(
+            select(Users.id, Users.username, Users.first_name, Users.last_name)
+            .where(Users.id.in_([row.owner_id for row in candidates]))
+        )
+    }
+    candidates = sorted(candidates, key=lambda row: (row.completed_recently, row.completed), reverse=True)
+    leaderboard = []
+    rank, previous = 0, None
+    for position, row in enumerate(candidates, start=1):
+        if (row.completed_recently, row.completed) != previous:
+            rank, previous = position, (row.completed_recently, row.completed)
+        user = names.get(row.owner_id)
+        if user is not None:
+            leaderboard.append((rank, user.username, row, user))
+    leaderboard.sort(key=lambda entry: entry[:2])
+    return leaderboard
+
+
+def compute_team_stats(db: Session, today: date, leaderboard_size: int = 10, throughput_days: int = 7) -> dict:
+    """
+    Team-wide metrics from two grouped queries: one aggregate per status,
+    and a per-member leaderboard ranked in SQL with window functions.
+    `today` is the viewer's local day, which decides what counts as overdue.
+
+    With several shards both run on each shard in parallel, the second
+    returning that shard's top members; the top lists are merged and ranked
+    here, since any member in the overall top N is in their shard's top N.
+    """
+    since = datetime.utcnow() - timedelta(days=throughput_days)
+    is_open = ToDoItem.status != "completed"
+    is_overdue = and_(is_open, ToDoItem.due_date < today)
+    # Completed tasks are stamped through updated_at when their status flips
+    completed_recently = and_(ToDoItem.status == "completed", ToDoItem.updated_at >= since)
+
+    status_query = select(
+        ToDoItem.status,
+        func.count(ToDoItem.id).label("count"),
+        func.sum(case((is_overdue, 1), else_=0)).label("overdue"),
+        func.sum(case((completed_recently, 1), else_=0)).label("completed_recently"),
+        func.sum(case((ToDoItem.created_at >= since, 1), else_=0)).label("created_recently"),
+    ).group_by(ToDoItem.status)
+
+    per_member = (
+        select(
+            ToDoItem.owner_id.label("owner_id"),
+            func.count(ToDoItem.id).label("total"),
+            func.sum(case((ToDoItem.status == "completed", 1), else_=0)).label("completed"),
+            func.sum(case((is_open, 1), else_=0)).label("open"),
+            func.sum(case((is_overdue, 1), else_=0)).label("overdue"),
+            func.sum(case((completed_recently, 1), else_=0)).label("completed_recently"),
+        )
+        .group_by(ToDoItem.owner_id)
+        .subquery()
+    )
+    score = (per_member.c.completed_recently.desc(), per_member.c.completed.desc())
+    completion_rate = (per_member.c.completed * 100.0 / func.nullif(per_member.c.total, 0)).label("completion_rate")
+    sharded = len(shard_router) > 1
+
+    def shard_stats(shard_db):
+        status_rows = shard_db.execute(status_query).all()
+        if not sharded:
+            return status_rows, []
+        leaders_query = select(per_member, completion_rate).order_by(*score, per_member.c.owner_id).limit(leaderboard_size)
+        return status_rows, shard_db.execute(leaders_query).all()
+
+    by_status = {"pending": 0, "progress": 0, "completed": 0}
+    overdue = completed_recently_total = created_recently_total = 0
+    candidates = []
+    for status_rows, leader_rows in shard_router.scatter(db, shard_stats):
+        for row in status_rows:
+            by_status[row.status] = by_status.get(row.status, 0) + row.count
+            overdue += row.overdue or 0
+            completed_recently_total += row.completed_recently or 0
+            created_recently_total += row.created_recently or 0
+        candidates.extend(leader_rows)
+
+    if sharded:
+        leaderboard = merge_leaderboards(db, candidates)
+    else:
+        ranked = select(per_member, func.rank().over(order_by=score).label("rank"), completion_rate).subquery()
+        leaderboard = [
+            (row.rank, row.username, row, row)
+            for row in db.execute(
+                select(ranked, Users.username, Users.first_name, Users.last_name)
+                .join(Users, Users.id == ranked.c.owner_id)
+                .order_by(ranked.c.rank, Users.username)
+                .limit(leaderboard_size)
+            )
+        ]
+
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "throughput_days": throughput_days,
+        "totals": {
+            "total": sum(by_status.values()),
+            **by_status,
+            "overdue": overdue,
+            "completed_recently": completed_recently_total,
+            "created_recently": created_recently_total,
+        },
+        "leaderboard": [
+            {
+                "rank": rank,
+                "user_id": row.owner_id,
+                "username": user.username,
+                "name": f"{user.first_name or ''} {user.last_name or ''}".strip() or user.username,
+                "total": row.total,
+                "open": row.open,
+                "overdue": row.overdue,
+                "completed": row.completed,
+                "completed_recently": row.completed_recently,
+                "completion_rate": round(row.completion_rate or 0, 1),
+            }
+            for rank, _, row, user in leaderboard[:leaderboard_size]
+        ],
+    }
+
+
+def get_team_stats(db: Session, today: date, leaderboard_size: int = 10) -> dict:
+    return team_stats_cache.get_or_set(
+        ("team", today, leaderboard_size),
+        lambda: compute_team_stats(db, today, leaderboard_size)
+    )
+
+
+@router.get("/team")
+async def team_dashboard_page(
+    request: Request,
+    db: read_db_dependency,
+    user: user_dependency,
+    principal: manager_dependency,
+    tz: timezone_dependency
+):
+    """Team overview for managers and above"""
+    return templates.TemplateResponse(
+        "team-dashboard.html",
+        {"request": request, "user": user, "team": get_team_stats(db, local_today(tz))}
+    )
+
+
+@router.get("/api/team")
+async def get_team_dashboard(
+    db: read_db_dependency,
+    principal: manager_dependency,
+    tz: timezone_dependency,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Team-wide status, overdue and throughput metrics with a leaderboard"""
+    return JSONResponse(content=get_team_stats(db, local_today(tz), limit))
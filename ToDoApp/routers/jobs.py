@@ -0,0 +1,144 @@
+"""
+Background export and import jobs (see ToDoApp.jobs)
+"""
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ToDoApp.bulk_import import detect_format
+from ToDoApp.jobs import ACTIVE_STATUSES, MAX_ACTIVE_JOBS, job_runner, spool_upload, upload_path
+from ToDoApp.models import Job, Users
+from ToDoApp.routers.auth import get_current_user
+from ToDoApp.routers.todos import get_db
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Jobs live on the primary, which this session writes to; polling must
+# not read a lagging replica
+db_dependency = Annotated[Session, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+
+def job_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params or "{}"),
+        "progress": job.progress,
+        "total": job.total,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download_url": f"/jobs/{job.id}/download" if job.result_path else None,
+    }
+
+
+def get_user_job(db: Session, job_id: int, user_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if job is None or job.owner_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def new_job(db: Session, user_id: int, kind: str, params: dict) -> Job:
+    """
+    Record and commit a queued job, unless the user already has
+    MAX_ACTIVE_JOBS in progress. The owner's row is locked first, so
+    concurrent submissions are counted one after the other.
+    """
+    db.execute(select(Users.id).where(Users.id == user_id).with_for_update())
+    active = db.execute(
+        select(func.count(Job.id)).where(Job.owner_id == user_id, Job.status.in_(ACTIVE_STATUSES))
+    ).scalar()
+    if active >= MAX_ACTIVE_JOBS:
+        db.rollback()
+        raise HTTPException(status_code=429, detail="Too many jobs in progress, wait for one to finish")
+    job = Job(owner_id=user_id, kind=kind, params=json.dumps(params))
+    db.add(job)
+    db.commit()
+    return job
+
+
+def accepted(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job_dict(job),
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+@router.post("/export")
+async def submit_export(
+    db: db_dependency,
+    user: user_dependency,
+    format: str = Query("csv", regex="^(csv|json|ndjson)$"),
+    include_archive: bool = Query(False)
+):
+    """Queue an export; poll the returned job and download its result when it succeeds"""
+    job = new_job(db, user["user_id"], "export", {"format": format, "include_archive": include_archive})
+    job_runner.submit(job.id)
+    return accepted(job)
+
+
+@router.post("/import")
+async def submit_import(
+    db: db_dependency,
+    user: user_dependency,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, regex="^(csv|json|ndjson)$")
+):
+    """Queue an import of a CSV, JSON or NDJSON upload; the job's result is the import report"""
+    format = format or detect_format(file.filename)
+    if format is None:
+        raise HTTPException(status_code=400, detail="Unknown format, pass format=csv|json|ndjson")
+    # Spooled before the job is recorded, so no transaction is open while
+    # the upload is copied
+    spooled = await run_in_threadpool(spool_upload, file.file)
+    try:
+        job = new_job(db, user["user_id"], "import", {"format": format, "filename": file.filename})
+        os.replace(spooled, upload_path(job.id))
+    except BaseException:
+        spooled.unlink(missing_ok=True)
+        raise
+    job_runner.submit(job.id)
+    return accepted(job)
+
+
+@router.get("/")
+async def list_jobs(db: db_dependency, user: user_dependency, limit: int = Query(20, ge=1, le=100)):
+    """The user's most recent jobs"""
+    jobs = db.execute(
+        select(Job).where(Job.owner_id == user["user_id"]).order_by(Job.created_at.desc(), Job.id.desc()).limit(limit)
+    ).scalars().all()
+    return [job_dict(job) for job in jobs]
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: int, db: db_dependency, user: user_dependency):
+    """Status and progress of one job"""
+    return job_dict(get_user_job(db, job_id, user["user_id"]))
+
+
+@router.get("/{job_id}/download")
+async def download_job_result(job_id: int, db: db_dependency, user: user_dependency):
+    """The gzip-compressed export file of a finished export job"""
+    job = get_user_job(db, job_id, user["user_id"])
+    if job.status != "succeeded" or not job.result_path:
+        raise HTTPException(status_code=409, detail="Job has no result to download")
+    path = Path(job.result_path)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Result expired")
+    fmt = json.loads(job.params or "{}").get("format", "csv")
+    return FileResponse(
+        path,
+        media_type="application/gzip",
+        filename=f"todos_{date.today()}.{fmt}.gz"
+    )
@@ -1,9 +1,19 @@
 """
 Role-Based Access Control (RBAC) utilities
+
+Roles are compiled once into permission bitmasks. A request resolves its
+user into a Principal a single time (FastAPI caches dependencies per
+request) and every check after that is an integer AND. Routers that list
+tasks apply `task_scope(principal)` to their query instead of checking
+ownership row by row.
 """
-from functools import wraps
+from dataclasses import dataclass
+from enum import IntFlag
+from functools import wraps, lru_cache
 from fastapi import HTTPException, Depends
+from sqlalchemy import true
 from typing import Annotated, List, Optional
+from ToDoApp.models import ToDoItem
 from ToDoApp.routers.auth import get_current_user
 
 # Define role hierarchy
@@ -15,39 +25,156 @@ ROLE_HIERARCHY = {
     "guest": 0
 }
 
+
+class Permission(IntFlag):
+    VIEW_OWN_TASKS = 1
+    EDIT_OWN_TASKS = 2
+    VIEW_ALL_TASKS = 4
+    VIEW_MEMBERS = 8
+    MANAGE_ALL_TASKS = 16
+    MANAGE_USERS = 32
+
+
+# Permissions granted at each level; a role holds everything granted at or
+# below its own level
+LEVEL_GRANTS = {
+    0: Permission.VIEW_OWN_TASKS,
+    1: Permission.EDIT_OWN_TASKS,
+    2: Permission.VIEW_ALL_TASKS | Permission.VIEW_MEMBERS,
+    3: Permission.MANAGE_ALL_TASKS | Permission.MANAGE_USERS,
+    4: Permission(0),
+}
+
+ROLE_PERMISSIONS = {
+    role: Permission(sum(int(grant) for lvl, grant in LEVEL_GRANTS.items() if lvl <= level))
+    for role, level in ROLE_HIERARCHY.items()
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user with their role resolved to a permission mask"""
+    user_id: int
+    username: str
+    role: str
+    level: int
+    permissions: Permission
+
+    def can(self, permission: Permission) -> bool:
+        return self.permissions & permission == permission
+
+    @property
+    def is_admin(self) -> bool:
+        return self.can(Permission.MANAGE_ALL_TASKS)
+
+    @property
+    def is_manager(self) -> bool:
+        return self.can(Permission.VIEW_ALL_TASKS)
+
+
+@lru_cache(maxsize=64)
+def resolve_role(raw_role: Optional[str]) -> tuple:
+    """Normalise a stored role string to (role, level, permissions)"""
+    role = (raw_role or "").lower()
+    level = ROLE_HIERARCHY.get(role, 0)
+    permissions = ROLE_PERMISSIONS.get(role, ROLE_PERMISSIONS["guest"])
+    return role, level, permissions
+
+
+def principal_from_user(user: dict) -> Principal:
+    role, level, permissions = resolve_role(user.get("user_role"))
+    return Principal(
+        user_id=user.get("user_id"),
+        username=user.get("username", ""),
+        role=role,
+        level=level,
+        permissions=permissions,
+    )
+
+
+# ---------------- DEPENDENCIES ----------------
+def get_principal(user: Annotated[dict, Depends(get_current_user)]) -> Principal:
+    """Resolve the session user once per request"""
+    return principal_from_user(user)
+
+
+principal_dependency = Annotated[Principal, Depends(get_principal)]
+
+
+def require_permission(permission: Permission):
+    """
+    Dependency factory requiring every bit in `permission`
+    Usage: principal: Annotated[Principal, Depends(require_permission(Permission.VIEW_MEMBERS))]
+    """
+    def dependency(principal: principal_dependency) -> Principal:
+        if not principal.can(permission):
+            raise HTTPException(status_code=403, detail="Access denied.")
+        return principal
+    return dependency
+
+
+def require_level(min_role: str):
+    """Dependency factory requiring a minimum role level"""
+    min_level = ROLE_HIERARCHY.get(min_role.lower(), 0)
+
+    def dependency(principal: principal_dependency) -> Principal:
+        if principal.level < min_level:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Access denied. Minimum role required: {min_role}"
+            )
+        return principal
+    return dependency
+
+
+# ---------------- QUERY SCOPES ----------------
+def task_scope(principal: Principal, owner_id: Optional[int] = None, model=ToDoItem):
+    """
+    WHERE criterion limiting task rows (ToDoItem, or `model` such as the
+    archive) to what the principal may see. Managers and above see every
+    task (optionally narrowed to one owner); everyone else only their own.
+    Both forms use the owner_id index.
+    """
+    if principal.can(Permission.VIEW_ALL_TASKS):
+        if owner_id is not None:
+            return model.owner_id == owner_id
+        return true()
+    return model.owner_id == principal.user_id
+
+
+# ---------------- LEGACY DECORATORS ----------------
+def _find_user(args, kwargs):
+    for value in kwargs.values():
+        if isinstance(value, dict) and "user_role" in value:
+            return value
+    for arg in args:
+        if isinstance(arg, dict) and "user_role" in arg:
+            return arg
+    return None
+
+
 def require_role(allowed_roles: List[str]):
     """
     Decorator to require specific roles for access
     Usage: @require_role(["admin", "manager"])
+
+    Prefer `require_permission` for new routes.
     """
+    allowed = frozenset(r.lower() for r in allowed_roles)
+
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Find user_dependency in kwargs
-            user = None
-            for key, value in kwargs.items():
-                if isinstance(value, dict) and "user_role" in value:
-                    user = value
-                    break
-            
-            if not user:
-                # Try to get from dependencies
-                for arg in args:
-                    if isinstance(arg, dict) and "user_role" in arg:
-                        user = arg
-                        break
-            
+            user = _find_user(args, kwargs)
             if not user:
                 raise HTTPException(status_code=401, detail="Authentication required")
-            
-            user_role = user.get("user_role", "").lower()
-            
-            if user_role not in allowed_roles:
+
+            if resolve_role(user.get("user_role"))[0] not in allowed:
                 raise HTTPException(
                     status_code=403,
                     detail=f"Access denied. Required roles: {', '.join(allowed_roles)}"
                 )
-            
+
             return await func(*args, **kwargs)
         return wrapper
     return decorator
@@ -57,65 +184,51 @@ def require_min_role(min_role: str):
     """
     Decorator to require minimum role level
     Usage: @require_min_role("manager")
+
+    Prefer `require_level` for new routes.
     """
+    min_level = ROLE_HIERARCHY.get(min_role.lower(), 0)
+
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            user = None
-            for key, value in kwargs.items():
-                if isinstance(value, dict) and "user_role" in value:
-                    user = value
-                    break
-            
-            if not user:
-                for arg in args:
-                    if isinstance(arg, dict) and "user_role" in arg:
-                        user = arg
-                        break
-            
+            user = _find_user(args, kwargs)
             if not user:
                 raise HTTPException(status_code=401, detail="Authentication required")
-            
-            user_role = user.get("user_role", "").lower()
-            min_level = ROLE_HIERARCHY.get(min_role.lower(), 0)
-            user_level = ROLE_HIERARCHY.get(user_role, 0)
-            
-            if user_level < min_level:
+
+            if resolve_role(user.get("user_role"))[1] < min_level:
                 raise HTTPException(
                     status_code=403,
                     detail=f"Access denied. Minimum role required: {min_role}"
                 )
-            
+
             return await func(*args, **kwargs)
         return wrapper
     return decorator
 
 
+# ---------------- HELPERS ----------------
 def check_role_access(user: dict, required_roles: List[str]) -> bool:
     """Check if user has one of the required roles"""
-    user_role = user.get("user_role", "").lower()
-    return user_role in [r.lower() for r in required_roles]
+    role = resolve_role(user.get("user_role"))[0]
+    return any(role == r.lower() for r in required_roles)
 
 
 def check_min_role(user: dict, min_role: str) -> bool:
     """Check if user has minimum role level"""
-    user_role = user.get("user_role", "").lower()
-    min_level = ROLE_HIERARCHY.get(min_role.lower(), 0)
-    user_level = ROLE_HIERARCHY.get(user_role, 0)
-    return user_level >= min_level
+    return resolve_role(user.get("user_role"))[1] >= ROLE_HIERARCHY.get(min_role.lower(), 0)
 
 
 def get_user_role(user: dict) -> str:
     """Get user role from user dict"""
-    return user.get("user_role", "user").lower()
+    return resolve_role(user.get("user_role", "user"))[0]
 
 
 def is_admin(user: dict) -> bool:
     """Check if user is admin or superuser"""
-    role = get_user_role(user)
-    return role in ["admin", "superuser"]
+    return bool(resolve_role(user.get("user_role"))[2] & Permission.MANAGE_ALL_TASKS)
 
 
 def is_manager_or_above(user: dict) -> bool:
     """Check if user is manager or above"""
-    return check_min_role(user, "manager")
+    return bool(resolve_role(user.get("user_role"))[2] & Permission.VIEW_ALL_TASKS)
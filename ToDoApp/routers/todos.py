@@ -1,23 +1,32 @@
 from datetime import date, datetime
-from fastapi import APIRouter, Depends, Request, HTTPException, status, Form, Query
+from fastapi import APIRouter, Depends, Request, HTTPException, status, Form, Query, File, UploadFile
+from fastapi.requests import HTTPConnection
 from fastapi.responses import RedirectResponse, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, desc, asc
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, undefer
 from typing import Annotated, Optional
 from urllib.parse import urlencode
-from ToDoApp.database import SessionLocal
-from ToDoApp.models import ToDoItem, Category
+from ToDoApp.bulk_import import detect_format, import_tasks
+from ToDoApp.counters import get_counters
+from ToDoApp.exports import MEDIA_TYPES as EXPORT_MEDIA_TYPES, iter_export
+from ToDoApp.read_models import fetch_task_page, task_list_filters
+from ToDoApp.replicas import read_db_dependency
+from ToDoApp.sharding import session_owner_id, shard_router
+from ToDoApp.sync import CursorExpired, decode_cursor, fetch_changes
+from ToDoApp.timewindows import local_today, timezone_dependency
+from ToDoApp.models import ToDoItem, ToDoItemArchive, Category, STATUS_CODES
 from ToDoApp.routers.auth import get_current_user
+from ToDoApp.routers.chatbot import title_index
 from fastapi.templating import Jinja2Templates
 import csv
-import json
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 templates = Jinja2Templates(directory="ToDoApp/template")
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(connection: HTTPConnection):
+    # Bound to the logged-in user's shard (see ToDoApp.sharding)
+    db = shard_router.session(session_owner_id(connection))
     try:
         yield db
     finally:
@@ -33,11 +42,11 @@ def get_priority_label(priority: int) -> str:
     priority_map = {1: "High", 2: "Medium", 3: "Low"}
     return priority_map.get(priority, "Low")
 
-def is_overdue(due_date) -> bool:
-    """Check if a task is overdue"""
+def is_overdue(due_date, today: date) -> bool:
+    """Check if a task is overdue on the user's local `today`"""
     if not due_date:
         return False
-    return due_date < date.today()
+    return due_date < today
 
 def parse_tags(tags_str: Optional[str]) -> list:
     """Parse comma-separated tags string into list"""
@@ -58,8 +67,9 @@ def build_qs(request: Request, exclude: str | None = None) -> str:
 @router.get("/todo-page")
 async def todo_page(
     request: Request,
-    db: db_dependency,
+    db: read_db_dependency,
     user: user_dependency,
+    tz: timezone_dependency,
     search: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None, alias="status"),
     category_id: Optional[int] = Query(None),
@@ -70,62 +80,14 @@ async def todo_page(
     per_page: int = Query(20, ge=1, le=100)
 ):
     """Main todo page with search, filter, and sort"""
-    # Base query
-    query = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"])
-    
-    # Search functionality
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                ToDoItem.title.ilike(search_term),
-                ToDoItem.description.ilike(search_term),
-                ToDoItem.tags.ilike(search_term)
-            )
-        )
-    
-    # Status filter
-    if status_filter:
-        query = query.filter(ToDoItem.status == status_filter)
-    
-    # Category filter
-    if category_id:
-        query = query.filter(ToDoItem.category_id == category_id)
-    
-    # Priority filter
-    if priority_filter:
-        query = query.filter(ToDoItem.priority == priority_filter)
-    
-    # Sorting
-    sort_column = {
-        "title": ToDoItem.title,
-        "priority": ToDoItem.priority,
-        "status": ToDoItem.status,
-        "due_date": ToDoItem.due_date,
-        "created_at": ToDoItem.created_at,
-        "updated_at": ToDoItem.updated_at
-    }.get(sort_by, ToDoItem.created_at)
-    
-    if sort_order == "asc":
-        query = query.order_by(asc(sort_column))
-    else:
-        query = query.order_by(desc(sort_column))
-    
-    # Get all for stats
-    all_todos = query.all()
-    
-    # Pagination
-    total_count = len(all_todos)
-    start = (page - 1) * per_page
-    end = start + per_page
-    todos = all_todos[start:end]
+    todos, total_count = fetch_task_page(
+        db,
+        task_list_filters(user["user_id"], search, status_filter, category_id, priority_filter),
+        sort_by, sort_order, page, per_page
+    )
     
     # Calculate stats
-    all_user_todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"]).all()
-    total = len(all_user_todos)
-    completed_count = len([t for t in all_user_todos if t.status == "completed"])
-    pending_count = len([t for t in all_user_todos if t.status == "pending"])
-    progress_count = len([t for t in all_user_todos if t.status == "progress"])
+    counts = get_counters(db, user["user_id"])
     
     # Get categories
     categories = db.query(Category).all()
@@ -145,12 +107,12 @@ async def todo_page(
             "user": user,
             "todos": todos,
             "categories": categories,
-            "today": date.today(),
+            "today": local_today(tz),
             "stats": {
-                "total": total,
-                "pending": pending_count,
-                "progress": progress_count,
-                "completed": completed_count,
+                "total": counts["total"],
+                "pending": counts["pending"],
+                "progress": counts["progress"],
+                "completed": counts["completed"],
             },
             "filters": {
                 "search": search or "",
@@ -176,19 +138,20 @@ async def todo_page(
 
 
 @router.get("/add-todo-page")
-async def add_todo_page(request: Request, db: db_dependency, user: user_dependency):
+async def add_todo_page(request: Request, db: read_db_dependency, user: user_dependency, tz: timezone_dependency):
     """Add new todo page"""
     categories = db.query(Category).all()
     return templates.TemplateResponse(
         "add-todo.html",
-        {"request": request, "user": user, "categories": categories, "today": date.today()}
+        {"request": request, "user": user, "categories": categories, "today": local_today(tz)}
     )
 
 
 @router.get("/edit-todo-page/{todo_id}")
-async def edit_todo_page(request: Request, todo_id: int, db: db_dependency, user: user_dependency):
+async def edit_todo_page(request: Request, todo_id: int, db: read_db_dependency, user: user_dependency):
     """Edit todo page"""
     todo = db.query(ToDoItem)\
+        .options(undefer(ToDoItem.description))\
         .filter(ToDoItem.id == todo_id)\
         .filter(ToDoItem.owner_id == user["user_id"])\
         .first()
@@ -205,9 +168,12 @@ async def edit_todo_page(request: Request, todo_id: int, db: db_dependency, user
 
 
 @router.get("/todo-details/{todo_id}")
-async def todo_details_page(request: Request, todo_id: int, db: db_dependency, user: user_dependency):
+async def todo_details_page(
+    request: Request, todo_id: int, db: read_db_dependency, user: user_dependency, tz: timezone_dependency
+):
     """Detailed view of a single todo"""
     todo = db.query(ToDoItem)\
+        .options(undefer(ToDoItem.description))\
         .filter(ToDoItem.id == todo_id)\
         .filter(ToDoItem.owner_id == user["user_id"])\
         .first()
@@ -217,7 +183,7 @@ async def todo_details_page(request: Request, todo_id: int, db: db_dependency, u
 
     return templates.TemplateResponse(
         "todo-details.html",
-        {"request": request, "todo": todo, "user": user, "today": date.today()}
+        {"request": request, "todo": todo, "user": user, "today": local_today(tz)}
     )
 
 
@@ -280,6 +246,9 @@ async def update_todo(
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
 
+    if todo_status not in STATUS_CODES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+
     todo.title = title
     todo.description = description
     todo.priority = priority
@@ -344,7 +313,7 @@ async def quick_status_change(
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
 
-    if new_status in ["pending", "progress", "completed"]:
+    if new_status in STATUS_CODES:
         todo.status = new_status
         db.commit()
 
@@ -385,60 +354,65 @@ async def toggle_complete(
 # ---------------- EXPORT FUNCTIONALITY ----------------
 @router.get("/export")
 async def export_todos(
+    db: read_db_dependency,
+    user: user_dependency,
+    format: str = Query("csv", regex="^(csv|json|ndjson)$"),
+    include_archive: bool = Query(False)
+):
+    """
+    Export todos to CSV, JSON or NDJSON, optionally with archived completed
+    tasks. Large lists are better exported by a background job (/jobs/export).
+    """
+    return Response(
+        content="".join(iter_export(db, user["user_id"], format, include_archive)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=todos_{date.today()}.{format}"}
+    )
+
+
+# ---------------- IMPORT ----------------
+@router.post("/import")
+async def import_todos(
     db: db_dependency,
     user: user_dependency,
-    format: str = Query("csv", regex="^(csv|json)$")
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, regex="^(csv|json|ndjson)$")
 ):
-    """Export todos to CSV or JSON"""
-    todos = db.query(ToDoItem).filter(ToDoItem.owner_id == user["user_id"]).all()
-    
-    if format == "csv":
-        output = []
-        output.append(["ID", "Title", "Description", "Status", "Priority", "Category", "Due Date", "Tags", "Created At"])
-        
-        for todo in todos:
-            output.append([
-                todo.id,
-                todo.title,
-                todo.description or "",
-                todo.status,
-                get_priority_label(todo.priority),
-                todo.category.name if todo.category else "",
-                todo.due_date.strftime("%Y-%m-%d") if todo.due_date else "",
-                todo.tags or "",
-                todo.created_at.strftime("%Y-%m-%d %H:%M:%S") if todo.created_at else ""
-            ])
-        
-        csv_content = "\n".join([",".join([str(cell) for cell in row]) for row in output])
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=todos_{date.today()}.csv"}
-        )
-    
-    else:  # JSON
-        todos_data = []
-        for todo in todos:
-            todos_data.append({
-                "id": todo.id,
-                "title": todo.title,
-                "description": todo.description,
-                "status": todo.status,
-                "priority": get_priority_label(todo.priority),
-                "priority_value": todo.priority,
-                "category": todo.category.name if todo.category else None,
-                "due_date": todo.due_date.isoformat() if todo.due_date else None,
-                "tags": parse_tags(todo.tags),
-                "created_at": todo.created_at.isoformat() if todo.created_at else None,
-                "updated_at": todo.updated_at.isoformat() if todo.updated_at else None
-            })
-        
-        return Response(
-            content=json.dumps(todos_data, indent=2),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=todos_{date.today()}.json"}
-        )
+    """
+    Import tasks from a CSV, JSON or NDJSON upload in the export's layout.
+    The format defaults to the file extension. Returns the number imported
+    and the rows that were not, with the reason.
+    """
+    format = format or detect_format(file.filename)
+    if format is None:
+        raise HTTPException(status_code=400, detail="Unknown format, pass format=csv|json|ndjson")
+    # Parsing and inserting a large upload would otherwise block the event loop
+    report = await run_in_threadpool(import_tasks, db, user["user_id"], file.file, format)
+    title_index.invalidate(user["user_id"])
+    return report
+
+
+# ---------------- DELTA SYNC ----------------
+@router.get("/api/changes")
+async def get_changes(
+    db: db_dependency,
+    user: user_dependency,
+    since: Optional[str] = Query(None, description="cursor from the previous response; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000)
+):
+    """
+    Tasks created or updated, and ids deleted, since the cursor. Repeat with
+    the returned cursor while has_more is true. Reads the primary: a
+    lagging replica could advance the cursor past changes it has not seen.
+    """
+    try:
+        cursor = decode_cursor(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return fetch_changes(db, user["user_id"], cursor, limit)
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Cursor expired, sync again without since")
 
 
 # ---------------- CATEGORY MANAGEMENT ----------------
@@ -475,8 +449,18 @@ async def delete_category(
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # Remove category from todos
-    db.query(ToDoItem).filter(ToDoItem.category_id == category_id).update({"category_id": None})
+    # Remove category from todos, live and archived. Every shard keeps a
+    # copy of the category and holds tasks that may use it, so detach it
+    # on all of them before the delete is replicated
+    def detach(shard_db):
+        # updated_at moves so delta sync sends the detached tasks again
+        changed = {"category_id": None, "updated_at": datetime.utcnow()}
+        for model in (ToDoItem, ToDoItemArchive):
+            shard_db.query(model).filter(model.category_id == category_id).update(changed)
+        if shard_db is not db:
+            shard_db.commit()
+
+    shard_router.scatter(db, detach)
     
     db.delete(category)
     db.commit()
@@ -1,10 +1,11 @@
 from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends, Path
+from fastapi import APIRouter, HTTPException, Depends, Path, Request
 from ToDoApp.models import Users
 from ToDoApp import models, schemas
 from ToDoApp.database import engine, SessionLocal
 from sqlalchemy.orm import Session as session
 from ToDoApp.routers import auth
+from ToDoApp.timewindows import load_timezone
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
 
@@ -58,4 +59,19 @@ async def update_user(db: db_dependency, user: user_depedency, user_verification
     hashed_new_password = bcrypt_context.hash(user_verification.new_password)
     user_db.hashed_password = hashed_new_password
     db.add(user_db)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+
+@router.put("/timezone", status_code=204)
+async def update_timezone(request: Request, db: db_dependency, user: user_depedency, user_timezone: schemas.UserTimezone):
+    """Set the timezone used for "today" and per-day charts"""
+    if load_timezone(user_timezone.timezone) is None:
+        raise HTTPException(status_code=422, detail="Unknown timezone")
+    user_db = db.query(models.Users).filter(models.Users.id == user.get('user_id')).first()
+    if user_db is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user_db.timezone = user_timezone.timezone
+    db.commit()
+    # Date windows read the timezone from the session, not the database
+    request.session["user"] = {**user, "timezone": user_timezone.timezone}
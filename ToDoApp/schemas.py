@@ -65,6 +65,7 @@ class UsersOut(BaseModel):
     last_name: str
     role: str
     is_active: bool
+    timezone: str | None = None
 
     class Config:
         from_attributes = True
@@ -74,6 +75,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class UserTimezone(BaseModel):
+    timezone: str  # IANA name, e.g. "Europe/Berlin"
+
+
 class UserVerification(BaseModel):
     password: str
     new_password: str 
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+Owner-based sharding for the task tables.
+
+Every per-user query is scoped by owner_id, so a user's tasks, archive,
+counters and event log all live on one shard, picked by a consistent-hash
+ring over SHARD_URLS (comma-separated database URLs; a URL equal to
+DATABASE_URL reuses the primary engine). Each shard gets SHARD_VNODES
+points on the ring, so adding a shard moves only about 1/N of the owners.
+Moving their existing rows is a separate migration; the router only
+decides where rows go from now on.
+
+- `users` and `jobs` live on the primary (DATABASE_URL) only, so the
+  other shards are created from `shard_metadata()`, which leaves out the
+  foreign keys pointing at them.
+- `categories` is shared: written on the primary and copied to every
+  shard when the transaction commits, so shard-local joins keep working.
+- Everything else is read and written on the owner's shard.
+
+Without SHARD_URLS there is one shard, the primary engine, and a routed
+session behaves exactly like SessionLocal.
+
+Cross-owner (admin/manager) reads go through `scatter`, which runs a
+function against every shard in parallel and returns the partial results
+for the caller to merge.
+
+A read-only session (see ToDoApp.replicas) sends its SELECTs for the
+primary to one of the REPLICA_URLS engines; flushes and INSERT/UPDATE/
+DELETE statements still go to the primary.
+"""
+import bisect
+import contextvars
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import MetaData, delete, event, insert, inspect, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from ToDoApp.database import DATABASE_URL, create_db_engine, engine, normalize_url, pick_replica, replica_engines
+from ToDoApp.models import Base, Category, ToDoItem, ToDoItemArchive
+
+
+SHARD_URLS = [url.strip() for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+SCATTER_WORKERS = int(os.getenv("SHARD_SCATTER_WORKERS", "8"))
+
+# Tables that only exist meaningfully on the primary
+PRIMARY_TABLES = {"users", "jobs"}
+# Tables written on the primary and copied to every shard
+REPLICATED_TABLES = {"categories"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with `vnodes` points per node"""
+
+    def __init__(self, nodes, vnodes: int = SHARD_VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        if not points:
+            raise ValueError("A hash ring needs at least one node")
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key) -> str:
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._nodes[index]
+
+
+def _table_name(mapper, clause) -> Optional[str]:
+    if mapper is not None:
+        return inspect(mapper).local_table.name
+    # Core INSERT/UPDATE/DELETE against a Table
+    table = getattr(clause, "table", None)
+    return getattr(table, "name", None)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends each statement to the right database: `users` to
+    the primary, category writes to the primary, everything else to the
+    shard of info["owner_id"] (or the pinned info["shard"]). A read-only
+    session reads the primary's data from one replica for its lifetime.
+    """
+
+    def __init__(self, router: "ShardRouter", owner_id: Optional[int] = None,
+                 shard: Optional[str] = None, read_only: bool = False, **kwargs):
+        kwargs.setdefault("autoflush", False)
+        super().__init__(**kwargs)
+        self.router = router
+        self.info["owner_id"] = owner_id
+        self.info["shard"] = shard or router.shard_for(owner_id)
+        self.info["read_only"] = read_only
+        self.info["replica"] = pick_replica(router.replicas) if read_only else None
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        table = _table_name(mapper, clause)
+        # Flushes ask for a bind with no clause; reads pass their SELECT
+        writing = clause is None or isinstance(clause, UpdateBase)
+        if table in PRIMARY_TABLES or (table in REPLICATED_TABLES and writing):
+            bind = self.router.primary
+        else:
+            bind = self.router.engines[self.info["shard"]]
+        if bind is self.router.primary and not writing and self.info["replica"] is not None:
+            return self.info["replica"]
+        return bind
+
+
+class ShardRouter:
+    """Maps owner ids to shard engines and opens sessions bound to them"""
+
+    def __init__(self, engines: dict, primary, vnodes: int = SHARD_VNODES, replicas=()):
+        self.engines = dict(engines)
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.ring = HashRing(self.engines, vnodes)
+        self._executor = None
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def shard_for(self, owner_id: Optional[int]) -> str:
+        """Shard name holding this owner's tasks; anonymous work uses the first shard"""
+        if owner_id is None or len(self.engines) == 1:
+            return next(iter(self.engines))
+        return self.ring.node_for(owner_id)
+
+    def engine_for(self, owner_id: Optional[int]):
+        return self.engines[self.shard_for(owner_id)]
+
+    def session(self, owner_id: Optional[int] = None, shard: Optional[str] = None,
+                read_only: bool = False) -> RoutingSession:
+        return RoutingSession(self, owner_id=owner_id, shard=shard, read_only=read_only)
+
+    def session_for_engine(self, bind) -> Session:
+        """Routed session pinned to the shard using `bind` (plain Session for other engines)"""
+        for name, shard_engine in self.engines.items():
+            if shard_engine is bind:
+                return self.session(shard=name)
+        return Session(bind=bind)
+
+    @contextmanager
+    def owner_session(self, db: Session, owner_id: int):
+        """`db` itself when it already reads owner_id's shard, else a session on that shard"""
+        if len(self.engines) == 1 or db.info.get("shard") == self.shard_for(owner_id):
+            yield db
+            return
+        with self.session(owner_id, read_only=db.info.get("read_only", False)) as owner_db:
+            yield owner_db
+
+    def scatter(self, db: Session, work: Callable[[Session], object], owner_id: Optional[int] = None) -> list:
+        """
+        work(session) against every shard in parallel, results in shard
+        order; only against owner_id's shard when one is given. With a
+        single shard this is just [work(db)], on the caller's session.
+        """
+        if len(self.engines) == 1:
+            return [work(db)]
+        if owner_id is not None:
+            with self.owner_session(db, owner_id) as owner_db:
+                return [work(owner_db)]
+
+        read_only = db.info.get("read_only", False)
+
+        def run(name):
+            with self.session(shard=name, read_only=read_only) as shard_db:
+                return work(shard_db)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=SCATTER_WORKERS, thread_name_prefix="shard-scatter")
+        # Each worker runs in a copy of the caller's context (per-request
+        # query stats, see ToDoApp.query_stats)
+        contexts = {name: contextvars.copy_context() for name in self.engines}
+        return list(self._executor.map(lambda name: contexts[name].run(run, name), self.engines))
+
+    def binds(self, db: Session, owner_id: Optional[int] = None) -> list:
+        """Engines to stream from: the caller's with one shard, else owner_id's or all"""
+        if len(self.engines) == 1:
+            return [db.get_bind()]
+        if owner_id is not None:
+            return [self.engine_for(owner_id)]
+        return list(self.engines.values())
+
+    def replicate(self, model, rows: list, deleted_ids: list = ()):
+        """Copy primary-owned rows (and deletions) of a replicated table to every shard"""
+        table = model.__table__
+        key = table.c.id
+        ids = [row["id"] for row in rows] + list(deleted_ids)
+        for shard_engine in self.engines.values():
+            if shard_engine is self.primary or not ids:
+                continue
+            with shard_engine.begin() as conn:
+                if model is Category and deleted_ids:
+                    # Tasks given the category after the caller detached it
+                    for tasks in (ToDoItem.__table__, ToDoItemArchive.__table__):
+                        conn.execute(
+                            update(tasks)
+                            .where(tasks.c.category_id.in_(list(deleted_ids)))
+                            .values(category_id=None, updated_at=datetime.utcnow())
+                        )
+                conn.execute(delete(table).where(key.in_(ids)))
+                if rows:
+                    conn.execute(insert(table), rows)
+
+    def sync_replicated(self):
+        """Copy every replicated table from the primary (e.g. to a new shard)"""
+        if all(shard_engine is self.primary for shard_engine in self.engines.values()):
+            return
+        with self.primary.connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(Category.__table__.select())]
+        for shard_engine in self.engines.values():
+            if shard_engine is self.primary:
+                continue
+            with shard_engine.begin() as conn:
+                conn.execute(delete(Category.__table__))
+                if rows:
+                    conn.execute(insert(Category.__table__), rows)
+
+
+def shard_metadata() -> MetaData:
+    """
+    The schema for a shard other than the primary: every table, without
+    the foreign keys to PRIMARY_TABLES, whose rows never reach that shard.
+    """
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for constraint in list(copy.foreign_key_constraints):
+            if constraint.referred_table.name in PRIMARY_TABLES:
+                copy.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+    return metadata
+
+
+def build_shard_engines(urls=SHARD_URLS) -> dict:
+    """{name: engine} for SHARD_URLS; just the primary when none are set"""
+    if not urls:
+        return {"shard0": engine}
+    return {
+        f"shard{index}": engine if normalize_url(url) == DATABASE_URL else create_db_engine(url)
+        for index, url in enumerate(urls)
+    }
+
+
+shard_router = ShardRouter(build_shard_engines(), engine, replicas=replica_engines)
+
+
+def session_owner_id(connection) -> Optional[int]:
+    """Logged-in user's id from the session cookie, without failing for anonymous requests"""
+    user = connection.session.get("user")
+    return user.get("user_id") if user else None
+
+
+# ---------------- CATEGORY REPLICATION ----------------
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_replicated_rows(session, flush_context):
+    changes = session.info.setdefault("replicated_changes", {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Category):
+            state = inspect(obj)
+            changes[obj.id] = {attr.key: getattr(obj, attr.key) for attr in state.mapper.column_attrs}
+    for obj in session.deleted:
+        if isinstance(obj, Category):
+            changes[obj.id] = None
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _replicate_on_commit(session):
+    changes = session.info.pop("replicated_changes", None)
+    if changes:
+        session.router.replicate(
+            Category,
+            [row for row in changes.values() if row is not None],
+            [category_id for category_id, row in changes.items() if row is None],
+        )
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_replicated_rows(session):
+    session.info.pop("replicated_changes", None)
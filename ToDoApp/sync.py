@@ -0,0 +1,200 @@
+"""
+Delta sync for offline and mobile clients.
+
+`GET /todos/api/changes?since=<cursor>` returns a user's tasks created or
+updated after the cursor plus the ids of tasks deleted since, so a client
+that reconnects transfers only what changed. Changes come from the
+(owner_id, updated_at) index; deletions from `task_tombstones`, which a
+flush hook fills in the deleting transaction.
+
+Timestamps are taken when a transaction flushes, not when it commits, so
+a slow transaction can commit rows stamped earlier than ones a client has
+already seen. Once a client is caught up its cursor is therefore held
+SYNC_OVERLAP behind the clock, and the next pull may return a few tasks
+again. Clients apply `deleted` first, then upsert `changes` by id.
+
+Tombstones older than TOMBSTONE_RETENTION_DAYS can be pruned:
+
+    python -m ToDoApp.sync prune
+
+A cursor older than that is answered with 410 and the client resyncs in
+full. Bulk `query.delete()` bypasses the hook, and archiving
+(ToDoApp.archive) is not a deletion: archived tasks stay on the client.
+"""
+import argparse
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, delete, event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from ToDoApp.counters import previous_value, register_active_history
+from ToDoApp.models import Category, TaskTombstone, ToDoItem
+
+
+SYNC_OVERLAP = timedelta(seconds=float(os.getenv("SYNC_OVERLAP_SECONDS", "5")))
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+EPOCH = datetime(1970, 1, 1)
+
+
+class SyncPosition(NamedTuple):
+    at: datetime
+    id: int
+
+
+class SyncCursor(NamedTuple):
+    changes: SyncPosition
+    deleted: SyncPosition
+
+
+class CursorExpired(Exception):
+    """The cursor predates the oldest tombstones kept"""
+
+
+def encode_cursor(cursor: SyncCursor) -> str:
+    raw = json.dumps([[position.at.isoformat(), position.id] for position in cursor], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> SyncCursor:
+    """Raises ValueError for anything encode_cursor did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        changes, deleted = (SyncPosition(datetime.fromisoformat(at), int(id_)) for at, id_ in json.loads(raw))
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid sync cursor") from e
+    return SyncCursor(changes, deleted)
+
+
+# ---------------- DELETION LOG ----------------
+
+
+# Load the previous owner when an expired instance is reassigned
+register_active_history(ToDoItem.owner_id)
+
+
+@event.listens_for(Session, "before_flush")
+def _log_deleted_tasks(session, flush_context, instances):
+    """Tombstone deleted tasks, and tasks moved away from their owner, in the same flush"""
+    now = datetime.utcnow()
+    tombstones = []
+    for obj in session.deleted:
+        if isinstance(obj, ToDoItem) and obj.id is not None:
+            owner_id = previous_value(inspect(obj), "owner_id")
+            tombstones.append(TaskTombstone(task_id=obj.id, owner_id=owner_id, deleted_at=now))
+    for obj in session.dirty:
+        if isinstance(obj, ToDoItem) and obj.id is not None:
+            previous = previous_value(inspect(obj), "owner_id")
+            if previous is not None and previous != obj.owner_id:
+                tombstones.append(TaskTombstone(task_id=obj.id, owner_id=previous, deleted_at=now))
+    session.add_all(tombstones)
+
+
+# ---------------- CHANGE FEED ----------------
+
+
+CHANGE_COLUMNS = (
+    ToDoItem.id,
+    ToDoItem.title,
+    ToDoItem.description,
+    ToDoItem.status,
+    ToDoItem.priority,
+    ToDoItem.category_id,
+    Category.name.label("category"),
+    ToDoItem.due_date,
+    ToDoItem.tags,
+    ToDoItem.created_at,
+    ToDoItem.updated_at,
+)
+
+
+def _after(column, id_column, position: SyncPosition):
+    """Keyset predicate (column, id) > position"""
+    return or_(column > position.at, and_(column == position.at, id_column > position.id))
+
+
+def _change_dict(row) -> dict:
+    change = dict(row._mapping)
+    for key in ("due_date", "created_at", "updated_at"):
+        if change[key] is not None:
+            change[key] = change[key].isoformat()
+    return change
+
+
+def fetch_changes(db: Session, owner_id: int, cursor: Optional[SyncCursor], limit: int = 500,
+                  now: Optional[datetime] = None) -> dict:
+    """
+    One page of changes after `cursor` (None: a first, full sync). Keep
+    calling with the returned cursor while has_more is true.
+    """
+    now = now or datetime.utcnow()
+    settled = SyncPosition(now - SYNC_OVERLAP, 0)
+    if cursor is None:
+        # A new client holds no tasks, so only deletions from now on matter
+        cursor = SyncCursor(SyncPosition(EPOCH, 0), settled)
+    elif cursor.deleted.at < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise CursorExpired()
+
+    rows = db.execute(
+        select(*CHANGE_COLUMNS)
+        .outerjoin(Category, Category.id == ToDoItem.category_id)
+        .where(ToDoItem.owner_id == owner_id, _after(ToDoItem.updated_at, ToDoItem.id, cursor.changes))
+        .order_by(ToDoItem.updated_at, ToDoItem.id)
+        .limit(limit + 1)
+    ).all()
+    tombstones = db.execute(
+        select(TaskTombstone.id, TaskTombstone.task_id, TaskTombstone.deleted_at)
+        .where(TaskTombstone.owner_id == owner_id, _after(TaskTombstone.deleted_at, TaskTombstone.id, cursor.deleted))
+        .order_by(TaskTombstone.deleted_at, TaskTombstone.id)
+        .limit(limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit or len(tombstones) > limit
+    rows, tombstones = rows[:limit], tombstones[:limit]
+    changes_at = SyncPosition(rows[-1].updated_at, rows[-1].id) if rows else cursor.changes
+    deleted_at = SyncPosition(tombstones[-1].deleted_at, tombstones[-1].id) if tombstones else cursor.deleted
+    if not has_more:
+        # Caught up: move to `settled`, or to the last row seen if that is
+        # older, staying SYNC_OVERLAP behind the clock so rows from
+        # transactions still committing are read next time. Without new
+        # rows a position still advances, or an idle log would expire it.
+        changes_at = max(cursor.changes, min(changes_at, settled) if rows else settled)
+        deleted_at = max(cursor.deleted, min(deleted_at, settled) if tombstones else settled)
+
+    return {
+        "changes": [_change_dict(row) for row in rows],
+        "deleted": [tombstone.task_id for tombstone in tombstones],
+        "cursor": encode_cursor(SyncCursor(changes_at, deleted_at)),
+        "has_more": has_more,
+    }
+
+
+def prune_tombstones(db: Session, retention_days: int = TOMBSTONE_RETENTION_DAYS) -> int:
+    """Delete tombstones past retention; returns rows deleted. The caller commits."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    return db.execute(delete(TaskTombstone).where(TaskTombstone.deleted_at < cutoff)).rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delta sync maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prune = sub.add_parser("prune", help="delete tombstones older than the retention period")
+    prune.add_argument("--days", type=int, default=TOMBSTONE_RETENTION_DAYS)
+    args = parser.parse_args(argv)
+
+    from ToDoApp.sharding import shard_router
+
+    pruned = 0
+    for shard in shard_router.engines:
+        with shard_router.session(shard=shard) as db:
+            pruned += prune_tombstones(db, args.days)
+            db.commit()
+    print(f"Pruned {pruned} tombstone(s)")
+
+
+if __name__ == "__main__":
+    main()
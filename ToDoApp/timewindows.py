@@ -0,0 +1,97 @@
+"""
+Local-day windows over UTC timestamps.
+
+`created_at` and `updated_at` are stored as naive UTC (`datetime.utcnow`),
+so "today" for a user in another timezone is not `func.date(created_at) ==
+date.today()`: that compares against the server's calendar day and wraps
+the column in a function, which rules out an index range scan. The helpers
+here turn a user's local day into a half-open UTC range,
+`start <= created_at < end`, which both gets the boundaries right and uses
+the (owner_id, created_at) index.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Annotated, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import Depends, Request
+from sqlalchemy import case, literal
+
+from ToDoApp.routers.auth import get_current_user
+
+
+UTC = timezone.utc
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+# Browsers can send Intl.DateTimeFormat().resolvedOptions().timeZone
+TIMEZONE_HEADER = "X-Timezone"
+
+
+def load_timezone(name: Optional[str]) -> Optional[ZoneInfo]:
+    """ZoneInfo for an IANA name, or None when it is missing or unknown"""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def resolve_timezone(*candidates: Optional[str]) -> ZoneInfo:
+    """First valid timezone name among `candidates`, else the default"""
+    for name in candidates:
+        tz = load_timezone(name)
+        if tz is not None:
+            return tz
+    return load_timezone(DEFAULT_TIMEZONE) or ZoneInfo("UTC")
+
+
+def get_user_timezone(request: Request, user: Annotated[dict, Depends(get_current_user)]) -> ZoneInfo:
+    """The profile setting (kept in the session) wins over the header"""
+    return resolve_timezone(user.get("timezone"), request.headers.get(TIMEZONE_HEADER))
+
+
+timezone_dependency = Annotated[ZoneInfo, Depends(get_user_timezone)]
+
+
+def local_today(tz: ZoneInfo, now: Optional[datetime] = None) -> date:
+    now = now or datetime.now(UTC)
+    return now.astimezone(tz).date()
+
+
+def to_utc_naive(day: date, tz: ZoneInfo) -> datetime:
+    """Local midnight starting `day`, as the naive UTC the database stores"""
+    return datetime.combine(day, time.min, tzinfo=tz).astimezone(UTC).replace(tzinfo=None)
+
+
+def day_window(day: date, tz: ZoneInfo) -> tuple:
+    """[start, end) in naive UTC covering local `day`. DST days are 23h/25h long."""
+    return to_utc_naive(day, tz), to_utc_naive(day + timedelta(days=1), tz)
+
+
+def days_window(first_day: date, last_day: date, tz: ZoneInfo) -> tuple:
+    """[start, end) in naive UTC covering local days first_day..last_day inclusive"""
+    return to_utc_naive(first_day, tz), to_utc_naive(last_day + timedelta(days=1), tz)
+
+
+def in_window(column, window: tuple):
+    """Sargable half-open range predicate on a timestamp column"""
+    start, end = window
+    return (column >= start) & (column < end)
+
+
+def to_local(value: datetime, tz: ZoneInfo) -> datetime:
+    """Stored naive UTC timestamp as an aware local datetime"""
+    return value.replace(tzinfo=UTC).astimezone(tz)
+
+
+def local_day_bucket(column, first_day: date, days: int, tz: ZoneInfo):
+    """
+    SQL expression numbering the local day a timestamp falls on, 0 for
+    `first_day` up to days - 1, for grouping rows already limited to the
+    `days_window` of those days. Each local midnight is bound as a
+    parameter, so DST days get their own boundaries.
+    """
+    bounds = [to_utc_naive(first_day + timedelta(days=i), tz) for i in range(1, days)]
+    if not bounds:
+        return literal(0)
+    return case(*((column < bound, i) for i, bound in enumerate(bounds)), else_=days - 1)